@@ -18,4 +18,13 @@ class TestAboutView(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertIn(b'About Me', response.content)
         self.assertIsInstance(
-            response.context['collaborate_form'], CollaborateForm)
\ No newline at end of file
+            response.context['collaborate_form'], CollaborateForm)
+
+    def test_matching_etag_returns_304(self):
+        """Verifies repeat requests for an unchanged page get a 304"""
+        # The first response sets the CSRF cookie the ETag depends on
+        self.client.get(reverse('about'))
+        response = self.client.get(reverse('about'))
+        response = self.client.get(
+            reverse('about'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
@@ -1,6 +1,10 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# settings.ASYNC_VIEWS switches to the async view for ASGI servers
+about_view = views.about_me_async if settings.ASYNC_VIEWS else views.about_me
+
 urlpatterns = [
-    path('childabout',views.about_me,name='about'),
-]
\ No newline at end of file
+    path('childabout',about_view,name='about'),
+]
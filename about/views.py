@@ -1,15 +1,46 @@
+import hashlib
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, get_object_or_404
+from django.conf import settings
 from django.contrib import messages
+from blog.cache import anonymous_condition
 from .forms import CollaborateForm
 from .models import About
 
 
+def about_validators(request):
+    """
+    Returns the ``(etag, last_modified)`` validators of the about page.
+
+    They come from the newest ``About.updated_on`` and the CSRF cookie,
+    because the collaborate form embeds a token derived from it.
+    """
+    if not hasattr(request, "_about_validators"):
+        updated_on = About.objects.order_by('-updated_on').values_list(
+            'updated_on', flat=True).first()
+        csrf_cookie = request.COOKIES.get(settings.CSRF_COOKIE_NAME, "")
+        etag = hashlib.md5(f"{updated_on}:{csrf_cookie}".encode()).hexdigest()
+        request._about_validators = (etag, updated_on)
+    return request._about_validators
+
+
+def about_etag(request):
+    return about_validators(request)[0]
+
+
+def about_last_modified(request):
+    return about_validators(request)[1]
+
+
+@anonymous_condition(about_etag, about_last_modified)
 def about_me(request):
     """
     Renders the most recent information on the website author
     and allows user collaboration requests.
 
     Displays an individual instance of :model:`about.About`.
+    Conditional requests by anonymous users are answered with
+    ``304 Not Modified`` until the about text changes.
 
     **Context**
     ``about``
@@ -37,3 +68,37 @@ def about_me(request):
         'about/about.html',
         {"about":about,"collaborate_form":collaborate_form,}
     )
+
+
+@anonymous_condition(about_etag, about_last_modified)
+async def about_me_async(request):
+    """
+    Async version of :view:`about.views.about_me`, used when
+    ``settings.ASYNC_VIEWS`` is on.
+
+    **Context**
+    ``about``
+        The most recent instance of :model:`about.About`.
+        ``collaborate_form``
+            An instance of :form:`about.CollaborateForm`.
+
+    **Template**
+    :template:`about/about.html`
+    """
+    about = await About.objects.order_by('-updated_on').afirst()
+
+    if request.method == "POST":
+        collaborate_form = CollaborateForm(data=request.POST)
+        if collaborate_form.is_valid():
+            await sync_to_async(collaborate_form.save)()
+            messages.add_message(
+            request, messages.SUCCESS,
+            'Collaboration request received! I endeavour to respond within 2 working days.'
+        )
+    collaborate_form = CollaborateForm()
+
+    return await sync_to_async(render)(
+        request,
+        'about/about.html',
+        {"about":about,"collaborate_form":collaborate_form,}
+    )
@@ -1,5 +1,9 @@
-from django.contrib import admin
-from .models import Post, Comment
+from django.contrib import admin, messages
+from django.db import transaction
+from django.utils import timezone
+from .cache import bump_post_versions
+from .models import Post, Comment, CommentSubmission
+from .paginators import EstimatedCountPaginator
 from django_summernote.admin import SummernoteModelAdmin
 
 # Register your models here.
@@ -14,12 +18,78 @@ class PostAdmin(SummernoteModelAdmin):
     """
     Lists fields for display in admin, fileds for search,
     field filters, fields to prepopulate and rich-text editor.
+    Authors are fetched with the posts and large tables are
+    counted from estimates.
     """
-    list_display = ('title', 'slug', 'status','created_on')
+    list_display = ('title', 'slug', 'author', 'status','created_on')
+    list_select_related = ('author',)
     search_fields = ['title']
     list_filter = ('status','created_on')
     prepopulated_fields = {'slug': ('title',)}
     summernote_fields = ('content',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
-admin.site.register(Comment)
\ No newline at end of file
+@admin.register(Comment)
+class CommentAdmin(admin.ModelAdmin):
+    """
+    Lists comments with their author and post, filters on approval
+    and approves or rejects comments in bulk.
+    """
+    list_display = ('body', 'author', 'post', 'approved', 'created_on')
+    list_select_related = ('author', 'post__author')
+    list_filter = ('approved', 'created_on')
+    raw_id_fields = ('post', 'author')
+    actions = ['approve_comments', 'reject_comments']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    @admin.action(description='Approve selected comments')
+    def approve_comments(self, request, queryset):
+        self.set_approved(request, queryset, True)
+
+    @admin.action(description='Reject selected comments')
+    def reject_comments(self, request, queryset):
+        self.set_approved(request, queryset, False)
+
+    def set_approved(self, request, queryset, approved):
+        """
+        Updates the selected comments with a single ``UPDATE`` instead
+        of saving them one by one, then recounts the approved comments
+        of the affected posts and invalidates their cached pages.
+        """
+        with transaction.atomic():
+            post_ids = list(
+                queryset.order_by().values_list('post_id', flat=True).distinct())
+            updated = queryset.exclude(approved=approved).update(
+                approved=approved, updated_on=timezone.now())
+            Post.recount_approved_comments(post_ids)
+        bump_post_versions(
+            *Post.objects.filter(pk__in=post_ids).values_list('slug', flat=True))
+
+        action = 'approved' if approved else 'rejected'
+        self.message_user(
+            request, f'{updated} comment(s) {action}.', messages.SUCCESS)
+
+
+@admin.register(CommentSubmission)
+class CommentSubmissionAdmin(admin.ModelAdmin):
+    """
+    Lists queued comments so failed submissions can be inspected and
+    sent back to the worker.
+    """
+    list_display = ('body', 'author', 'post', 'status', 'attempts',
+                    'created_on')
+    list_select_related = ('author', 'post__author')
+    list_filter = ('status',)
+    raw_id_fields = ('post', 'author', 'comment')
+    actions = ['retry_submissions']
+
+    @admin.action(description='Retry selected submissions')
+    def retry_submissions(self, request, queryset):
+        updated = queryset.exclude(status=CommentSubmission.DONE).update(
+            status=CommentSubmission.PENDING, attempts=0,
+            available_at=timezone.now())
+        self.message_user(
+            request, f'{updated} submission(s) queued again.', messages.SUCCESS)
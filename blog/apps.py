@@ -1,6 +1,25 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def repair_sqlite_search(sender, using, **kwargs):
+    """
+    Recreates the FTS5 triggers dropped when a SQLite migration rebuilt
+    the blog_post table.
+    """
+    from django.db import connections
+    from .search import install_sqlite_search, sqlite_search_installed
+
+    connection = connections[using]
+    if connection.vendor == "sqlite" and sqlite_search_installed(connection):
+        install_sqlite_search(connection)
 
 
 class BlogConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'blog'
+
+    def ready(self):
+        # Connect the model signal handlers
+        from . import signals  # noqa: F401
+        post_migrate.connect(repair_sqlite_search, sender=self)
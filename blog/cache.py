@@ -0,0 +1,336 @@
+import asyncio
+import hashlib
+import time
+from calendar import timegm
+from functools import wraps
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import condition
+from codestar.routers import use_primary
+from .models import Post, Comment
+
+# Rendered pages and fragments are stored under keys that include a
+# version number. Saving or deleting a post or comment bumps the version
+# (see blog/signals.py), so stale entries are never read again and simply
+# expire. Versions are nanosecond timestamps rather than counters, so a
+# version that was evicted from the cache can never be handed out twice.
+# Versions expire too, a while after the entries stored under them: one
+# that expired is simply replaced by a newer version, and the versions
+# created for slugs that are not posts do not pile up in the cache.
+INDEX_VERSION_KEY = "blog:version:index"
+
+
+def _version_timeout():
+    return 2 * settings.BLOG_CACHE_TIMEOUT
+
+
+def _sitemap_version_timeout():
+    return 2 * settings.SITEMAP_CACHE_TIMEOUT
+
+
+def _post_version_key(slug):
+    return f"blog:version:post:{slug}"
+
+
+def _sitemap_version_key(shard):
+    return f"blog:version:sitemap:{shard}"
+
+
+def _get_versions(keys, timeout):
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), timeout)
+            versions[key] = cache.get(key)
+    if time.time_ns() - max(versions.values(), default=0) < (
+            settings.REPLICA_PIN_SECONDS * 10**9):
+        # The data changed moments ago and may not have reached the read
+        # replicas, which must not be cached under the new version.
+        use_primary()
+    return versions
+
+
+def _get_version(key):
+    return _get_versions([key], _version_timeout())[key]
+
+
+def index_version():
+    """
+    Returns the current version of the post listing.
+    """
+    return _get_version(INDEX_VERSION_KEY)
+
+
+def post_version(slug):
+    """
+    Returns the current version of the post with the given slug.
+    """
+    return _get_version(_post_version_key(slug))
+
+
+def sitemap_versions(shards):
+    """
+    Returns the current versions of the given sitemap shards, by shard.
+    """
+    versions = _get_versions([_sitemap_version_key(shard) for shard in shards],
+                             _sitemap_version_timeout())
+    return {shard: versions[_sitemap_version_key(shard)] for shard in shards}
+
+
+def bump_index_version():
+    cache.set(INDEX_VERSION_KEY, time.time_ns(), _version_timeout())
+
+
+def bump_post_versions(*slugs):
+    """
+    Invalidates everything cached for the posts with the given slugs.
+    """
+    version = time.time_ns()
+    cache.set_many(
+        {_post_version_key(slug): version for slug in slugs},
+        _version_timeout())
+
+
+def bump_sitemap_versions(*post_ids):
+    """
+    Invalidates the sitemap shards listing the posts with the given ids.
+    """
+    version = time.time_ns()
+    shards = {post_id // settings.SITEMAP_SHARD_SIZE for post_id in post_ids}
+    cache.set_many(
+        {_sitemap_version_key(shard): version for shard in shards},
+        _sitemap_version_timeout())
+
+
+def index_page_key(request):
+    """
+    Cache key for a page of :view:`blog.views.PostList`.
+    """
+    query = hashlib.md5(request.GET.urlencode().encode()).hexdigest()
+    return f"blog:page:index:{index_version()}:{query}"
+
+
+def post_page_key(request, slug):
+    """
+    Cache key for a :view:`blog.views.post_detail` page.
+    """
+    query = hashlib.md5(request.GET.urlencode().encode()).hexdigest()
+    return f"blog:page:post:{slug}:{post_version(slug)}:{query}"
+
+
+def cache_anonymous_page(key_func):
+    """
+    View decorator storing the rendered response of ``GET`` requests
+    by anonymous users under ``key_func(request, *args, **kwargs)``.
+
+    Requests by logged in users, requests with pending flash messages
+    and responses that are not a plain ``200`` or that use a CSRF token
+    always go through the view.
+    """
+    def decorator(view_func):
+        if asyncio.iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                if request.method != "GET" or not await sync_to_async(
+                        is_cacheable_request)(request):
+                    return await view_func(request, *args, **kwargs)
+
+                key = await sync_to_async(key_func)(request, *args, **kwargs)
+                cached = await cache.aget(key)
+                if cached is not None:
+                    content, content_type = cached
+                    return HttpResponse(content, content_type=content_type)
+
+                response = await view_func(request, *args, **kwargs)
+                if _is_cacheable_response(request, response):
+                    await cache.aset(
+                        key, (response.content, response["Content-Type"]),
+                        settings.BLOG_CACHE_TIMEOUT)
+                return response
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method != "GET" or not is_cacheable_request(request):
+                return view_func(request, *args, **kwargs)
+
+            key = key_func(request, *args, **kwargs)
+            cached = cache.get(key)
+            if cached is not None:
+                content, content_type = cached
+                return HttpResponse(content, content_type=content_type)
+
+            response = view_func(request, *args, **kwargs)
+            if hasattr(response, "render"):
+                response.render()
+            if _is_cacheable_response(request, response):
+                cache.set(key, (response.content, response["Content-Type"]),
+                          settings.BLOG_CACHE_TIMEOUT)
+            return response
+        return wrapper
+    return decorator
+
+
+def _is_cacheable_response(request, response):
+    return (response.status_code == 200 and not response.streaming
+            and not request.META.get("CSRF_COOKIE_NEEDS_UPDATE"))
+
+
+def is_cacheable_request(request):
+    """
+    Returns ``True`` for ``GET``/``HEAD`` requests by anonymous users
+    without pending flash messages, whose pages look the same for everyone.
+    """
+    return (request.method in ("GET", "HEAD")
+            and not request.user.is_authenticated
+            and not len(messages.get_messages(request)))
+
+
+def anonymous_condition(etag_func=None, last_modified_func=None):
+    """
+    Like :func:`django.views.decorators.http.condition`, answering
+    requests whose ``If-None-Match``/``If-Modified-Since`` headers match
+    with ``304 Not Modified``, but only for cacheable requests. Pages for
+    logged in users include their own comments and a CSRF token, so they
+    always get a full response.
+    """
+    def decorator(view_func):
+        if asyncio.iscoroutinefunction(view_func):
+            return _async_anonymous_condition(
+                view_func, etag_func, last_modified_func)
+
+        conditional_view = condition(etag_func, last_modified_func)(view_func)
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if is_cacheable_request(request):
+                return conditional_view(request, *args, **kwargs)
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _async_anonymous_condition(view_func, etag_func, last_modified_func):
+    """
+    :func:`anonymous_condition` for async views. Django's ``condition``
+    decorator only wraps sync views, so this does the same checks with
+    the validator functions run in a thread.
+    """
+    def get_validators(request, *args, **kwargs):
+        etag = etag_func(request, *args, **kwargs) if etag_func else None
+        last_modified = (last_modified_func(request, *args, **kwargs)
+                         if last_modified_func else None)
+        return (quote_etag(etag) if etag else None,
+                timegm(last_modified.utctimetuple()) if last_modified else None)
+
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        if not await sync_to_async(is_cacheable_request)(request):
+            return await view_func(request, *args, **kwargs)
+
+        etag, last_modified = await sync_to_async(get_validators)(
+            request, *args, **kwargs)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = await view_func(request, *args, **kwargs)
+        if request.method in ("GET", "HEAD"):
+            if last_modified and not response.has_header("Last-Modified"):
+                response.headers["Last-Modified"] = http_date(last_modified)
+            if etag:
+                response.headers.setdefault("ETag", etag)
+        return response
+    return wrapper
+
+
+def _make_etag(*parts):
+    return hashlib.md5(":".join(str(part) for part in parts).encode()).hexdigest()
+
+
+def index_validators(request):
+    """
+    Returns the ``(etag, last_modified)`` validators of the post
+    listing, derived from the newest ``Post.updated_on`` and the number
+    of published posts. They are computed at most once per listing version.
+    """
+    key = f"blog:validators:index:{index_version()}"
+    validators = cache.get(key)
+    if validators is None:
+        published = Post.objects.filter(status=1).aggregate(
+            last_modified=Max("updated_on"), count=Count("id"))
+        validators = (
+            _make_etag(published["last_modified"], published["count"]),
+            published["last_modified"],
+        )
+        cache.set(key, validators, settings.BLOG_CACHE_TIMEOUT)
+    return validators
+
+
+def _post_validator_rows(queryset):
+    latest_comment = Comment.objects.filter(
+        post=OuterRef("pk"), approved=True,
+    ).order_by("-updated_on").values("updated_on")[:1]
+    return queryset.filter(status=1).annotate(
+        latest_comment=Subquery(latest_comment),
+    ).values_list(
+        "pk", "updated_on", "approved_comment_count", "latest_comment")
+
+
+def _row_validators(row):
+    pk, updated_on, comment_count, latest_comment = row
+    return (
+        _make_etag(pk, updated_on, comment_count, latest_comment),
+        max(filter(None, (updated_on, latest_comment))),
+    )
+
+
+def post_validators(request, slug):
+    """
+    Returns the ``(etag, last_modified)`` validators of a post page,
+    derived from ``Post.updated_on``, the approved comment count and the
+    last change to an approved comment (``Comment.updated_on``). They are computed at most once per post
+    version, or are ``(None, None)`` if there is no such published post.
+    """
+    key = f"blog:validators:post:{slug}:{post_version(slug)}"
+    validators = cache.get(key)
+    if validators is None:
+        row = _post_validator_rows(Post.objects.filter(slug=slug)).first()
+        if row is None:
+            return None, None
+        validators = _row_validators(row)
+        cache.set(key, validators, settings.BLOG_CACHE_TIMEOUT)
+    return validators
+
+
+def iter_post_etags(chunk_size=2000):
+    """
+    Yields ``(slug, etag)`` for every published post, with the same
+    ETag as :func:`post_validators`, streamed in chunks.
+    """
+    rows = _post_validator_rows(Post.objects.all()).values_list(
+        "slug", "pk", "updated_on", "approved_comment_count",
+        "latest_comment").order_by("pk")
+    for slug, *row in rows.iterator(chunk_size=chunk_size):
+        yield slug, _row_validators(row)[0]
+
+
+def index_etag(request):
+    return index_validators(request)[0]
+
+
+def index_last_modified(request):
+    return index_validators(request)[1]
+
+
+def post_etag(request, slug):
+    return post_validators(request, slug)[0]
+
+
+def post_last_modified(request, slug):
+    return post_validators(request, slug)[1]
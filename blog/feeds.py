@@ -0,0 +1,124 @@
+"""
+RSS, Atom and JSON Feed documents of the latest published posts.
+
+Feeds are built from a ``values()`` query over the few columns they
+show, and the rendered document is cached under the listing version,
+which every :model:`blog.Post` save or delete bumps (see
+blog/signals.py). Polling aggregators get the cached document, or a
+``304`` when it has not changed since their last visit, see
+:func:`blog.views.post_feed`.
+"""
+import hashlib
+import json
+from django.conf import settings
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed, Rss201rev2Feed
+from .cache import index_version
+from .models import Post
+
+# Number of posts in a feed
+FEED_ITEMS = 20
+FEED_TITLE = "CodeStar Blog"
+FEED_FIELDS = ("title", "slug", "excerpt", "created_on", "updated_on",
+               "author__username")
+
+
+class JSONFeed:
+    """
+    Writes a JSON Feed 1.1 document, with the same interface as
+    Django's syndication feed generators.
+    """
+    content_type = "application/feed+json; charset=utf-8"
+
+    def __init__(self, title, link, description, feed_url, **kwargs):
+        self.feed = {
+            "version": "https://jsonfeed.org/version/1.1",
+            "title": title,
+            "home_page_url": link,
+            "feed_url": feed_url,
+            "description": description,
+            "language": "en",
+            "items": [],
+        }
+
+    def add_item(self, title, link, description, unique_id, pubdate,
+                 updateddate, author_name, **kwargs):
+        self.feed["items"].append({
+            "id": unique_id,
+            "url": link,
+            "title": title,
+            "content_text": description,
+            "date_published": pubdate.isoformat(),
+            "date_modified": updateddate.isoformat(),
+            "authors": [{"name": author_name}],
+        })
+
+    def writeString(self, encoding):
+        return json.dumps(self.feed)
+
+
+FEED_FORMATS = {
+    "rss": Rss201rev2Feed,
+    "atom": Atom1Feed,
+    "json": JSONFeed,
+}
+
+
+def build_feed(request, feed_format, author=None):
+    """
+    Returns ``(content, content_type, last_modified)`` of the feed of
+    the latest published posts, by the :model:`auth.User` ``author``
+    (a ``(pk, username)`` pair) if given. ``last_modified`` is ``None``
+    for a feed without posts.
+    """
+    posts = Post.objects.filter(status=1)
+    title = FEED_TITLE
+    if author is None:
+        url_name, url_args = f"post_feed_{feed_format}", []
+    else:
+        posts = posts.filter(author_id=author[0])
+        title = f"{FEED_TITLE}: posts by {author[1]}"
+        url_name, url_args = f"author_feed_{feed_format}", [author[1]]
+    rows = list(posts.order_by("-created_on", "-id").values(
+        *FEED_FIELDS)[:FEED_ITEMS])
+
+    feed = FEED_FORMATS[feed_format](
+        title=title,
+        link=request.build_absolute_uri(reverse("home")),
+        description=f"The latest posts on {title}.",
+        feed_url=request.build_absolute_uri(reverse(url_name, args=url_args)),
+        language="en",
+    )
+    for row in rows:
+        link = request.build_absolute_uri(
+            reverse("post_detail", args=[row["slug"]]))
+        feed.add_item(
+            title=row["title"],
+            link=link,
+            description=row["excerpt"],
+            unique_id=link,
+            pubdate=row["created_on"],
+            updateddate=row["updated_on"],
+            author_name=row["author__username"],
+        )
+    last_modified = max((row["updated_on"] for row in rows), default=None)
+    return feed.writeString("utf-8"), feed.content_type, last_modified
+
+
+def cached_feed(request, feed_format, author=None):
+    """
+    Returns :func:`build_feed` plus the ETag of the content, built at
+    most once per listing version, feed and host.
+    """
+    key = "blog:feed:{}:{}:{}:{}".format(
+        index_version(), feed_format, author[0] if author else "",
+        hashlib.md5(request.get_host().encode()).hexdigest())
+    feed = cache.get(key)
+    if feed is None:
+        content, content_type, last_modified = build_feed(
+            request, feed_format, author)
+        etag = hashlib.md5(content.encode()).hexdigest()
+        feed = (content, content_type, last_modified, etag)
+        cache.set(key, feed, settings.BLOG_CACHE_TIMEOUT)
+    return feed
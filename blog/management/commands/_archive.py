@@ -0,0 +1,183 @@
+"""
+Blog archives written by export_blog and read by import_blog.
+
+An archive is a gzip compressed JSON Lines file. The first line is
+:data:`HEADER`, then every row is one object with a ``model`` label and
+its fields, with posts first so that comments can refer to them.
+Posts are identified by slug and users by username, never by id, so an
+archive can be loaded into another database.
+
+The import functions run in pool workers, which import this module
+before Django is set up when processes are spawned rather than forked,
+so models are only imported inside them.
+"""
+import django
+from django.utils.dateparse import parse_datetime
+
+HEADER = {"format": "codestar-blog", "version": 1}
+# In the order they are written and must be imported
+MODELS = ["blog.post", "blog.comment", "about.about", "about.collaboraterequest"]
+# Post fields stored as they are, besides the slug, author and dates.
+# The fields derived from them are computed again on import.
+POST_FIELDS = [
+    "title", "featured_image", "image_width", "image_height", "content",
+    "excerpt", "status",
+]
+
+
+def init_worker():
+    django.setup()
+
+
+def import_chunk(label, rows, options):
+    """
+    Imports a chunk of rows of the model ``label`` and returns
+    ``(created, skipped, post_ids)``, ``post_ids`` being the posts whose
+    approved comment count must be recounted.
+    """
+    return IMPORTERS[label](rows, options)
+
+
+def resolve_users(usernames, create):
+    """
+    Returns ``{username: id}`` for the given usernames in one query,
+    first creating the missing users, without a usable password, if
+    ``create`` is set.
+    """
+    from django.contrib.auth.hashers import make_password
+    from django.contrib.auth.models import User
+    usernames = set(usernames)
+    ids = dict(User.objects.filter(username__in=usernames).values_list(
+        "username", "pk"))
+    missing = usernames - ids.keys()
+    if create and missing:
+        User.objects.bulk_create(
+            [User(username=name, password=make_password(None))
+             for name in missing],
+            ignore_conflicts=True)
+        ids.update(User.objects.filter(username__in=missing).values_list(
+            "username", "pk"))
+    return ids
+
+
+def import_posts(rows, options):
+    from blog.cache import bump_post_versions, bump_sitemap_versions
+    from blog.models import IMAGE_FIELDS, RENDERED_FIELDS, Post
+    from ._seed import explicit_timestamps
+
+    authors = resolve_users((row["author"] for row in rows),
+                            options["create_users"])
+    slugs = [row["slug"] for row in rows]
+    update = options["on_conflict"] == "update"
+    existing = set() if update else set(Post.objects.filter(
+        slug__in=slugs).values_list("slug", flat=True))
+    posts = []
+    for row in rows:
+        if row["slug"] in existing or row["author"] not in authors:
+            continue
+        post = Post(slug=row["slug"], author_id=authors[row["author"]],
+                    created_on=parse_datetime(row["created_on"]),
+                    updated_on=parse_datetime(row["updated_on"]),
+                    **{field: row[field] for field in POST_FIELDS})
+        post.render()
+        post.update_metadata()
+        post.update_image_flags()
+        posts.append(post)
+
+    with explicit_timestamps(Post):
+        if update:
+            Post.objects.bulk_create(
+                posts, update_conflicts=True, unique_fields=["slug"],
+                update_fields=["author", *POST_FIELDS, "created_on",
+                               "updated_on", *RENDERED_FIELDS, *IMAGE_FIELDS])
+        else:
+            # Also skips posts created by another worker meanwhile
+            Post.objects.bulk_create(posts, ignore_conflicts=True)
+    # bulk_create skips the model signals
+    slugs = [post.slug for post in posts]
+    bump_post_versions(*slugs)
+    bump_sitemap_versions(*Post.objects.filter(slug__in=slugs).values_list(
+        "pk", flat=True))
+    return len(posts), len(rows) - len(posts), []
+
+
+def import_comments(rows, options):
+    from blog.models import Comment, Post
+    from ._seed import explicit_timestamps
+
+    authors = resolve_users((row["author"] for row in rows),
+                            options["create_users"])
+    posts = dict(Post.objects.filter(
+        slug__in={row["post"] for row in rows}).values_list("slug", "pk"))
+    comments = []
+    for row in rows:
+        if row["post"] in posts and row["author"] in authors:
+            comments.append(Comment(
+                post_id=posts[row["post"]], author_id=authors[row["author"]],
+                body=row["body"], approved=row["approved"],
+                created_on=parse_datetime(row["created_on"]),
+                # Archives written before comments had updated_on
+                updated_on=parse_datetime(
+                    row.get("updated_on") or row["created_on"])))
+
+    # Comments have no natural key, so one by the same author on the
+    # same post at the same instant is taken as already imported.
+    existing = set()
+    if comments:
+        existing = set(Comment.objects.filter(
+            post_id__in={comment.post_id for comment in comments},
+            created_on__range=(min(c.created_on for c in comments),
+                               max(c.created_on for c in comments)),
+        ).values_list("post_id", "author_id", "created_on"))
+    comments = [
+        comment for comment in comments
+        if (comment.post_id, comment.author_id, comment.created_on)
+        not in existing
+    ]
+    with explicit_timestamps(Comment):
+        Comment.objects.bulk_create(comments)
+    return (len(comments), len(rows) - len(comments),
+            sorted({comment.post_id for comment in comments}))
+
+
+def import_abouts(rows, options):
+    from about.models import About
+    from ._seed import explicit_timestamps
+
+    abouts = [
+        About(title=row["title"], profile_image=row["profile_image"],
+              content=row["content"],
+              updated_on=parse_datetime(row["updated_on"]))
+        for row in rows
+    ]
+    existing = set(About.objects.filter(
+        title__in={about.title for about in abouts}).values_list(
+        "title", "updated_on"))
+    abouts = [about for about in abouts
+              if (about.title, about.updated_on) not in existing]
+    with explicit_timestamps(About):
+        About.objects.bulk_create(abouts)
+    return len(abouts), len(rows) - len(abouts), []
+
+
+def import_collaborate_requests(rows, options):
+    from about.models import CollaborateRequest
+
+    existing = set(CollaborateRequest.objects.filter(
+        email__in={row["email"] for row in rows}).values_list(
+        "email", "message"))
+    requests = [
+        CollaborateRequest(name=row["name"], email=row["email"],
+                           message=row["message"], read=row["read"])
+        for row in rows if (row["email"], row["message"]) not in existing
+    ]
+    CollaborateRequest.objects.bulk_create(requests)
+    return len(requests), len(rows) - len(requests), []
+
+
+IMPORTERS = {
+    "blog.post": import_posts,
+    "blog.comment": import_comments,
+    "about.about": import_abouts,
+    "about.collaboraterequest": import_collaborate_requests,
+}
@@ -0,0 +1,37 @@
+from blog.cache import bump_index_version, bump_post_versions, bump_sitemap_versions
+
+
+def update_in_batches(queryset, fields, update, batch_size):
+    """
+    Streams ``queryset`` with ``iterator()`` and calls ``update(post)``
+    on every post, which returns ``True`` if it changed the post.
+
+    Changed posts are written with one ``bulk_update`` of ``fields`` per
+    ``batch_size`` posts, so memory stays bounded and each write locks
+    the rows only briefly. Yields the ``(seen, updated)`` totals after
+    every batch so commands can report progress.
+    """
+    seen = updated = 0
+    changed = []
+    for post in queryset.iterator(chunk_size=batch_size):
+        seen += 1
+        if update(post):
+            changed.append(post)
+        if seen % batch_size == 0:
+            updated += _save(queryset.model, changed, fields)
+            changed = []
+            yield seen, updated
+    if seen == 0 or seen % batch_size:
+        updated += _save(queryset.model, changed, fields)
+        yield seen, updated
+
+
+def _save(model, posts, fields):
+    if posts:
+        model.objects.bulk_update(posts, fields)
+        # bulk_update skips the model signals, so invalidate the cached
+        # pages of the changed posts here.
+        bump_post_versions(*(post.slug for post in posts))
+        bump_index_version()
+        bump_sitemap_versions(*(post.pk for post in posts))
+    return len(posts)
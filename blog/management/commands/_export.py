@@ -0,0 +1,80 @@
+"""
+Worker side of the export_static command.
+
+The pool workers import this module before Django is set up when
+processes are spawned rather than forked, so it must not import models
+at module level.
+"""
+import logging
+import os
+import tempfile
+import django
+
+# Set in every worker process by init_worker()
+_client = None
+_output_dir = None
+
+
+def output_path(output_dir, path):
+    """
+    Returns the file a URL path is exported to: ``index.html`` inside
+    the directory for paths ending in ``/``, ``<path>.html`` otherwise.
+    """
+    relative = path.lstrip("/")
+    if not relative or relative.endswith("/"):
+        relative += "index.html"
+    else:
+        relative += ".html"
+    return os.path.join(output_dir, *relative.split("/"))
+
+
+def init_worker(output_dir, host, secure):
+    """
+    Pool initializer giving the worker its own anonymous test client.
+    """
+    global _client, _output_dir
+    django.setup()
+    from django.test import Client
+    # One log line per exported page would drown the progress report
+    logging.getLogger("codestar.metrics").setLevel(logging.WARNING)
+    _client = Client(HTTP_HOST=host, secure=secure)
+    _output_dir = output_dir
+
+
+def render_page(task):
+    """
+    Renders the ``(path, target, links)`` task and writes the page to
+    ``target``, a URL path, after replacing the query string links in
+    ``links`` with the paths of their exported pages.
+
+    Returns ``(target, None)``, or ``(target, status_code)`` if the page
+    could not be rendered.
+    """
+    path, target, links = task
+    response = _client.get(path)
+    if response.status_code != 200:
+        return target, response.status_code
+    content = response.content
+    for link, exported in links.items():
+        content = content.replace(
+            f'href="{link}"'.encode(), f'href="{exported}"'.encode())
+    write_atomic(output_path(_output_dir, target), content)
+    return target, None
+
+
+def write_atomic(filename, content):
+    """
+    Writes ``content`` to a temporary file renamed over ``filename``, so
+    a server never sees a half written page.
+    """
+    directory = os.path.dirname(filename)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        os.chmod(temp, 0o644)
+        os.replace(temp, filename)
+    except BaseException:
+        os.unlink(temp)
+        raise
@@ -0,0 +1,240 @@
+import random
+from array import array
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.utils import timezone
+from about.models import About, CollaborateRequest
+from blog.cache import bump_index_version, bump_sitemap_versions
+from blog.models import Post, Comment
+from blog.paginators import PUBLISHED_COUNT_KEY
+from blog.rendering import make_excerpt, reading_time
+
+WORDS = (
+    "django blog post comment coffee bread travel python code cache query "
+    "index page server latency garden music film book walk city river "
+    "morning evening winter summer recipe note idea story"
+).split()
+SEED_PASSWORD = "password"
+# Stored instead of an uploaded image so no Cloudinary calls are made
+SAMPLE_IMAGE = ("image/upload/v1/seed/sample.jpg", 1600, 900)
+
+
+@contextmanager
+def explicit_timestamps(model):
+    """
+    Lets ``bulk_create`` store the ``auto_now``/``auto_now_add`` fields
+    of ``model`` as given instead of overwriting them with the time of
+    the insert.
+    """
+    fields = [field for field in model._meta.concrete_fields
+              if getattr(field, "auto_now", False)
+              or getattr(field, "auto_now_add", False)]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Seeder:
+    """
+    Generates blog data with ``bulk_create`` in batches of
+    ``batch_size`` rows, so memory use does not grow with the number of
+    rows beyond one array of ids per model.
+
+    Text is assembled from pools of paragraphs generated up front, and
+    the generated markup only uses ``<p>`` tags, which sanitizing
+    leaves unchanged, so posts need no rendering pass. ``skew`` above 1
+    makes a few posts collect most comments and a few users write most
+    posts and comments. All randomness comes from ``rng``, so the same
+    seed produces the same data.
+    """
+
+    def __init__(self, rng=None, prefix="seed", batch_size=1000, skew=1.0,
+                 paragraphs=(3, 8), comment_words=(5, 60), days=365,
+                 image_share=0.0, progress=None):
+        self.rng = rng or random.Random()
+        self.prefix = prefix
+        self.batch_size = batch_size
+        self.skew = skew
+        self.paragraphs = paragraphs
+        self.comment_words = comment_words
+        self.days = days
+        self.image_share = image_share
+        self.progress = progress or (lambda model, done, total: None)
+        self.now = timezone.now()
+        self.user_ids = array("q")
+        self.post_ids = array("q")
+        # Creation timestamps of the posts, in the order of post_ids
+        self.post_times = array("d")
+        # Indexes into post_ids, most popular first
+        self.popular_posts = array("q")
+        self.paragraph_pool = [self.text(40, 120) for _ in range(200)]
+        self.comment_pool = [self.text(*comment_words) for _ in range(500)]
+
+    def text(self, min_words, max_words):
+        words = self.rng.choices(WORDS, k=self.rng.randint(min_words, max_words))
+        return " ".join(words).capitalize() + "."
+
+    def pick(self, ids):
+        """
+        Returns a random item of ``ids``, the first ones being the most
+        likely when ``skew`` is above 1.
+        """
+        return ids[int(len(ids) * self.rng.random() ** self.skew)]
+
+    def batches(self, total):
+        for start in range(0, total, self.batch_size):
+            yield start, min(self.batch_size, total - start)
+
+    def users(self, count):
+        password = make_password(SEED_PASSWORD)
+        for start, size in self.batches(count):
+            users = [
+                User(username=f"{self.prefix}-user-{i}", password=password,
+                     email=f"{self.prefix}-user-{i}@example.com")
+                for i in range(start, start + size)
+            ]
+            User.objects.bulk_create(users)
+            self.user_ids.extend(self.saved_ids(
+                User, users, "username", [user.username for user in users]))
+            self.progress(User, start + size, count)
+
+    def posts(self, count):
+        if count == 0:
+            return
+        if not self.user_ids:
+            raise ValueError("Create users before posts.")
+        authors = self.shuffled(self.user_ids)
+        span = timedelta(days=self.days)
+        for start, size in self.batches(count):
+            posts = []
+            for i in range(start, start + size):
+                posts.append(self.make_post(i, count, authors, span))
+            with explicit_timestamps(Post):
+                Post.objects.bulk_create(posts)
+            self.post_ids.extend(self.saved_ids(
+                Post, posts, "slug", [post.slug for post in posts]))
+            self.post_times.extend(post.created_on.timestamp() for post in posts)
+            self.progress(Post, start + size, count)
+        self.popular_posts = self.shuffled(range(len(self.post_ids)))
+
+    def make_post(self, i, count, authors, span):
+        paragraphs = self.rng.choices(
+            self.paragraph_pool, k=self.rng.randint(*self.paragraphs))
+        content = "".join(f"<p>{paragraph}</p>" for paragraph in paragraphs)
+        word_count = sum(len(paragraph.split()) for paragraph in paragraphs)
+        # Spread over the last `days` days, oldest first
+        created_on = self.now - span + span * (i + self.rng.random()) / count
+        post = Post(
+            title=f"{self.prefix.capitalize()} post {i}",
+            slug=f"{self.prefix}-post-{i}",
+            author_id=self.pick(authors),
+            content=content,
+            rendered_content=content,
+            excerpt=make_excerpt(paragraphs[0]),
+            word_count=word_count,
+            reading_time=reading_time(word_count),
+            status=int(self.rng.random() < 0.9),
+            created_on=created_on,
+            updated_on=created_on,
+        )
+        if self.rng.random() < self.image_share:
+            post.featured_image, post.image_width, post.image_height = SAMPLE_IMAGE
+        post.update_image_flags()
+        return post
+
+    def comments(self, count):
+        if count == 0:
+            return
+        if not self.popular_posts:
+            raise ValueError("Create posts before comments.")
+        authors = self.shuffled(self.user_ids)
+        now = self.now.timestamp()
+        for start, size in self.batches(count):
+            comments = []
+            for _ in range(size):
+                index = self.pick(self.popular_posts)
+                posted = self.post_times[index]
+                created_on = datetime.fromtimestamp(
+                    posted + (now - posted) * self.rng.random(), dt_timezone.utc)
+                comments.append(Comment(
+                    post_id=self.post_ids[index], author_id=self.pick(authors),
+                    body=self.rng.choice(self.comment_pool),
+                    approved=self.rng.random() < 0.8, created_on=created_on,
+                    updated_on=created_on))
+            with explicit_timestamps(Comment):
+                Comment.objects.bulk_create(comments)
+            self.progress(Comment, start + size, count)
+        # bulk_create skips Comment.save(), which keeps the counts
+        for start, size in self.batches(len(self.post_ids)):
+            Post.recount_approved_comments(
+                list(self.post_ids[start:start + size]))
+
+    def abouts(self, count):
+        for start, size in self.batches(count):
+            About.objects.bulk_create([
+                About(title=f"About {i}", content="\n\n".join(
+                    self.rng.choices(self.paragraph_pool, k=3)))
+                for i in range(start, start + size)
+            ])
+            self.progress(About, start + size, count)
+
+    def collaborate_requests(self, count):
+        for start, size in self.batches(count):
+            CollaborateRequest.objects.bulk_create([
+                CollaborateRequest(
+                    name=f"{self.prefix} visitor {i}",
+                    email=f"{self.prefix}-visitor-{i}@example.com",
+                    message=self.rng.choice(self.comment_pool),
+                    read=self.rng.random() < 0.5)
+                for i in range(start, start + size)
+            ])
+            self.progress(CollaborateRequest, start + size, count)
+
+    def finish(self):
+        """
+        Invalidates what the skipped model signals would have.
+        """
+        cache.delete(PUBLISHED_COUNT_KEY)
+        bump_index_version()
+        bump_sitemap_versions(*self.post_ids)
+
+    def shuffled(self, ids):
+        ids = array("q", ids)
+        self.rng.shuffle(ids)
+        return ids
+
+    @staticmethod
+    def saved_ids(model, objs, field, values):
+        # Backends that cannot return ids from a bulk insert leave pk unset
+        if objs and objs[0].pk is not None:
+            return [obj.pk for obj in objs]
+        ids = dict(model.objects.filter(**{f"{field}__in": values})
+                   .values_list(field, "pk"))
+        return [ids[value] for value in values]
+
+
+def seed_blog(users, posts, comments, batch_size=1000, rng=None,
+              prefix="seed", **options):
+    """
+    Creates ``users``, ``posts`` (nine in ten published) and
+    ``comments`` (four in five approved) with a :class:`Seeder`, plus
+    an about page if there is none. Usernames and slugs start with
+    ``prefix``. Other keyword arguments are passed to the
+    :class:`Seeder`.
+    """
+    seeder = Seeder(rng=rng, prefix=prefix, batch_size=batch_size, **options)
+    seeder.users(users)
+    seeder.posts(posts)
+    seeder.comments(comments)
+    if not About.objects.exists():
+        seeder.abouts(1)
+    seeder.finish()
+    return seeder
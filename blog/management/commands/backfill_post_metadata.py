@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from blog.models import METADATA_FIELDS, Post
+from ._batch import update_in_batches
+
+
+class Command(BaseCommand):
+    help = (
+        "Computes the word count, reading time and missing excerpts of "
+        "posts in batches, with bounded memory."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=1000,
+            help="Number of posts read and updated at a time.")
+        parser.add_argument(
+            "--missing-only", action="store_true",
+            help="Only process posts without a word count or an excerpt.")
+
+    def handle(self, *args, **options):
+        posts = Post.objects.only(
+            "id", "slug", "rendered_content", *METADATA_FIELDS).order_by("pk")
+        if options["missing_only"]:
+            posts = posts.filter(Q(word_count=0) | Q(excerpt=""))
+
+        def update(post):
+            before = [getattr(post, field) for field in METADATA_FIELDS]
+            post.update_metadata()
+            return [getattr(post, field) for field in METADATA_FIELDS] != before
+
+        for seen, updated in update_in_batches(
+                posts, METADATA_FIELDS, update, options["batch_size"]):
+            self.stdout.write(f"Processed {seen} posts, updated {updated}.")
+        self.stdout.write(self.style.SUCCESS(
+            f"Updated the metadata of {updated} of {seen} posts."))
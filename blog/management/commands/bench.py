@@ -0,0 +1,273 @@
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+import requests
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import WSGIServer, get_internal_wsgi_application
+from django.test import Client, override_settings
+from django.test.testcases import QuietWSGIRequestHandler
+from django.test.utils import setup_databases, teardown_databases
+from blog.models import Post
+from ._seed import seed_blog
+
+QUERIES_RE = re.compile(r'desc="(\d+) queries"')
+
+
+def percentile(values, fraction):
+    """
+    Returns the value below which ``fraction`` of the sorted ``values`` lie.
+    """
+    index = min(len(values) - 1, int(round(fraction * (len(values) - 1))))
+    return values[index]
+
+
+def benchmark_settings():
+    """
+    Returns the settings benchmarks override: comments are queued rather
+    than moderated inline, and static files use the plain storage until
+    collectstatic has written a manifest.
+    """
+    overrides = {"COMMENT_QUEUE_EAGER": False}
+    if not os.path.exists(os.path.join(settings.STATIC_ROOT, "staticfiles.json")):
+        storages = dict(settings.STORAGES)
+        storages["staticfiles"] = {
+            "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"}
+        overrides["STORAGES"] = storages
+    return overrides
+
+
+class TestClientDriver:
+    """
+    Sends requests through the Django test client, in process.
+    """
+
+    def __init__(self):
+        self.anonymous = Client(HTTP_HOST="localhost")
+        self.user = Client(HTTP_HOST="localhost")
+
+    def login(self, user):
+        self.user.force_login(user)
+
+    def get(self, path):
+        return self.anonymous.get(path)
+
+    def post(self, path, data):
+        return self.user.post(path, data)
+
+    def close(self):
+        pass
+
+
+class HTTPDriver:
+    """
+    Sends requests over HTTP to a WSGI server started in a thread.
+    """
+
+    def __init__(self):
+        self.server = WSGIServer(("127.0.0.1", 0), QuietWSGIRequestHandler)
+        self.server.set_app(get_internal_wsgi_application())
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       daemon=True)
+        self.thread.start()
+        self.base_url = f"http://localhost:{self.server.server_port}"
+        self.anonymous = requests.Session()
+        self.user = requests.Session()
+
+    def login(self, user):
+        # Borrow a session from the test client, then fetch a CSRF cookie
+        client = Client()
+        client.force_login(user)
+        self.user.cookies.set(settings.SESSION_COOKIE_NAME,
+                              client.cookies[settings.SESSION_COOKIE_NAME].value)
+
+    def get(self, path):
+        return self.anonymous.get(self.base_url + path)
+
+    def post(self, path, data):
+        if settings.CSRF_COOKIE_NAME not in self.user.cookies:
+            self.user.get(self.base_url + path)
+        return self.user.post(
+            self.base_url + path, data,
+            headers={"X-CSRFToken": self.user.cookies[settings.CSRF_COOKIE_NAME]})
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds a throwaway test database with users, posts and comments, "
+        "then times the main blog pages and reports throughput, "
+        "p50/p95/p99 latency and query counts per scenario. With "
+        "--baseline, fails when a scenario runs more queries or is "
+        "slower than the stored baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=50)
+        parser.add_argument("--posts", type=int, default=500)
+        parser.add_argument("--comments", type=int, default=5000)
+        parser.add_argument(
+            "--requests", type=int, default=100,
+            help="Requests per scenario.")
+        parser.add_argument(
+            "--http", action="store_true",
+            help="Send the requests over HTTP to a local server instead "
+                 "of through the test client.")
+        parser.add_argument(
+            "--no-page-cache", action="store_true",
+            help="Disable the anonymous page cache.")
+        parser.add_argument("--seed", type=int, default=0,
+                            help="Random seed for the data and requests.")
+        parser.add_argument(
+            "--baseline",
+            help="JSON file of results to compare against, or to write "
+                 "with --save-baseline.")
+        parser.add_argument("--save-baseline", action="store_true")
+        parser.add_argument(
+            "--tolerance", type=float, default=0.25,
+            help="Allowed p95 slowdown against the baseline (0.25 = 25%%).")
+        parser.add_argument(
+            "--current-db", action="store_true",
+            help="Seed and use the configured database instead of a "
+                 "throwaway test database.")
+
+    def handle(self, *args, **options):
+        # One log line per request would drown the report
+        logging.getLogger("codestar.metrics").setLevel(logging.WARNING)
+        if options["save_baseline"] and not options["baseline"]:
+            raise CommandError("--save-baseline needs --baseline.")
+        old_config = None
+        if not options["current_db"]:
+            old_config = setup_databases(
+                verbosity=0, interactive=False, aliases={"default"})
+        try:
+            overrides = benchmark_settings()
+            if options["no_page_cache"]:
+                overrides["BLOG_CACHE_TIMEOUT"] = 0
+            with override_settings(**overrides):
+                results = self.run(options)
+        finally:
+            if old_config is not None:
+                teardown_databases(old_config, verbosity=0)
+
+        self.report(results)
+        if options["baseline"]:
+            if options["save_baseline"]:
+                with open(options["baseline"], "w") as f:
+                    json.dump(results, f, indent=2, sort_keys=True)
+                self.stdout.write(f"Saved the baseline to {options['baseline']}.")
+            else:
+                self.compare(results, options["baseline"], options["tolerance"])
+
+    def run(self, options):
+        rng = random.Random(options["seed"])
+        if User.objects.filter(username__startswith="bench-user-").exists():
+            # Left by an earlier --current-db run
+            self.stdout.write("Reusing the existing benchmark data.")
+        else:
+            started = time.perf_counter()
+            seed_blog(options["users"], options["posts"], options["comments"],
+                      rng=rng, prefix="bench")
+            self.stdout.write(
+                f"Seeded {options['users']} users, {options['posts']} posts "
+                f"and {options['comments']} comments in "
+                f"{time.perf_counter() - started:.1f}s.")
+        cache.clear()
+
+        slugs = list(Post.objects.filter(status=1).values_list("slug", flat=True))
+        if not slugs:
+            raise CommandError("Seed at least one published post.")
+        pages = max(1, len(slugs) // 6)
+        driver = HTTPDriver() if options["http"] else TestClientDriver()
+        driver.login(User.objects.filter(username__startswith="bench-user-")[0])
+        try:
+            state = {"after": ""}
+
+            def index_cursor():
+                after = state["after"]
+                response = driver.get(f"/?after={after}" if after else "/")
+                match = re.search(rb'\?after=([\w-]+)"', response.content)
+                state["after"] = match.group(1).decode() if match else ""
+                return response
+
+            scenarios = {
+                "home": lambda: driver.get("/"),
+                "index_page": lambda: driver.get(f"/?page={rng.randint(1, pages)}"),
+                "index_cursor": index_cursor,
+                "post_detail": lambda: driver.get(f"/{rng.choice(slugs)}/"),
+                "comment_post": lambda: driver.post(
+                    f"/{rng.choice(slugs)}/", {"body": "A benchmark comment"}),
+                "about": lambda: driver.get("/about/childabout"),
+            }
+            return {name: self.measure(name, request, options["requests"])
+                    for name, request in scenarios.items()}
+        finally:
+            driver.close()
+
+    def measure(self, name, request, count):
+        timings = []
+        queries = []
+        started = time.perf_counter()
+        for _ in range(count):
+            request_started = time.perf_counter()
+            response = request()
+            timings.append(time.perf_counter() - request_started)
+            if response.status_code != 200:
+                raise CommandError(
+                    f"{name} answered with status {response.status_code}.")
+            match = QUERIES_RE.search(response.headers.get("Server-Timing", ""))
+            if match:
+                queries.append(int(match.group(1)))
+        elapsed = time.perf_counter() - started
+        timings.sort()
+        return {
+            "requests": count,
+            "throughput": round(count / elapsed, 1),
+            "p50_ms": round(percentile(timings, 0.5) * 1000, 2),
+            "p95_ms": round(percentile(timings, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(timings, 0.99) * 1000, 2),
+            "max_queries": max(queries) if queries else None,
+        }
+
+    def report(self, results):
+        self.stdout.write(
+            f"{'scenario':<14}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}"
+            f"{'p99 ms':>9}{'queries':>9}")
+        for name, result in results.items():
+            queries = result["max_queries"]
+            self.stdout.write(
+                f"{name:<14}{result['throughput']:>9}{result['p50_ms']:>9}"
+                f"{result['p95_ms']:>9}{result['p99_ms']:>9}"
+                f"{'-' if queries is None else queries:>9}")
+
+    def compare(self, results, path, tolerance):
+        with open(path) as f:
+            baseline = json.load(f)
+        regressions = []
+        for name, expected in baseline.items():
+            result = results.get(name)
+            if result is None:
+                continue
+            if (expected["max_queries"] is not None and result["max_queries"] is not None
+                    and result["max_queries"] > expected["max_queries"]):
+                regressions.append(
+                    f"{name} ran {result['max_queries']} queries, "
+                    f"{expected['max_queries']} in the baseline")
+            limit = expected["p95_ms"] * (1 + tolerance)
+            if result["p95_ms"] > limit:
+                regressions.append(
+                    f"{name} p95 is {result['p95_ms']}ms, over {limit:.2f}ms "
+                    f"({expected['p95_ms']}ms in the baseline)")
+        if regressions:
+            raise CommandError(
+                "Performance regressions:\n" + "\n".join(regressions))
+        self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
@@ -0,0 +1,123 @@
+import copy
+import logging
+import random
+import re
+import time
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django.test.utils import setup_databases, teardown_databases
+from blog.models import Post
+from blog.templatetags.blog_forms import clear_form_cache
+from ._seed import seed_blog
+from .bench import benchmark_settings, percentile
+
+TEMPLATE_RE = re.compile(r"tpl;dur=([\d.]+)")
+
+
+def uncached_templates():
+    """
+    Returns ``settings.TEMPLATES`` without the cached template loader,
+    so every request parses the templates again.
+    """
+    templates = copy.deepcopy(settings.TEMPLATES)
+    for config in templates:
+        config["OPTIONS"]["loaders"] = [
+            loader for cached, loaders in config["OPTIONS"]["loaders"]
+            for loader in loaders]
+    return templates
+
+
+class Command(BaseCommand):
+    help = (
+        "Renders the page of a post with a long comment thread as a "
+        "signed in user, first without the cached template loader and "
+        "form cache, then with each of them, and reports how long "
+        "rendering and the whole request took."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--comments", type=int, default=2000,
+                            help="Comments on the post.")
+        parser.add_argument("--requests", type=int, default=100,
+                            help="Requests per variant.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--current-db", action="store_true",
+            help="Seed and use the configured database instead of a "
+                 "throwaway test database.")
+
+    def handle(self, *args, **options):
+        # One log line per request would drown the report
+        logging.getLogger("codestar.metrics").setLevel(logging.WARNING)
+        old_config = None
+        if not options["current_db"]:
+            old_config = setup_databases(
+                verbosity=0, interactive=False, aliases={"default"})
+        try:
+            with override_settings(**benchmark_settings()):
+                results = self.run(options)
+        finally:
+            if old_config is not None:
+                teardown_databases(old_config, verbosity=0)
+        self.report(results)
+
+    def run(self, options):
+        seeder = seed_blog(5, 1, options["comments"],
+                           rng=random.Random(options["seed"]), prefix="tplbench")
+        post = Post.objects.get(pk=seeder.post_ids[0])
+        if post.status != 1:
+            post.status = 1
+            post.save(update_fields=["status"])
+        client = Client(HTTP_HOST="localhost")
+        client.force_login(User.objects.get(pk=seeder.user_ids[0]))
+        path = f"/{post.slug}/"
+
+        variants = [
+            ("no caches", uncached_templates(), False),
+            ("cached loader", settings.TEMPLATES, False),
+            ("cached loader + form", settings.TEMPLATES, True),
+        ]
+        results = {}
+        for name, templates, form_cache in variants:
+            with override_settings(TEMPLATES=templates):
+                cache.clear()
+                clear_form_cache()
+                client.get(path)
+                results[name] = self.measure(
+                    client, path, options["requests"], form_cache)
+        return results
+
+    def measure(self, client, path, count, form_cache):
+        totals = []
+        renders = []
+        for _ in range(count):
+            if not form_cache:
+                clear_form_cache()
+            started = time.perf_counter()
+            response = client.get(path)
+            totals.append(time.perf_counter() - started)
+            renders.append(float(TEMPLATE_RE.search(
+                response.headers["Server-Timing"]).group(1)))
+        totals.sort()
+        renders.sort()
+        return {
+            "render_p50_ms": percentile(renders, 0.5),
+            "p50_ms": round(percentile(totals, 0.5) * 1000, 2),
+            "p95_ms": round(percentile(totals, 0.95) * 1000, 2),
+        }
+
+    def report(self, results):
+        self.stdout.write(
+            f"{'variant':<22}{'render p50':>12}{'p50 ms':>9}{'p95 ms':>9}")
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<22}{result['render_p50_ms']:>12}"
+                f"{result['p50_ms']:>9}{result['p95_ms']:>9}")
+        before, after = results["no caches"], results["cached loader + form"]
+        self.stdout.write(
+            f"Rendering takes {after['render_p50_ms']}ms instead of "
+            f"{before['render_p50_ms']}ms, requests {after['p50_ms']}ms "
+            f"instead of {before['p50_ms']}ms (p50).")
@@ -0,0 +1,122 @@
+import os
+import subprocess
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+
+# Server command and settings of each stack. The async stack runs the
+# async views under uvicorn workers managed by gunicorn.
+STACKS = {
+    "sync": (["gunicorn", "codestar.wsgi"], {"ASYNC_VIEWS": "False"}),
+    "async": (
+        ["gunicorn", "codestar.asgi:application",
+         "--worker-class", "uvicorn.workers.UvicornWorker"],
+        {"ASYNC_VIEWS": "True"},
+    ),
+}
+
+
+def percentile(values, fraction):
+    """
+    Returns the value below which ``fraction`` of the sorted ``values`` lie.
+    """
+    index = min(len(values) - 1, int(round(fraction * (len(values) - 1))))
+    return values[index]
+
+
+class Command(BaseCommand):
+    help = (
+        "Starts the site under the sync (WSGI) and async (ASGI) stacks in "
+        "turn and compares requests per second and latency percentiles "
+        "under concurrent load. The servers use the current environment, "
+        "so point DATABASE_URL at a database with some published posts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--path", action="append", dest="paths",
+            help="URL path to request, may be repeated (default: /).")
+        parser.add_argument(
+            "--stack", action="append", dest="stacks", choices=STACKS,
+            help="Stack to benchmark, may be repeated (default: both).")
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--concurrency", type=int, default=20)
+        parser.add_argument(
+            "--workers", type=int, default=2,
+            help="Server worker processes per stack.")
+        parser.add_argument("--port", type=int, default=8100)
+        parser.add_argument(
+            "--no-page-cache", action="store_true",
+            help="Disable the anonymous page cache so every request "
+                 "reaches the views and the database.")
+
+    def handle(self, *args, **options):
+        paths = options["paths"] or ["/"]
+        results = {}
+        for name in options["stacks"] or list(STACKS):
+            self.stdout.write(f"Benchmarking the {name} stack...")
+            results[name] = self.run_stack(name, paths, options)
+
+        self.stdout.write(
+            f"{'stack':<8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+        for name, (rate, p50, p99, errors) in results.items():
+            self.stdout.write(
+                f"{name:<8}{rate:>10.1f}{p50:>10.1f}{p99:>10.1f}{errors:>8}")
+
+    def run_stack(self, name, paths, options):
+        command, env = STACKS[name]
+        env = {**os.environ, **env}
+        if options["no_page_cache"]:
+            env["BLOG_CACHE_TIMEOUT"] = "0"
+        base_url = f"http://127.0.0.1:{options['port']}"
+        server = subprocess.Popen(
+            command + ["--bind", f"127.0.0.1:{options['port']}",
+                       "--workers", str(options["workers"])],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            self.wait_for(server, base_url + paths[0])
+            urls = [base_url + paths[i % len(paths)]
+                    for i in range(options["requests"])]
+            # Warm up connections, caches and lazily imported code
+            for url in urls[:options["concurrency"]]:
+                self.fetch(url)
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(options["concurrency"]) as pool:
+                timings = list(pool.map(self.fetch, urls))
+            elapsed = time.perf_counter() - started
+        finally:
+            server.terminate()
+            server.wait()
+
+        latencies = sorted(latency for latency, ok in timings)
+        errors = sum(1 for latency, ok in timings if not ok)
+        return (len(urls) / elapsed, percentile(latencies, 0.5) * 1000,
+                percentile(latencies, 0.99) * 1000, errors)
+
+    def wait_for(self, server, url, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(
+                    f"The server exited with status {server.returncode}.")
+            if self.fetch(url)[1]:
+                return
+            time.sleep(0.2)
+        raise CommandError(f"The server did not answer {url} in time.")
+
+    @staticmethod
+    def fetch(url):
+        """
+        Requests ``url`` and returns ``(seconds taken, succeeded)``.
+        """
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(url, timeout=30) as response:
+                response.read()
+                ok = response.status == 200
+        except (urllib.error.URLError, OSError):
+            ok = False
+        return time.perf_counter() - started, ok
@@ -0,0 +1,100 @@
+import gzip
+import json
+import time
+from django.core.management.base import BaseCommand
+from about.models import About, CollaborateRequest
+from blog.models import Post, Comment
+from ._archive import HEADER, POST_FIELDS
+
+
+def json_default(value):
+    # Datetimes keep their microseconds, unlike with DjangoJSONEncoder
+    return value.isoformat()
+
+
+def archive_fields():
+    """
+    Returns ``{label: (queryset, fields, converters)}`` for every model
+    in the archive, ``fields`` mapping the archive fields to the
+    ``values_list()`` lookups they are read from and ``converters`` the
+    functions turning some of those values into JSON.
+    """
+    image_field = Post._meta.get_field("featured_image")
+    return {
+        "blog.post": (
+            Post.objects.all(),
+            {"slug": "slug", "author": "author__username",
+             **{field: field for field in POST_FIELDS},
+             "created_on": "created_on", "updated_on": "updated_on"},
+            {"featured_image": image_field.get_prep_value},
+        ),
+        "blog.comment": (
+            Comment.objects.all(),
+            {"post": "post__slug", "author": "author__username",
+             "body": "body", "approved": "approved",
+             "created_on": "created_on", "updated_on": "updated_on"},
+            {},
+        ),
+        "about.about": (
+            About.objects.all(),
+            {"title": "title", "profile_image": "profile_image",
+             "content": "content", "updated_on": "updated_on"},
+            {"profile_image": About._meta.get_field(
+                "profile_image").get_prep_value},
+        ),
+        "about.collaboraterequest": (
+            CollaborateRequest.objects.all(),
+            {"name": "name", "email": "email", "message": "message",
+             "read": "read"},
+            {},
+        ),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Writes the posts, comments, about pages and collaboration "
+        "requests to a gzip compressed JSON Lines archive for import_blog. "
+        "Rows are streamed from the database in batches, so memory stays "
+        "flat however large the tables are."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("archive", help="File to write, e.g. blog.jsonl.gz.")
+        parser.add_argument(
+            "--batch-size", type=int, default=2000,
+            help="Rows read from the database at a time.")
+        parser.add_argument(
+            "--compress-level", type=int, default=6, choices=range(1, 10),
+            help="gzip level, 1 is fastest and 9 smallest.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        batch_size = options["batch_size"]
+        with gzip.open(options["archive"], "wt", encoding="utf-8",
+                       compresslevel=options["compress_level"]) as archive:
+            archive.write(json.dumps(HEADER) + "\n")
+            for label, (queryset, fields, converters) in archive_fields().items():
+                total = queryset.count()
+                rows = queryset.order_by("pk").values_list(
+                    *fields.values()).iterator(chunk_size=batch_size)
+                done = 0
+                for values in rows:
+                    row = {"model": label}
+                    for name, value in zip(fields, values):
+                        if name in converters:
+                            value = converters[name](value)
+                        row[name] = value
+                    archive.write(
+                        json.dumps(row, default=json_default) + "\n")
+                    done += 1
+                    if done % batch_size == 0:
+                        self.progress(label, done, total)
+                if done == 0 or done % batch_size:
+                    self.progress(label, done, total)
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported the blog to {options['archive']} in "
+            f"{time.perf_counter() - started:.1f}s."))
+
+    def progress(self, label, done, total):
+        self.stdout.write(f"{label}: {done:,}/{total:,}")
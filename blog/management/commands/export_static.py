@@ -0,0 +1,210 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.urls import reverse
+from about.models import About
+from blog.cache import index_etag, iter_post_etags
+from blog.paginators import encode_cursor
+from blog.views import PostList
+from ._export import init_worker, output_path, render_page
+
+MANIFEST_NAME = ".export-manifest.json"
+
+
+def index_page_path(number):
+    return reverse("home") if number == 1 else f"{reverse('home')}page/{number}/"
+
+
+def index_tasks(chunk_size=2000):
+    """
+    Returns the render tasks of every page of the post listing.
+
+    The cursors of the pages are read from one streamed query over
+    ``(created_on, id)``, so the pages can be rendered in any order.
+    Their ``?after=``/``?before=`` links are replaced with the exported
+    ``/page/<n>/`` paths.
+    """
+    per_page = PostList.paginate_by
+    posts = PostList.queryset.select_related(None).order_by(
+        "-created_on", "-id").only("id", "created_on")
+    pages = []
+    first = last = None
+    for i, post in enumerate(posts.iterator(chunk_size=chunk_size)):
+        if i % per_page == 0:
+            if first is not None:
+                pages.append((encode_cursor(first), encode_cursor(last)))
+            first = post
+        last = post
+    if first is not None:
+        pages.append((encode_cursor(first), encode_cursor(last)))
+
+    if not pages:
+        return [(reverse("home"), index_page_path(1), {})]
+    tasks = []
+    for number, (first, last) in enumerate(pages, start=1):
+        path = reverse("home")
+        if number > 1:
+            path += f"?after={pages[number - 2][1]}"
+        links = {}
+        if number > 1:
+            links[f"?before={first}"] = index_page_path(number - 1)
+        if number < len(pages):
+            links[f"?after={last}"] = index_page_path(number + 1)
+        tasks.append((path, index_page_path(number), links))
+    return tasks
+
+
+class Command(BaseCommand):
+    help = (
+        "Renders the home page listing, every published post and the "
+        "about page to HTML files as anonymous readers see them, in "
+        "parallel worker processes. With --incremental, only the pages "
+        "that changed since the last export are rendered again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("output_dir",
+                            help="Directory the pages are written to.")
+        parser.add_argument(
+            "--incremental", action="store_true",
+            help="Only render posts whose updated_on or approved comments "
+                 "changed, and the listing and about pages if they "
+                 "changed, since the export recorded in the manifest.")
+        parser.add_argument(
+            "--workers", type=int, default=os.cpu_count(),
+            help="Number of rendering processes. 1 renders in this process.")
+        parser.add_argument(
+            "--host", default="localhost",
+            help="Host name the pages are rendered for, used in absolute "
+                 "links. Must be in ALLOWED_HOSTS.")
+        parser.add_argument("--https", action="store_true",
+                            help="Render the pages as served over HTTPS.")
+
+    def handle(self, *args, **options):
+        if options["workers"] < 1:
+            raise CommandError("--workers must be at least 1.")
+        # Pages link the hashed static files, which need the manifest
+        if (hasattr(staticfiles_storage, "manifest_name")
+                and not staticfiles_storage.exists(
+                    staticfiles_storage.manifest_name)):
+            raise CommandError(
+                "No staticfiles manifest found, run collectstatic first.")
+        output_dir = os.path.abspath(options["output_dir"])
+        manifest_file = os.path.join(output_dir, MANIFEST_NAME)
+        old = self.read_manifest(manifest_file)
+        if old.get("host") != options["host"]:
+            # Pages rendered for another host have the wrong absolute links
+            old = {}
+        current = old if options["incremental"] else {}
+
+        # The state is read before rendering, so a change made during the
+        # export is picked up by the next one.
+        manifest = {
+            "host": options["host"],
+            "index": index_etag(None),
+            "about": str(About.objects.order_by("-updated_on").values_list(
+                "updated_on", flat=True).first()),
+            "posts": dict(iter_post_etags()),
+        }
+
+        tasks = []
+        if manifest["index"] != current.get("index"):
+            tasks += index_tasks()
+            manifest["pages"] = len(tasks)
+        else:
+            manifest["pages"] = current["pages"]
+        if manifest["about"] != current.get("about"):
+            tasks.append((reverse("about"), reverse("about"), {}))
+        old_posts = current.get("posts", {})
+        tasks += [
+            (path, path, {})
+            for path in (reverse("post_detail", args=[slug])
+                         for slug, etag in manifest["posts"].items()
+                         if old_posts.get(slug) != etag)
+        ]
+
+        failed = self.render(tasks, output_dir, options)
+        removed = self.remove_stale(old, manifest, output_dir)
+
+        # Failed posts are left out of the manifest to be retried next time
+        for slug in list(manifest["posts"]):
+            if reverse("post_detail", args=[slug]) in failed:
+                del manifest["posts"][slug]
+        if reverse("about") in failed:
+            del manifest["about"]
+        if any(index_page_path(number) in failed
+               for number in range(1, manifest["pages"] + 1)):
+            del manifest["index"]
+        os.makedirs(output_dir, exist_ok=True)
+        with open(manifest_file, "w") as f:
+            json.dump(manifest, f)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported {len(tasks) - len(failed)} pages to {output_dir}, "
+            f"removed {removed}, {len(failed)} failed."))
+
+    def read_manifest(self, manifest_file):
+        try:
+            with open(manifest_file) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except ValueError as e:
+            raise CommandError(f"Invalid manifest {manifest_file}: {e}")
+
+    def render(self, tasks, output_dir, options):
+        """
+        Renders the tasks, in a process pool unless ``--workers=1``, and
+        returns the set of paths that could not be rendered.
+        """
+        initargs = (output_dir, options["host"], options["https"])
+        failed = set()
+        if options["workers"] == 1 or len(tasks) < 2:
+            init_worker(*initargs)
+            results = map(render_page, tasks)
+            self.report(results, len(tasks), failed)
+            return failed
+
+        # Forked workers must not share the parent's database connections
+        connections.close_all()
+        with ProcessPoolExecutor(options["workers"], initializer=init_worker,
+                                 initargs=initargs) as pool:
+            chunksize = max(1, min(50, len(tasks) // (4 * options["workers"])))
+            results = pool.map(render_page, tasks, chunksize=chunksize)
+            self.report(results, len(tasks), failed)
+        return failed
+
+    def report(self, results, total, failed):
+        for done, (path, error) in enumerate(results, start=1):
+            if error is not None:
+                failed.add(path)
+                self.stderr.write(f"{path} returned {error}, skipped.")
+            if done % 500 == 0 or done == total:
+                self.stdout.write(f"Rendered {done} of {total} pages.")
+
+    def remove_stale(self, old, manifest, output_dir):
+        """
+        Deletes the files of posts that are no longer published and of
+        listing pages past the last one. Returns how many were deleted.
+        """
+        paths = [reverse("post_detail", args=[slug])
+                 for slug in old.get("posts", {})
+                 if slug not in manifest["posts"]]
+        paths += [index_page_path(number) for number in range(
+            manifest["pages"] + 1, old.get("pages", 0) + 1)]
+        removed = 0
+        for path in paths:
+            filename = output_path(output_dir, path)
+            try:
+                os.remove(filename)
+                removed += 1
+                os.rmdir(os.path.dirname(filename))
+            except FileNotFoundError:
+                pass
+            except OSError:
+                # The directory holds other files
+                pass
+        return removed
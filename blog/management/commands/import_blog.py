@@ -0,0 +1,154 @@
+import gzip
+import json
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from blog.cache import bump_index_version, bump_post_versions
+from blog.models import Post
+from blog.paginators import PUBLISHED_COUNT_KEY
+from ._archive import HEADER, MODELS, import_chunk, init_worker
+
+
+class Command(BaseCommand):
+    help = (
+        "Loads an archive written by export_blog. Rows are read one at a "
+        "time and inserted with bulk_create in batches, optionally in "
+        "parallel worker processes, so memory stays bounded for archives "
+        "of any size. Authors are matched by username and posts by slug."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("archive", help="File written by export_blog.")
+        parser.add_argument(
+            "--batch-size", type=int, default=1000,
+            help="Rows inserted per query.")
+        parser.add_argument(
+            "--workers", type=int, default=1,
+            help="Number of processes importing batches. 1 imports in "
+                 "this process.")
+        parser.add_argument(
+            "--on-conflict", choices=["skip", "update"], default="skip",
+            help="What to do with posts whose slug already exists: keep "
+                 "the stored post or overwrite it with the archived one.")
+        parser.add_argument(
+            "--create-users", action="store_true",
+            help="Create missing authors, without a usable password, "
+                 "instead of skipping their posts and comments.")
+
+    def handle(self, *args, **options):
+        if options["workers"] < 1 or options["batch_size"] < 1:
+            raise CommandError("--workers and --batch-size must be at least 1.")
+        self.options = {"on_conflict": options["on_conflict"],
+                        "create_users": options["create_users"]}
+        self.batch_size = options["batch_size"]
+        # label: [created, skipped, started]
+        self.totals = {}
+        # Posts whose approved comment count changed
+        self.recount = set()
+        self.pending = deque()
+        self.pool = None
+        self.max_pending = 2 * options["workers"]
+        started = time.perf_counter()
+        if options["workers"] > 1:
+            # Forked workers must not share the parent's database connections
+            connections.close_all()
+            self.pool = ProcessPoolExecutor(
+                options["workers"], initializer=init_worker)
+        try:
+            self.read(options["archive"])
+        finally:
+            if self.pool is not None:
+                self.pool.shutdown(cancel_futures=True)
+
+        self.recount_comments()
+        # bulk_create skips the model signals
+        cache.delete(PUBLISHED_COUNT_KEY)
+        bump_index_version()
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {sum(total[0] for total in self.totals.values()):,} "
+            f"rows, skipped {sum(total[1] for total in self.totals.values()):,}, "
+            f"in {time.perf_counter() - started:.1f}s."))
+
+    def read(self, path):
+        try:
+            archive = gzip.open(path, "rt", encoding="utf-8")
+        except OSError as e:
+            raise CommandError(f"Cannot open {path}: {e}")
+        with archive:
+            try:
+                header = json.loads(archive.readline() or "null")
+            except (OSError, ValueError) as e:
+                raise CommandError(f"{path} is not a blog archive: {e}")
+            if header != HEADER:
+                raise CommandError(f"{path} is not a blog archive: {header}")
+
+            label = None
+            chunk = []
+            for number, line in enumerate(archive, start=2):
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    raise CommandError(f"Invalid row on line {number}: {e}")
+                if not isinstance(row, dict):
+                    raise CommandError(f"Invalid row on line {number}: {row}")
+                row_label = row.pop("model", None)
+                if row_label != label:
+                    if row_label not in MODELS or (
+                            label and MODELS.index(row_label) < MODELS.index(label)):
+                        raise CommandError(
+                            f"Unexpected {row_label} row on line {number}.")
+                    self.submit(label, chunk)
+                    chunk = []
+                    # Rows may refer to those of the previous models
+                    self.wait(0)
+                    label = row_label
+                chunk.append(row)
+                if len(chunk) == self.batch_size:
+                    self.submit(label, chunk)
+                    chunk = []
+            self.submit(label, chunk)
+            self.wait(0)
+
+    def submit(self, label, chunk):
+        if not chunk:
+            return
+        self.totals.setdefault(label, [0, 0, time.perf_counter()])
+        if self.pool is None:
+            self.collect(label, import_chunk(label, chunk, self.options))
+            return
+        self.pending.append((label, self.pool.submit(
+            import_chunk, label, chunk, self.options)))
+        self.wait(self.max_pending - 1)
+
+    def wait(self, pending):
+        """
+        Waits until at most ``pending`` batches are queued or running.
+        """
+        while len(self.pending) > pending:
+            label, future = self.pending.popleft()
+            self.collect(label, future.result())
+
+    def collect(self, label, result):
+        created, skipped, post_ids = result
+        total = self.totals[label]
+        total[0] += created
+        total[1] += skipped
+        self.recount.update(post_ids)
+        rate = (total[0] + total[1]) / (time.perf_counter() - total[2])
+        self.stdout.write(f"{label}: {total[0]:,} imported, {total[1]:,} "
+                          f"skipped ({rate:,.0f} rows/s)")
+
+    def recount_comments(self):
+        """
+        Updates ``approved_comment_count`` of the posts that received
+        comments, once all comments are in.
+        """
+        post_ids = sorted(self.recount)
+        for start in range(0, len(post_ids), self.batch_size):
+            batch = post_ids[start:start + self.batch_size]
+            Post.recount_approved_comments(batch)
+            bump_post_versions(*Post.objects.filter(pk__in=batch).values_list(
+                "slug", flat=True))
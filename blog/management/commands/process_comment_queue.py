@@ -0,0 +1,38 @@
+import time
+from django.core.management.base import BaseCommand
+from blog.queue import process_due_submissions
+
+
+class Command(BaseCommand):
+    help = (
+        "Moderates queued comment submissions and saves them as comments. "
+        "Runs until interrupted unless --once is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=20,
+            help="Number of submissions claimed at a time.")
+        parser.add_argument(
+            "--sleep", type=float, default=2,
+            help="Seconds to wait when the queue is empty.")
+        parser.add_argument(
+            "--once", action="store_true",
+            help="Process the submissions that are due and exit.")
+
+    def handle(self, *args, **options):
+        total = 0
+        try:
+            while True:
+                processed = process_due_submissions(options["batch_size"])
+                total += processed
+                if processed:
+                    self.stdout.write(f"Processed {processed} submissions.")
+                elif options["once"]:
+                    break
+                else:
+                    time.sleep(options["sleep"])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {total} comment submissions."))
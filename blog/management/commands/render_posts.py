@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from blog.models import Post
+from ._batch import update_in_batches
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds Post.rendered_content from Post.content for every post, "
+        "e.g. after changing the rendering rules in blog/rendering.py."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=500,
+            help="Number of posts read and updated at a time.")
+
+    def handle(self, *args, **options):
+        posts = Post.objects.only(
+            "id", "slug", "content", "rendered_content").order_by("pk")
+
+        def render(post):
+            rendered_content = post.rendered_content
+            post.render()
+            return post.rendered_content != rendered_content
+
+        for seen, updated in update_in_batches(
+                posts, ["rendered_content"], render, options["batch_size"]):
+            self.stdout.write(f"Processed {seen} posts, updated {updated}.")
+        self.stdout.write(self.style.SUCCESS(
+            f"Re-rendered {updated} of {seen} posts."))
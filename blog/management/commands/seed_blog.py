@@ -0,0 +1,98 @@
+import random
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from ._seed import Seeder
+
+
+def word_range(value):
+    """
+    Parses ``MIN:MAX`` into a pair of integers.
+    """
+    low, _, high = value.partition(":")
+    return int(low), int(high or low)
+
+
+class Command(BaseCommand):
+    help = (
+        "Fills the database with synthetic users, posts, comments, about "
+        "pages and collaboration requests for scale testing. Rows are "
+        "inserted with chunked bulk_create and featured images use the "
+        "placeholder, so no Cloudinary calls are made."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--posts", type=int, default=10000)
+        parser.add_argument("--comments", type=int, default=100000)
+        parser.add_argument("--about", type=int, default=1,
+                            help="Number of about page versions.")
+        parser.add_argument("--collaborate-requests", type=int, default=0)
+        parser.add_argument(
+            "--batch-size", type=int, default=2000,
+            help="Rows inserted per query.")
+        parser.add_argument(
+            "--skew", type=float, default=2.0,
+            help="1 spreads comments and authorship evenly, higher values "
+                 "concentrate them on a few viral posts and busy users.")
+        parser.add_argument(
+            "--paragraphs", type=word_range, default=(3, 8),
+            help="MIN:MAX paragraphs of 40 to 120 words per post.")
+        parser.add_argument(
+            "--comment-words", type=word_range, default=(5, 60),
+            help="MIN:MAX words per comment.")
+        parser.add_argument(
+            "--days", type=int, default=365,
+            help="Posts are spread over this many days before now.")
+        parser.add_argument(
+            "--image-share", type=float, default=0,
+            help="Share of posts given a sample Cloudinary image id "
+                 "instead of the placeholder (0 to 1).")
+        parser.add_argument("--seed", type=int, default=None,
+                            help="Random seed, for reproducible data.")
+        parser.add_argument(
+            "--prefix", default="seed",
+            help="Start of the generated usernames and slugs. Use a new "
+                 "one to add more data to a seeded database.")
+
+    def handle(self, *args, **options):
+        prefix = options["prefix"]
+        counts = ["users", "posts", "comments", "about", "collaborate_requests"]
+        if any(options[count] < 0 for count in counts):
+            raise CommandError("Counts cannot be negative.")
+        if User.objects.filter(username__startswith=f"{prefix}-user-").exists():
+            raise CommandError(
+                f"The database already holds data seeded with the prefix "
+                f"'{prefix}'. Pass another --prefix.")
+        if options["comments"] and not options["posts"]:
+            raise CommandError("Comments need posts, pass --posts.")
+        if (options["posts"] or options["comments"]) and not options["users"]:
+            raise CommandError("Posts and comments need users, pass --users.")
+
+        # When each model started, the previous one finished
+        self.started = {}
+        self.finished = time.perf_counter()
+        seeder = Seeder(
+            rng=random.Random(options["seed"]), prefix=prefix,
+            batch_size=options["batch_size"], skew=options["skew"],
+            paragraphs=options["paragraphs"],
+            comment_words=options["comment_words"], days=options["days"],
+            image_share=options["image_share"], progress=self.progress)
+        started = self.finished
+        seeder.users(options["users"])
+        seeder.posts(options["posts"])
+        seeder.comments(options["comments"])
+        seeder.abouts(options["about"])
+        seeder.collaborate_requests(options["collaborate_requests"])
+        seeder.finish()
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded the database in {time.perf_counter() - started:.1f}s."))
+
+    def progress(self, model, done, total):
+        name = model._meta.verbose_name_plural
+        now = time.perf_counter()
+        started = self.started.setdefault(name, self.finished)
+        if done == total:
+            self.finished = now
+        self.stdout.write(f"{name.capitalize()}: {done:,}/{total:,} "
+                          f"({done / (now - started):,.0f} rows/s)")
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.11 on 2026-10-18 10:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0005_post_featured_image'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['status', '-created_on', '-id'], name='blog_post_status_created_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.11 on 2026-10-18 10:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0007_post_approved_comment_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', '-created_on', '-id'], name='blog_comment_post_created_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.11 on 2026-10-18 10:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0008_comment_post_created_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['status', 'updated_on'], name='blog_post_status_updated_idx'),
+        ),
+    ]
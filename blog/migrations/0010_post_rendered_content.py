@@ -0,0 +1,29 @@
+# Generated by Django 4.2.11 on 2026-10-18 10:34
+
+from django.db import migrations, models
+
+
+def render_existing_posts(apps, schema_editor):
+    from blog.rendering import render_content
+
+    Post = apps.get_model('blog', 'Post')
+    posts = Post.objects.only('id', 'content')
+    for post in posts.iterator(chunk_size=500):
+        Post.objects.filter(pk=post.pk).update(
+            rendered_content=render_content(post.content))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0009_post_status_updated_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='rendered_content',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.RunPython(render_existing_posts, migrations.RunPython.noop),
+    ]
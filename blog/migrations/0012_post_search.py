@@ -0,0 +1,34 @@
+from django.db import migrations
+
+
+def install_search(apps, schema_editor):
+    from blog import search
+
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        for statement in search.POSTGRES_INSTALL:
+            schema_editor.execute(statement)
+    elif connection.vendor == 'sqlite':
+        search.install_sqlite_search(connection)
+
+
+def uninstall_search(apps, schema_editor):
+    from blog import search
+
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        for statement in search.POSTGRES_UNINSTALL:
+            schema_editor.execute(statement)
+    elif connection.vendor == 'sqlite':
+        search.uninstall_sqlite_search(connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0011_post_word_count_reading_time'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search, uninstall_search),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.11 on 2026-10-18 10:41
+
+from django.db import migrations, models
+
+
+def flag_featured_images(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    Post.objects.exclude(featured_image__in=['placeholder', '']).update(
+        has_featured_image=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0013_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='has_featured_image',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(flag_featured_images, migrations.RunPython.noop),
+    ]
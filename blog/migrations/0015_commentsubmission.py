@@ -0,0 +1,36 @@
+# Generated by Django 4.2.11 on 2026-10-18 10:44
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('blog', '0014_post_featured_image_metadata'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommentSubmission',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('body', models.TextField()),
+                ('status', models.IntegerField(choices=[(0, 'Pending'), (1, 'Processing'), (2, 'Done'), (3, 'Failed')], default=0)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_on', models.DateTimeField(auto_now_add=True)),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='comment_submissions', to=settings.AUTH_USER_MODEL)),
+                ('comment', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='submission', to='blog.comment')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='comment_submissions', to='blog.post')),
+            ],
+            options={
+                'ordering': ['created_on'],
+                'indexes': [models.Index(fields=['status', 'available_at'], name='blog_submission_due_idx')],
+            },
+        ),
+    ]
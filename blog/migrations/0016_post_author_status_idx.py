@@ -0,0 +1,17 @@
+# Generated by Django 4.2.11 on 2026-10-18 11:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0015_commentsubmission'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', 'status', '-created_on'], name='blog_post_author_status_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.11 on 2026-10-18 12:00
+
+import blog.models
+from django.db import migrations, models
+
+
+def rename_reserved_slugs(apps, schema_editor):
+    # Posts whose URL belongs to another view were never reachable, so
+    # giving them a new slug breaks no working link.
+    Post = apps.get_model('blog', 'Post')
+    reserved = [
+        (pk, slug) for pk, slug in Post.objects.values_list('pk', 'slug').iterator()
+        if blog.models.slug_is_reserved(slug)
+    ]
+    for pk, slug in reserved:
+        Post.objects.filter(pk=pk).update(slug=f'{slug}-{pk}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0016_post_author_status_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='slug',
+            field=models.SlugField(max_length=200, unique=True, validators=[blog.models.validate_post_slug]),
+        ),
+        migrations.RunPython(rename_reserved_slugs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.11 on 2026-10-18 12:22
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copy_created_on(apps, schema_editor):
+    # Existing comments were last changed when they were posted, as far
+    # as anyone can tell
+    Comment = apps.get_model('blog', 'Comment')
+    Comment.objects.update(updated_on=F('created_on'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0017_post_slug_not_reserved'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='updated_on',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(copy_created_on, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,39 @@
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from django.urls import Resolver404, resolve, reverse
+from django.utils import timezone
 from django.contrib.auth.models import User
 from cloudinary.models import CloudinaryField
+from .rendering import make_excerpt, plain_text, reading_time, render_content
 
 STATUS = ((0, "Draft"), (1, "Published"))
+# Post fields computed from content by Post.render() and Post.update_metadata()
+METADATA_FIELDS = ["excerpt", "word_count", "reading_time"]
+RENDERED_FIELDS = ["rendered_content", *METADATA_FIELDS]
+# Post fields describing the featured image
+IMAGE_FIELDS = ["has_featured_image", "image_width", "image_height"]
+PLACEHOLDER_IMAGE = "placeholder"
+
+
+def slug_is_reserved(slug):
+    """
+    Whether the page URL of a post with this slug belongs to another
+    view, e.g. ``search``, which would leave the post unreachable.
+    """
+    try:
+        match = resolve(reverse("post_detail", args=[slug]))
+    except Resolver404:
+        return False
+    return match.url_name != "post_detail"
+
+
+def validate_post_slug(slug):
+    if slug_is_reserved(slug):
+        raise ValidationError(
+            "%(slug)s is used by another page of the site.",
+            code="reserved", params={"slug": slug})
 
 class Post(models.Model):
     """
@@ -11,15 +42,35 @@ class Post(models.Model):
     title = models.CharField(max_length=200, unique=True)
     # The slug attribute with field type SlugField() also generates a single-line form input type text. It accepts Python string data type.
     # A slug is a short label only containing letters, numbers, underscores or hyphens. You would use one as a semantic URL path rather than an integer or database row ID.
-    slug = models.SlugField(max_length=200, unique=True)
+    slug = models.SlugField(
+        max_length=200, unique=True, validators=[validate_post_slug])
     author = models.ForeignKey(
     User, on_delete=models.CASCADE, related_name="blog_posts")
-    featured_image = CloudinaryField('image', default='placeholder')
+    featured_image = CloudinaryField(
+        'image', default='placeholder',
+        width_field='image_width', height_field='image_height')
+    # Set on save so templates need not inspect the image URL
+    has_featured_image = models.BooleanField(default=False, editable=False)
+    # Filled in by Cloudinary when an image is uploaded
+    image_width = models.PositiveIntegerField(
+        null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(
+        null=True, blank=True, editable=False)
     content = models.TextField()
+    # Sanitized HTML served to readers, rendered from content on save
+    rendered_content = models.TextField(blank=True, editable=False)
     created_on = models.DateTimeField(auto_now_add=True)
     status = models.IntegerField(choices=STATUS, default=0)
+    # Generated from content on save when left blank
     excerpt = models.TextField(blank=True)
     updated_on = models.DateTimeField(auto_now=True)
+    word_count = models.PositiveIntegerField(default=0, editable=False)
+    # Estimated minutes to read the post
+    reading_time = models.PositiveIntegerField(default=0, editable=False)
+    # Denormalized number of approved comments, kept in sync by
+    # Comment.save() and the Comment pre_delete handler in signals.py.
+    approved_comment_count = models.PositiveIntegerField(
+        default=0, editable=False)
 
     class Meta:
         """
@@ -41,6 +92,19 @@ class Post(models.Model):
         """
         # ordering = ["-created_on"]
         ordering = ["-created_on", "author"]
+        indexes = [
+            # Backs the keyset pagination of published posts on the home page
+            models.Index(fields=["status", "-created_on", "-id"],
+                         name="blog_post_status_created_idx"),
+            # Finds the newest change for the Last-Modified header
+            models.Index(fields=["status", "updated_on"],
+                         name="blog_post_status_updated_idx"),
+            # Backs the admin changelist ordering and created_on filter
+            models.Index(fields=["-created_on"], name="blog_post_created_idx"),
+            # Backs the per-author feeds
+            models.Index(fields=["author", "status", "-created_on"],
+                         name="blog_post_author_status_idx"),
+        ]
 
     def __str__(self):
         """
@@ -62,6 +126,70 @@ class Post(models.Model):
         preferred title in front of a name. In the world of web development, this helps keep our data organised and user-friendly.
         '''
 
+    @classmethod
+    def recount_approved_comments(cls, post_ids):
+        """
+        Recomputes ``approved_comment_count`` for the given posts in a
+        single ``UPDATE``, after comments were changed in bulk with
+        ``QuerySet.update()``, which bypasses :meth:`Comment.save`.
+        """
+        approved = Comment.objects.filter(
+            post=OuterRef("pk"), approved=True,
+        ).order_by().values("post").annotate(total=Count("pk")).values("total")
+        cls.objects.filter(pk__in=post_ids).update(
+            approved_comment_count=Coalesce(Subquery(approved), 0))
+
+    def render(self):
+        """
+        Renders ``content`` into ``rendered_content``.
+        """
+        self.rendered_content = render_content(self.content)
+
+    def update_metadata(self):
+        """
+        Computes ``word_count``, ``reading_time`` and, if it is blank,
+        ``excerpt`` from ``rendered_content``. Clear the excerpt to have
+        it generated again.
+        """
+        text = plain_text(self.rendered_content)
+        self.word_count = len(text.split())
+        self.reading_time = reading_time(self.word_count)
+        if not self.excerpt.strip():
+            self.excerpt = make_excerpt(text)
+
+    def update_image_flags(self):
+        """
+        Sets ``has_featured_image`` and clears the stored dimensions when
+        the post falls back to the placeholder image.
+        """
+        image = self.featured_image
+        public_id = getattr(image, "public_id", image)
+        self.has_featured_image = bool(image) and public_id != PLACEHOLDER_IMAGE
+        if not self.has_featured_image:
+            self.image_width = self.image_height = None
+
+    def save(self, *args, **kwargs):
+        """
+        Renders the fields derived from ``content`` and ``featured_image``
+        so the work is done once per save instead of on every view.
+        """
+        update_fields = kwargs.get("update_fields")
+        deferred = self.get_deferred_fields()
+        if "content" not in deferred and (
+                update_fields is None or "content" in update_fields):
+            self.render()
+            self.update_metadata()
+            if update_fields is not None:
+                update_fields = {*update_fields, *RENDERED_FIELDS}
+        if "featured_image" not in deferred and (
+                update_fields is None or "featured_image" in update_fields):
+            self.update_image_flags()
+            if update_fields is not None:
+                update_fields = {*update_fields, *IMAGE_FIELDS}
+        if update_fields is not None:
+            kwargs["update_fields"] = update_fields
+        super().save(*args, **kwargs)
+
 class Comment(models.Model):
     # related_name
     # While the Post model doesn't have a field named comments, the related_name in our Comment model sets up a logical link, effectively 
@@ -76,9 +204,91 @@ class Comment(models.Model):
     body = models.TextField()
     approved = models.BooleanField(default=False)
     created_on = models.DateTimeField(auto_now_add=True)
+    # Part of the post page validators, so editing or approving a
+    # comment changes the page's ETag and Last-Modified
+    updated_on = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["-created_on"] 
+        indexes = [
+            # Backs the keyset pagination of a post's comment thread
+            models.Index(fields=["post", "-created_on", "-id"],
+                         name="blog_comment_post_created_idx"),
+            # Back the admin changelist ordering and its approved filter
+            models.Index(fields=["-created_on"], name="blog_comment_created_idx"),
+            models.Index(fields=["approved", "-created_on"],
+                         name="blog_comment_approved_idx"),
+        ]
+
+    def __str__(self):
+        return f"Comment {self.body} by {self.author}"
+
+    def lock_counted_post_id(self):
+        """
+        Locks the stored row until the end of the transaction and returns
+        the id of the post whose ``approved_comment_count`` currently
+        includes this comment, or ``None``. Reading it under the lock
+        keeps concurrent saves and deletes from counting a change twice.
+        """
+        row = Comment.objects.select_for_update().filter(
+            pk=self.pk).values_list("post_id", "approved").first()
+        return row[0] if row and row[1] else None
+
+    def save(self, *args, **kwargs):
+        """
+        Saves the comment and updates ``approved_comment_count`` on
+        :model:`blog.Post` in the same transaction.
+        """
+        new_post_id = self.post_id if self.approved else None
+        with transaction.atomic(using=kwargs.get("using")):
+            counted_post_id = (
+                None if self._state.adding else self.lock_counted_post_id())
+            super().save(*args, **kwargs)
+            if counted_post_id != new_post_id:
+                if counted_post_id is not None:
+                    Post.objects.filter(pk=counted_post_id).update(
+                        approved_comment_count=Greatest(
+                            F("approved_comment_count") - 1, 0))
+                if new_post_id is not None:
+                    Post.objects.filter(pk=new_post_id).update(
+                        approved_comment_count=F("approved_comment_count") + 1)
+
+SUBMISSION_STATUS = (
+    (0, "Pending"), (1, "Processing"), (2, "Done"), (3, "Failed"))
+
+class CommentSubmission(models.Model):
+    """
+    A comment posted by a :model:`auth.User` that is waiting for the
+    comment queue worker to moderate it and save it as a
+    :model:`blog.Comment`. See ``blog/queue.py``.
+    """
+    PENDING, PROCESSING, DONE, FAILED = (
+        status for status, _ in SUBMISSION_STATUS)
+
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, related_name="comment_submissions")
+    author = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="comment_submissions")
+    body = models.TextField()
+    status = models.IntegerField(choices=SUBMISSION_STATUS, default=PENDING)
+    # The comment created by the worker, once the submission is done
+    comment = models.OneToOneField(
+        Comment, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name="submission")
+    attempts = models.PositiveIntegerField(default=0)
+    # When a worker may pick the submission up: after a retry delay, or
+    # after the lease of a worker that stopped mid-way runs out
+    available_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_on = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["created_on"]
+        indexes = [
+            # Backs the worker's query for submissions that are due
+            models.Index(fields=["status", "available_at"],
+                         name="blog_submission_due_idx"),
+        ]
 
     def __str__(self):
-        return f"Comment {self.body} by {self.author}"
\ No newline at end of file
+        return f"Submission {self.body} by {self.author}"
@@ -0,0 +1,223 @@
+import base64
+import collections.abc
+from datetime import datetime
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+# Cache key holding the number of published posts. It is deleted by the
+# Post signal handlers in blog/signals.py whenever a post is saved or
+# deleted, so the count is only recomputed after the data has changed.
+PUBLISHED_COUNT_KEY = "blog:published_post_count"
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Paginator that reads the total object count from the cache instead
+    of running ``SELECT COUNT(*)`` on every page.
+
+    Only use it for querysets whose size is invalidated under
+    ``cache_key``, such as the published posts listed by
+    :view:`blog.views.PostList`.
+    """
+    cache_key = PUBLISHED_COUNT_KEY
+    cache_timeout = 60 * 60
+
+    @cached_property
+    def count(self):
+        count = cache.get(self.cache_key)
+        if count is None:
+            count = super().count
+            cache.set(self.cache_key, count, self.cache_timeout)
+        return count
+
+    async def acount(self):
+        """
+        Async version of :attr:`count`, which it also fills in so the
+        paginator can be used from async code afterwards.
+        """
+        if "count" not in self.__dict__:
+            count = await cache.aget(self.cache_key)
+            if count is None:
+                count = await self.object_list.acount()
+                await cache.aset(self.cache_key, count, self.cache_timeout)
+            self.__dict__["count"] = count
+        return self.count
+
+
+def estimated_row_count(model, using):
+    """
+    Returns the planner's estimate of the number of rows in ``model``'s
+    table from ``pg_class.reltuples`` on PostgreSQL, or ``None`` when
+    no estimate is available.
+    """
+    connection = connections[using]
+    if connection.vendor != "postgresql":
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples FROM pg_class WHERE oid = %s::regclass",
+            [connection.ops.quote_name(model._meta.db_table)])
+        row = cursor.fetchone()
+    # reltuples is -1 for tables that were never vacuumed or analyzed
+    return int(row[0]) if row and row[0] > 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for admin changelists over huge tables.
+
+    Counting every row of an unfiltered changelist is replaced by the
+    PostgreSQL table statistics once the table holds more than
+    ``exact_count_threshold`` rows. Filtered changelists and other
+    databases still get an exact ``COUNT(*)``.
+    """
+    exact_count_threshold = 100000
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, "query", None)
+        if query is not None and not query.where:
+            estimate = estimated_row_count(
+                self.object_list.model, self.object_list.db)
+            if estimate is not None and estimate > self.exact_count_threshold:
+                return estimate
+        return super().count
+
+
+class InvalidCursor(Exception):
+    """
+    Raised when an ``after``/``before`` token cannot be decoded.
+    """
+
+
+def encode_cursor(obj):
+    """
+    Returns an opaque, URL-safe token for the ``(created_on, id)``
+    position of ``obj``.
+    """
+    raw = f"{obj.created_on.isoformat()}|{obj.pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """
+    Returns the ``(created_on, id)`` pair stored in a token made by
+    :func:`encode_cursor`.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        created_on, pk = raw.decode().split("|")
+        return datetime.fromisoformat(created_on), int(pk)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor(token) from e
+
+
+class KeysetPage(collections.abc.Sequence):
+    """
+    A page of results from :class:`KeysetPaginator`.
+
+    It offers the parts of :class:`django.core.paginator.Page` the
+    templates use (``has_next``, ``has_previous``, ``object_list``...)
+    plus ``next_cursor`` and ``previous_cursor`` tokens to link to the
+    neighbouring pages.
+    """
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return f"<Keyset page of {len(self)} objects>"
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if self._has_next and self.object_list:
+            return encode_cursor(self.object_list[-1])
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self._has_previous and self.object_list:
+            return encode_cursor(self.object_list[0])
+        return None
+
+
+class KeysetPaginator:
+    """
+    Cursor based paginator over a queryset ordered newest first by
+    ``(created_on, id)``.
+
+    Unlike offset pagination, every page is fetched with a ``WHERE``
+    range on the ordering columns and ``LIMIT per_page + 1``, so deep
+    pages cost the same as the first one and no ``COUNT(*)`` is needed.
+    """
+
+    def __init__(self, object_list, per_page):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+
+    def page(self, after=None, before=None):
+        """
+        Returns the :class:`KeysetPage` following the ``after`` token,
+        preceding the ``before`` token or, without either, the first page.
+        """
+        rows = list(self._page_queryset(after, before))
+        return self._make_page(rows, after, before)
+
+    async def apage(self, after=None, before=None):
+        """
+        Async version of :meth:`page`.
+        """
+        queryset = self._page_queryset(after, before)
+        rows = [obj async for obj in queryset]
+        return self._make_page(rows, after, before)
+
+    def _page_queryset(self, after, before):
+        queryset = self.object_list
+        if before:
+            created_on, pk = decode_cursor(before)
+            queryset = queryset.filter(
+                Q(created_on__gt=created_on) | Q(id__gt=pk),
+                created_on__gte=created_on,
+            ).order_by("created_on", "id")
+        else:
+            if after:
+                created_on, pk = decode_cursor(after)
+                # The created_on__lte bound gives the database an index
+                # range to scan, the OR only breaks ties on the same instant.
+                queryset = queryset.filter(
+                    Q(created_on__lt=created_on) | Q(id__lt=pk),
+                    created_on__lte=created_on,
+                )
+            queryset = queryset.order_by("-created_on", "-id")
+        # Fetch one extra row to find out whether there is another page.
+        return queryset[:self.per_page + 1]
+
+    def _make_page(self, rows, after, before):
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if before:
+            rows.reverse()
+            return KeysetPage(rows, self, has_next=True, has_previous=has_more)
+        return KeysetPage(rows, self, has_next=has_more,
+                          has_previous=bool(after))
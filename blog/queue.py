@@ -0,0 +1,134 @@
+"""
+Database backed queue for comment submissions.
+
+``post_detail`` validates a comment and stores it as a
+:model:`blog.CommentSubmission`. The ``process_comment_queue`` command
+runs the moderators listed in ``settings.COMMENT_MODERATORS`` on each
+submission and saves it as a :model:`blog.Comment`, retrying failed
+attempts with a growing delay. Set ``COMMENT_QUEUE_EAGER`` to process
+submissions during the request instead, e.g. when no worker is running.
+"""
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .models import Comment, CommentSubmission
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+# Delay before the first retry, doubled after every further failure
+RETRY_DELAY = timedelta(seconds=30)
+# How long a worker may hold a submission before another one takes over
+LEASE = timedelta(minutes=5)
+
+
+class RejectComment(Exception):
+    """
+    Raised by a moderator to drop a submission without retrying it.
+    """
+
+
+def get_moderators():
+    """
+    Returns the callables listed in ``settings.COMMENT_MODERATORS``.
+
+    Each one is called with the unsaved :model:`blog.Comment` and may
+    change it or raise :class:`RejectComment`.
+    """
+    return [import_string(path) for path in settings.COMMENT_MODERATORS]
+
+
+def enqueue_comment(post, author, body):
+    """
+    Stores a comment on ``post`` for the worker and returns the
+    :model:`blog.CommentSubmission`.
+    """
+    submission = CommentSubmission.objects.create(
+        post=post, author=author, body=body)
+    if settings.COMMENT_QUEUE_EAGER and claim_submission(submission):
+        process_submission(submission)
+    return submission
+
+
+def claim_submission(submission):
+    """
+    Leases ``submission`` to the calling worker and counts the attempt.
+    Returns ``False`` if it is not due or another worker got it first.
+    """
+    now = timezone.now()
+    claimed = CommentSubmission.objects.filter(
+        pk=submission.pk, available_at__lte=now,
+        status__in=[CommentSubmission.PENDING, CommentSubmission.PROCESSING],
+    ).update(status=CommentSubmission.PROCESSING, available_at=now + LEASE,
+             attempts=F("attempts") + 1)
+    if claimed:
+        submission.status = CommentSubmission.PROCESSING
+        submission.available_at = now + LEASE
+        submission.attempts += 1
+    return bool(claimed)
+
+
+def update_submission(submission, **fields):
+    """
+    Sets ``fields`` on ``submission`` and in its row. Returns ``False``
+    if the row is gone, e.g. deleted with its post in the meantime.
+    """
+    for name, value in fields.items():
+        setattr(submission, name, value)
+    return bool(CommentSubmission.objects.filter(
+        pk=submission.pk).update(**fields))
+
+
+def process_submission(submission):
+    """
+    Moderates a claimed submission and saves its comment, or schedules
+    a retry if that fails. A submission deleted meanwhile is dropped.
+    """
+    comment = Comment(post_id=submission.post_id,
+                      author_id=submission.author_id, body=submission.body)
+    try:
+        for moderate in get_moderators():
+            moderate(comment)
+        with transaction.atomic():
+            comment.save()
+            if not update_submission(
+                    submission, comment=comment,
+                    status=CommentSubmission.DONE, last_error=""):
+                logger.info("Comment submission %s was deleted", submission.pk)
+                transaction.set_rollback(True)
+    except RejectComment as e:
+        update_submission(submission, status=CommentSubmission.FAILED,
+                          last_error=str(e))
+    except Exception as e:
+        logger.exception("Comment submission %s failed", submission.pk)
+        if submission.attempts >= MAX_ATTEMPTS:
+            update_submission(submission, status=CommentSubmission.FAILED,
+                              last_error=repr(e))
+        else:
+            update_submission(
+                submission, status=CommentSubmission.PENDING,
+                available_at=timezone.now() + (
+                    RETRY_DELAY * 2 ** (submission.attempts - 1)),
+                last_error=repr(e))
+    return submission
+
+
+def process_due_submissions(limit=20):
+    """
+    Claims and processes up to ``limit`` due submissions, oldest first.
+    Returns the number processed.
+    """
+    due = CommentSubmission.objects.filter(
+        status__in=[CommentSubmission.PENDING, CommentSubmission.PROCESSING],
+        available_at__lte=timezone.now(),
+    ).order_by("available_at")[:limit]
+    processed = 0
+    for submission in due:
+        if claim_submission(submission):
+            process_submission(submission)
+            processed += 1
+    return processed
@@ -0,0 +1,156 @@
+import html
+import math
+from urllib.parse import urlsplit
+import bleach
+from bleach.css_sanitizer import CSSSanitizer
+from bleach.html5lib_shim import Filter
+from django.utils.html import strip_tags
+from django.utils.text import Truncator, slugify
+
+# Markup Summernote produces that is safe to send to readers. Anything
+# else, such as <script> tags or on* event attributes, is stripped.
+ALLOWED_TAGS = bleach.sanitizer.ALLOWED_TAGS | {
+    "p", "br", "hr", "div", "span", "u", "s", "sub", "sup", "pre",
+    "h1", "h2", "h3", "h4", "h5", "h6", "img", "figure", "figcaption",
+    "table", "thead", "tbody", "tr", "th", "td", "font", "iframe",
+}
+# Inline styles Summernote writes for image size and float, alignment,
+# colours and fonts. Other properties are dropped from style attributes.
+ALLOWED_CSS_PROPERTIES = {
+    "width", "height", "max-width", "float", "margin", "margin-left",
+    "margin-right", "text-align", "vertical-align", "color",
+    "background-color", "font-family", "font-size", "font-weight",
+    "font-style", "text-decoration", "line-height",
+}
+# Hosts of the video embeds Summernote inserts as iframes
+EMBED_HOSTS = {
+    "www.youtube.com", "youtube.com", "www.youtube-nocookie.com",
+    "player.vimeo.com", "www.dailymotion.com", "www.instagram.com",
+}
+IFRAME_ATTRIBUTES = {"width", "height", "frameborder", "allowfullscreen",
+                     "allow", "title", "class"}
+HEADINGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+
+
+def allow_iframe_attribute(tag, name, value):
+    """
+    Keeps the ``src`` of an iframe only for an https (or protocol
+    relative) URL on one of the :data:`EMBED_HOSTS`.
+    """
+    if name == "src":
+        url = urlsplit(value)
+        return url.scheme in ("https", "") and url.hostname in EMBED_HOSTS
+    return name in IFRAME_ATTRIBUTES
+
+
+ALLOWED_ATTRIBUTES = {
+    "*": ["class", "style"],
+    "a": ["href", "title", "target", "rel"],
+    "img": ["src", "alt", "title", "width", "height"],
+    "td": ["colspan", "rowspan"],
+    "th": ["colspan", "rowspan"],
+    "font": ["color", "face", "size"],
+    "iframe": allow_iframe_attribute,
+}
+
+# Average adult reading speed used for the "min read" estimate
+WORDS_PER_MINUTE = 200
+# Length of the excerpts generated for posts saved without one
+EXCERPT_WORDS = 30
+
+
+class ContentFilter(Filter):
+    """
+    Adds ``loading="lazy"`` to images and embeds, an ``id`` anchor,
+    built from the heading text, to every heading, and drops iframes
+    whose ``src`` was stripped.
+    """
+
+    def __iter__(self):
+        heading = None
+        used_ids = set()
+        # Inside an iframe without a src, whose content is dropped too
+        dropping = False
+        for token in super().__iter__():
+            if token.get("name") == "iframe":
+                if token["type"] == "EndTag":
+                    dropped, dropping = dropping, False
+                else:
+                    dropped = (None, "src") not in token["data"]
+                    dropping = dropped and token["type"] == "StartTag"
+                    token["data"][(None, "loading")] = "lazy"
+                if dropped:
+                    continue
+            elif dropping:
+                continue
+
+            if heading is not None:
+                heading.append(token)
+                if (token["type"] == "EndTag"
+                        and token["name"] == heading[0]["name"]):
+                    self.add_anchor(heading, used_ids)
+                    yield from heading
+                    heading = None
+                continue
+
+            if token["type"] in ("StartTag", "EmptyTag"):
+                if token["name"] == "img":
+                    token["data"][(None, "loading")] = "lazy"
+                    token["data"][(None, "decoding")] = "async"
+                elif token["name"] in HEADINGS:
+                    heading = [token]
+                    continue
+            yield token
+
+        if heading is not None:
+            yield from heading
+
+    def add_anchor(self, heading, used_ids):
+        text = "".join(
+            token["data"] for token in heading
+            if token["type"] in ("Characters", "SpaceCharacters"))
+        anchor = base = slugify(text) or "section"
+        suffix = 1
+        while anchor in used_ids:
+            suffix += 1
+            anchor = f"{base}-{suffix}"
+        used_ids.add(anchor)
+        heading[0]["data"][(None, "id")] = anchor
+
+
+cleaner = bleach.sanitizer.Cleaner(
+    tags=ALLOWED_TAGS,
+    attributes=ALLOWED_ATTRIBUTES,
+    css_sanitizer=CSSSanitizer(allowed_css_properties=ALLOWED_CSS_PROPERTIES),
+    strip=True,
+    filters=[ContentFilter],
+)
+
+
+def render_content(content):
+    """
+    Returns the HTML served to readers for a post's Summernote
+    ``content``: sanitized, with lazily loaded images and heading anchors.
+    """
+    return cleaner.clean(content)
+
+
+def plain_text(content):
+    """
+    Returns the words of an HTML ``content`` as plain text.
+    """
+    return " ".join(html.unescape(strip_tags(content)).split())
+
+
+def make_excerpt(text):
+    """
+    Returns the first :data:`EXCERPT_WORDS` words of ``text``.
+    """
+    return Truncator(text).words(EXCERPT_WORDS)
+
+
+def reading_time(word_count):
+    """
+    Returns the minutes needed to read ``word_count`` words.
+    """
+    return max(1, math.ceil(word_count / WORDS_PER_MINUTE))
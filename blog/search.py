@@ -0,0 +1,148 @@
+import re
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVectorField)
+from django.db import connections
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+from .models import Post
+
+# Full-text search is maintained by the database itself, so it works for
+# posts saved through the ORM, bulk_update() and raw SQL alike.
+#
+# On PostgreSQL a stored generated tsvector column, weighted title >
+# excerpt > content, is updated on every write and indexed with GIN.
+# On SQLite (used by manage.py test) an external content FTS5 table
+# mirrors the same columns through triggers.
+
+POSTGRES_INSTALL = [
+    """
+    ALTER TABLE blog_post ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(excerpt, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(content, '')), 'C')
+    ) STORED
+    """,
+    "CREATE INDEX blog_post_search_idx ON blog_post USING gin (search_vector)",
+]
+POSTGRES_UNINSTALL = [
+    "ALTER TABLE blog_post DROP COLUMN search_vector",
+]
+
+SQLITE_TABLE = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS blog_post_fts USING fts5(
+        title, excerpt, content, content='blog_post', content_rowid='id'
+    )
+"""
+SQLITE_TRIGGERS = {
+    "blog_post_fts_insert": """
+        CREATE TRIGGER blog_post_fts_insert AFTER INSERT ON blog_post BEGIN
+            INSERT INTO blog_post_fts(rowid, title, excerpt, content)
+            VALUES (new.id, new.title, new.excerpt, new.content);
+        END
+    """,
+    "blog_post_fts_delete": """
+        CREATE TRIGGER blog_post_fts_delete AFTER DELETE ON blog_post BEGIN
+            INSERT INTO blog_post_fts(blog_post_fts, rowid, title, excerpt, content)
+            VALUES ('delete', old.id, old.title, old.excerpt, old.content);
+        END
+    """,
+    "blog_post_fts_update": """
+        CREATE TRIGGER blog_post_fts_update
+        AFTER UPDATE OF title, excerpt, content ON blog_post BEGIN
+            INSERT INTO blog_post_fts(blog_post_fts, rowid, title, excerpt, content)
+            VALUES ('delete', old.id, old.title, old.excerpt, old.content);
+            INSERT INTO blog_post_fts(rowid, title, excerpt, content)
+            VALUES (new.id, new.title, new.excerpt, new.content);
+        END
+    """,
+}
+
+
+def install_sqlite_search(connection):
+    """
+    Creates the FTS5 table and any of its triggers that are missing, then
+    rebuilds the index if a trigger had to be created.
+
+    SQLite migrations that rebuild the blog_post table drop its triggers,
+    so this also runs after every ``migrate`` (see blog/apps.py).
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(SQLITE_TABLE)
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger'"
+            " AND tbl_name = 'blog_post'")
+        existing = {row[0] for row in cursor.fetchall()}
+        missing = [name for name in SQLITE_TRIGGERS if name not in existing]
+        for name in missing:
+            cursor.execute(SQLITE_TRIGGERS[name])
+        if missing:
+            cursor.execute(
+                "INSERT INTO blog_post_fts(blog_post_fts) VALUES ('rebuild')")
+
+
+def uninstall_sqlite_search(connection):
+    with connection.cursor() as cursor:
+        for name in SQLITE_TRIGGERS:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        cursor.execute("DROP TABLE IF EXISTS blog_post_fts")
+
+
+def sqlite_search_installed(connection):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'blog_post_fts'")
+        return cursor.fetchone() is not None
+
+
+def fts5_query(query):
+    """
+    Turns user input into an FTS5 query matching posts that contain all
+    of its words, quoting each word so no input is a syntax error.
+    """
+    return " ".join(f'"{word}"' for word in re.findall(r"\w+", query))
+
+
+def search_posts(query):
+    """
+    Returns the published :model:`blog.Post` instances matching
+    ``query``, best matches first.
+    """
+    posts = Post.objects.filter(status=1)
+    vendor = connections[posts.db].vendor
+
+    if vendor == "postgresql":
+        # The generated column is not a model field
+        vector = RawSQL('"blog_post"."search_vector"', [],
+                        output_field=SearchVectorField())
+        tsquery = SearchQuery(query, config="english", search_type="websearch")
+        return posts.alias(search_vector=vector).filter(
+            search_vector=tsquery,
+        ).annotate(
+            rank=SearchRank(vector, tsquery),
+        ).order_by("-rank", "-created_on", "-id")
+
+    if vendor == "sqlite":
+        match = fts5_query(query)
+        if not match:
+            return posts.none()
+        # bm25() scores are negative, the lowest is the best match.
+        rank = RawSQL(
+            "SELECT bm25(blog_post_fts, 10.0, 4.0, 1.0) FROM blog_post_fts"
+            ' WHERE blog_post_fts MATCH %s AND rowid = "blog_post"."id"',
+            [match], output_field=FloatField())
+        matches = RawSQL(
+            "SELECT rowid FROM blog_post_fts WHERE blog_post_fts MATCH %s",
+            [match])
+        return posts.filter(id__in=matches).annotate(
+            rank=rank,
+        ).order_by("rank", "-created_on", "-id")
+
+    words = re.findall(r"\w+", query)
+    if not words:
+        return posts.none()
+    for word in words:
+        posts = posts.filter(Q(title__icontains=word)
+                             | Q(excerpt__icontains=word)
+                             | Q(content__icontains=word))
+    return posts.order_by("-created_on", "-id")
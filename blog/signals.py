@@ -0,0 +1,78 @@
+from django.core.cache import cache
+from django.db.models import F, QuerySet
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from .cache import bump_index_version, bump_post_versions, bump_sitemap_versions
+from .models import Post, Comment
+from .paginators import PUBLISHED_COUNT_KEY
+from .slugs import forget_slugs
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_published_count(sender, instance, **kwargs):
+    """
+    Forget the cached number of published posts whenever a post is
+    created, edited (e.g. published or unpublished) or deleted.
+    """
+    cache.delete(PUBLISHED_COUNT_KEY)
+
+
+@receiver(pre_save, sender=Post)
+def invalidate_renamed_post(sender, instance, **kwargs):
+    """
+    Drop the cached pages of a post's old URL when its slug changes.
+    """
+    if instance.pk is None:
+        return
+    old_slug = Post.objects.filter(pk=instance.pk).values_list(
+        "slug", flat=True).first()
+    if old_slug and old_slug != instance.slug:
+        bump_post_versions(old_slug)
+        forget_slugs(old_slug)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_pages(sender, instance, **kwargs):
+    """
+    Invalidate the cached listing, the cached pages and slug of the
+    post and its sitemap shard.
+    """
+    bump_index_version()
+    bump_post_versions(instance.slug)
+    bump_sitemap_versions(instance.pk)
+    forget_slugs(instance.slug)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_post_pages(sender, instance, **kwargs):
+    """
+    Invalidate the cached pages of the post a comment belongs to.
+    """
+    if Comment.post.is_cached(instance):
+        slug = instance.post.slug
+    else:
+        slug = Post.objects.filter(pk=instance.post_id).values_list(
+            "slug", flat=True).first()
+    if slug:
+        bump_post_versions(slug)
+
+
+@receiver(pre_delete, sender=Comment)
+def decrement_approved_comment_count(sender, instance, origin=None, **kwargs):
+    """
+    Keep ``Post.approved_comment_count`` in sync when an approved comment
+    is deleted, directly or through a cascade. Deletion runs inside a
+    transaction, so the counter changes atomically with the row. The
+    comments of a post that is being deleted are not counted down.
+    """
+    if isinstance(origin, Post) or (
+            isinstance(origin, QuerySet) and origin.model is Post):
+        return
+    counted_post_id = instance.lock_counted_post_id()
+    if counted_post_id is not None:
+        Post.objects.filter(pk=counted_post_id).update(
+            approved_comment_count=Greatest(F("approved_comment_count") - 1, 0))
@@ -0,0 +1,119 @@
+"""
+Sitemap index and shards listing the published posts.
+
+Posts are split into shards by id, ``SITEMAP_SHARD_SIZE`` ids each, so
+a post always stays in the same shard and a shard never lists more
+URLs than that. Saving or deleting a post bumps the version of its
+shard only (see blog/signals.py), so the other shards stay cached.
+
+A shard is rendered from a streaming query over an id range of the
+primary key index, and the index only reads what the shards cached
+about themselves, so crawlers never cause a scan of the whole table.
+"""
+import datetime
+from xml.sax.saxutils import escape
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max
+from django.urls import reverse
+from .cache import index_version, sitemap_versions
+from .models import Post
+
+SITEMAP_NS = "http://www.sitemaps.org/schemas/sitemap/0.9"
+XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8"?>\n'
+
+
+def w3c_datetime(value):
+    return value.astimezone(datetime.timezone.utc).strftime(
+        "%Y-%m-%dT%H:%M:%S+00:00")
+
+
+def shard_count():
+    """
+    Returns the number of shards needed for the highest post id, cached
+    until a post changes.
+    """
+    key = f"blog:sitemap:shards:{index_version()}"
+    count = cache.get(key)
+    if count is None:
+        max_id = Post.objects.aggregate(max_id=Max("id"))["max_id"]
+        count = 0 if max_id is None else max_id // settings.SITEMAP_SHARD_SIZE + 1
+        cache.set(key, count, settings.SITEMAP_CACHE_TIMEOUT)
+    return count
+
+
+def _shard_keys(request, shard, version):
+    suffix = f"{shard}:{version}:{request.get_host()}"
+    return f"blog:sitemap:shard:{suffix}", f"blog:sitemap:meta:{suffix}"
+
+
+def render_shard(request, shard):
+    """
+    Returns ``(xml, lastmod, count)`` for the published posts whose ids
+    fall in the range of ``shard``, read in chunks with a server-side
+    cursor where the database supports it.
+    """
+    size = settings.SITEMAP_SHARD_SIZE
+    rows = Post.objects.filter(
+        status=1, id__gte=shard * size, id__lt=(shard + 1) * size,
+    ).order_by("id").values_list("slug", "updated_on").iterator(chunk_size=2000)
+    # Slugs are filled in with a format string, a reverse() per post is slow
+    url = request.build_absolute_uri(
+        reverse("post_detail", args=["slug"])).replace("/slug/", "/{}/")
+
+    parts = [XML_DECLARATION, f'<urlset xmlns="{SITEMAP_NS}">\n']
+    lastmod = None
+    count = 0
+    for slug, updated_on in rows:
+        parts.append(
+            f"<url><loc>{escape(url.format(slug))}</loc>"
+            f"<lastmod>{w3c_datetime(updated_on)}</lastmod></url>\n")
+        lastmod = updated_on if lastmod is None else max(lastmod, updated_on)
+        count += 1
+    parts.append("</urlset>\n")
+    return "".join(parts), lastmod, count
+
+
+def cached_shard(request, shard):
+    """
+    Returns ``(xml, lastmod, version)`` of a shard, rendering it only
+    if it changed since it was last cached.
+    """
+    version = sitemap_versions([shard])[shard]
+    shard_key, meta_key = _shard_keys(request, shard, version)
+    xml = cache.get(shard_key)
+    meta = cache.get(meta_key)
+    if xml is None or meta is None:
+        xml, lastmod, count = render_shard(request, shard)
+        meta = (lastmod, count)
+        cache.set_many({shard_key: xml, meta_key: meta},
+                       settings.SITEMAP_CACHE_TIMEOUT)
+    return xml, meta[0], version
+
+
+def render_index(request):
+    """
+    Returns ``(xml, lastmod)`` of the sitemap index. It lists every
+    shard, with the ``lastmod`` of those already rendered, and leaves
+    out the ones known to be empty. Shards are not rendered here.
+    """
+    shards = range(shard_count())
+    versions = sitemap_versions(shards)
+    metas = cache.get_many(
+        [_shard_keys(request, shard, versions[shard])[1] for shard in shards])
+    parts = [XML_DECLARATION, f'<sitemapindex xmlns="{SITEMAP_NS}">\n']
+    lastmods = []
+    for shard in shards:
+        meta = metas.get(_shard_keys(request, shard, versions[shard])[1])
+        if meta is not None and meta[1] == 0:
+            continue
+        loc = escape(request.build_absolute_uri(
+            reverse("sitemap_shard", args=[shard])))
+        if meta is None:
+            parts.append(f"<sitemap><loc>{loc}</loc></sitemap>\n")
+        else:
+            lastmods.append(meta[0])
+            parts.append(f"<sitemap><loc>{loc}</loc>"
+                         f"<lastmod>{w3c_datetime(meta[0])}</lastmod></sitemap>\n")
+    parts.append("</sitemapindex>\n")
+    return "".join(parts), max(lastmods, default=None)
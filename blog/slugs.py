@@ -0,0 +1,111 @@
+"""
+In-process LRU cache of the post behind each slug.
+
+Views that only need to know which post a slug names, and whether it is
+published, read it from here instead of the database. Entries are
+stored with the cache version of the post (see blog/cache.py), which
+the Post signals and bulk updates bump. With a cache shared by all
+processes (the redis or file ``CACHE_BACKEND``), an entry saved by one
+worker process is then ignored by the others once the post changes.
+The local memory cache is private to each process, so other processes
+only notice when their entry expires, after ``SLUG_CACHE_TIMEOUT``
+seconds. The signals also drop the entries of the process that made
+the change.
+"""
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from django.conf import settings
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from .cache import post_version
+from .models import Post
+
+PostRef = namedtuple("PostRef", ["id", "status", "updated_on"])
+
+# slug: (PostRef, post version, expiry time), least recently used first
+_entries = OrderedDict()
+_lock = threading.Lock()
+
+
+def _get(slug, version):
+    with _lock:
+        entry = _entries.get(slug)
+        if entry is None:
+            return None
+        if entry[1] != version or entry[2] < time.monotonic():
+            del _entries[slug]
+            return None
+        _entries.move_to_end(slug)
+        return entry[0]
+
+
+def _store(slug, ref, version):
+    # The version must be read before the post, so a change made
+    # meanwhile is not cached under the new version.
+    with _lock:
+        _entries[slug] = (
+            ref, version, time.monotonic() + settings.SLUG_CACHE_TIMEOUT)
+        _entries.move_to_end(slug)
+        while len(_entries) > settings.SLUG_CACHE_SIZE:
+            _entries.popitem(last=False)
+
+
+def resolve_slug(slug):
+    """
+    Returns the :class:`PostRef` of the post ``slug``, from the cache or
+    with a query of its ``id``, ``status`` and ``updated_on`` columns,
+    or ``None`` if there is no such post.
+    """
+    version = post_version(slug)
+    ref = _get(slug, version)
+    if ref is None:
+        row = Post.objects.filter(slug=slug).values_list(
+            "id", "status", "updated_on").first()
+        if row is None:
+            return None
+        ref = PostRef(*row)
+        _store(slug, ref, version)
+    return ref
+
+
+def get_published_post_id(slug):
+    """
+    Returns the id of the published post ``slug`` or raises ``Http404``.
+    """
+    ref = resolve_slug(slug)
+    if ref is None or ref.status != 1:
+        raise Http404("No Post matches the given query.")
+    return ref.id
+
+
+def get_published_post(queryset, slug):
+    """
+    Returns the published post ``slug`` from ``queryset`` or raises
+    ``Http404``. A cached slug is looked up by primary key, and an
+    unknown one by slug, caching the post it finds, so this never takes
+    more than the one query.
+    """
+    version = post_version(slug)
+    ref = _get(slug, version)
+    if ref is not None:
+        if ref.status != 1:
+            raise Http404("No Post matches the given query.")
+        return get_object_or_404(queryset, pk=ref.id, status=1)
+    post = get_object_or_404(queryset, slug=slug, status=1)
+    _store(slug, PostRef(post.pk, post.status, post.updated_on), version)
+    return post
+
+
+def forget_slugs(*slugs):
+    """
+    Drops the entries of ``slugs`` from this process.
+    """
+    with _lock:
+        for slug in slugs:
+            _entries.pop(slug, None)
+
+
+def clear_slug_cache():
+    with _lock:
+        _entries.clear()
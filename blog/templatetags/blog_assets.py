@@ -0,0 +1,40 @@
+from functools import lru_cache
+from django import template
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.utils.safestring import mark_safe
+
+register = template.Library()
+
+
+def read_static(path):
+    """
+    Returns the text of the static file ``path``. Once collected with the
+    manifest storage, that is the minified, hashed copy in
+    ``STATIC_ROOT``, which never changes, so it is read once per process.
+    """
+    if settings.DEBUG or not hasattr(staticfiles_storage, "stored_name"):
+        with open(finders.find(path), encoding="utf-8") as f:
+            return f.read()
+    return _read_collected(path)
+
+
+@lru_cache(maxsize=None)
+def _read_collected(path):
+    stored = staticfiles_storage.path(staticfiles_storage.stored_name(path))
+    with open(stored, encoding="utf-8") as f:
+        return f.read()
+
+
+@register.simple_tag
+def inline_static(path):
+    """
+    Outputs the contents of a static file, e.g. the critical CSS inlined
+    in a ``<style>`` element of :template:`base.html`.
+
+    Usage::
+
+        <style>{% inline_static 'css/critical.css' %}</style>
+    """
+    return mark_safe(read_static(path))
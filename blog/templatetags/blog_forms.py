@@ -0,0 +1,37 @@
+from crispy_forms.templatetags.crispy_forms_filters import as_crispy_form
+from crispy_forms.utils import TEMPLATE_PACK
+from django import template
+from django.conf import settings
+from django.utils.translation import get_language
+
+register = template.Library()
+
+# Markup of unbound forms, by form class and rendering options
+_rendered = {}
+
+
+def clear_form_cache():
+    _rendered.clear()
+
+
+@register.filter
+def crispy_cached(form):
+    """
+    Renders ``form`` like crispy's ``|crispy`` filter. An unbound form
+    without initial data renders the same for every request, since the
+    CSRF token goes in the surrounding ``<form>`` element, so its markup
+    is rendered once per process and reused. Bound forms show the
+    submitted values and errors and are rendered every time, as is
+    everything when ``DEBUG`` is on, so template edits show up.
+
+    Usage::
+
+        {{ comment_form|crispy_cached }}
+    """
+    if form.is_bound or form.initial or settings.DEBUG:
+        return as_crispy_form(form)
+    key = (type(form), form.prefix, form.auto_id, TEMPLATE_PACK, get_language())
+    html = _rendered.get(key)
+    if html is None:
+        html = _rendered[key] = as_crispy_form(form)
+    return html
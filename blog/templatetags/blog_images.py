@@ -0,0 +1,70 @@
+from functools import lru_cache
+from cloudinary import CloudinaryImage
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html
+
+register = template.Library()
+
+# Widths offered to the browser in the srcset of a featured image
+IMAGE_WIDTHS = (400, 800, 1200)
+# Shown when a post has no featured image of its own
+PLACEHOLDER_PATH = "images/default.jpg"
+PLACEHOLDER_SIZE = (800, 530)
+
+
+@lru_cache(maxsize=1024)
+def cloudinary_srcset(public_id, version=None, image_format=None,
+                      upload_type="upload"):
+    """
+    Returns ``(src, srcset)`` for a Cloudinary image, scaled down to each
+    of ``IMAGE_WIDTHS`` and delivered in the best format and quality for
+    the browser. The URLs only depend on the arguments, so they are built
+    once per image and process.
+    """
+    image = CloudinaryImage(public_id, version=version, format=image_format,
+                            type=upload_type)
+    urls = [
+        (width, image.build_url(width=width, crop="limit", fetch_format="auto",
+                                quality="auto", secure=True))
+        for width in IMAGE_WIDTHS
+    ]
+    srcset = ", ".join(f"{url} {width}w" for width, url in urls)
+    return urls[-1][1], srcset
+
+
+@register.simple_tag
+def featured_image(post, css_class="", sizes="100vw", lazy=True):
+    """
+    Renders the ``<img>`` tag for the featured image of a
+    :model:`blog.Post`, or the placeholder image if it has none.
+
+    Usage::
+
+        {% featured_image post "card-img-top" sizes="33vw" %}
+
+    Images below the fold are loaded lazily; pass ``lazy=False`` for an
+    image that is visible when the page loads.
+    """
+    loading = "lazy" if lazy else "eager"
+    if not post.has_featured_image:
+        width, height = PLACEHOLDER_SIZE
+        return format_html(
+            '<img src="{}" class="{}" alt="placeholder image" width="{}" '
+            'height="{}" loading="{}" decoding="async">',
+            static(PLACEHOLDER_PATH), css_class, width, height, loading)
+
+    # Turns a freshly assigned string into a CloudinaryResource
+    image = post._meta.get_field("featured_image").to_python(
+        post.featured_image)
+    src, srcset = cloudinary_srcset(image.public_id, image.version,
+                                    image.format, image.type)
+    if post.image_width and post.image_height:
+        dimensions = format_html(' width="{}" height="{}"',
+                                 post.image_width, post.image_height)
+    else:
+        dimensions = ""
+    return format_html(
+        '<img src="{}" srcset="{}" sizes="{}" class="{}" alt="{}"{} '
+        'loading="{}" decoding="async">',
+        src, srcset, sizes, css_class, post.title, dimensions, loading)
@@ -0,0 +1,50 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from .models import Post, Comment
+
+
+class TestCommentAdmin(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_superuser(
+            username="myUsername", password="myPassword",
+            email="test@test.com")
+        self.client.login(username="myUsername", password="myPassword")
+        self.posts = [
+            Post.objects.create(title=f"Post {i}", slug=f"post-{i}",
+                                author=self.user, content="Content", status=1)
+            for i in range(2)
+        ]
+        for post in self.posts:
+            for i in range(3):
+                Comment.objects.create(post=post, author=self.user,
+                                       body=f"Comment {i}")
+        self.changelist = reverse('admin:blog_comment_changelist')
+
+    def test_approve_action_runs_single_update(self):
+        """Bulk approval updates comments and counters without per-row saves"""
+        comments = Comment.objects.values_list('pk', flat=True)
+        data = {'action': 'approve_comments', '_selected_action': list(comments)}
+        with self.assertNumQueries(9):
+            response = self.client.post(self.changelist, data)
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Comment.objects.filter(approved=False).exists())
+        for post in self.posts:
+            post.refresh_from_db()
+            self.assertEqual(post.approved_comment_count, 3)
+
+        data['action'] = 'reject_comments'
+        data['_selected_action'] = [Comment.objects.first().pk]
+        self.client.post(self.changelist, data)
+        self.assertEqual(
+            sum(Post.objects.values_list('approved_comment_count', flat=True)),
+            5)
+
+    def test_changelist_query_budget(self):
+        """Comment authors and posts are joined, not fetched per row"""
+        with self.assertNumQueries(4):
+            response = self.client.get(self.changelist)
+        self.assertContains(response, "Comment 2")
@@ -0,0 +1,296 @@
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.exceptions import ValidationError
+from django.core.management.base import CommandError
+from django.db.models import F
+from django.template import Context, Template
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from about.models import CollaborateRequest
+from .models import Post, Comment
+from .rendering import render_content
+
+
+class TestPostSlug(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="myUsername", password="myPassword")
+
+    def test_slugs_of_other_pages_are_rejected(self):
+        for slug in ("search", "admin", "metrics"):
+            post = Post(title=f"Post {slug}", slug=slug, author=self.user,
+                        content="Content")
+            with self.assertRaises(ValidationError, msg=slug) as error:
+                post.full_clean()
+            self.assertIn("slug", error.exception.message_dict)
+
+    def test_other_slugs_are_valid(self):
+        # Only feeds/rss/ and the like are taken, not feeds/ itself
+        for slug in ("feeds", "about"):
+            Post(title=f"Post {slug}", slug=slug, author=self.user,
+                 content="Content").full_clean()
+
+
+class TestApprovedCommentCount(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="myUsername", password="myPassword")
+        self.post = Post.objects.create(
+            title="Blog title", slug="blog-title", author=self.user,
+            content="Blog content", status=1)
+
+    def assertCount(self, expected):
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.approved_comment_count, expected)
+
+    def test_count_follows_approval(self):
+        comment = Comment.objects.create(
+            post=self.post, author=self.user, body="A comment")
+        self.assertCount(0)
+        comment.approved = True
+        comment.save()
+        self.assertCount(1)
+        # Saving again without changing approval must not count it twice
+        comment.save()
+        self.assertCount(1)
+
+    def test_editing_resets_approval(self):
+        comment = Comment.objects.create(
+            post=self.post, author=self.user, body="A comment", approved=True)
+        self.assertCount(1)
+        comment = Comment.objects.get(pk=comment.pk)
+        comment.body = "An edited comment"
+        comment.approved = False
+        comment.save()
+        self.assertCount(0)
+
+    def test_deleting_approved_comments(self):
+        Comment.objects.create(
+            post=self.post, author=self.user, body="Pending")
+        Comment.objects.create(
+            post=self.post, author=self.user, body="Approved", approved=True)
+        other = User.objects.create_user(username="other", password="pw")
+        Comment.objects.create(
+            post=self.post, author=other, body="Approved", approved=True)
+        self.assertCount(2)
+        Comment.objects.get(author=self.user, approved=True).delete()
+        self.assertCount(1)
+        # Comments removed by a cascade are uncounted too
+        other.delete()
+        self.assertCount(0)
+
+    def test_stale_instances_count_once(self):
+        comment = Comment.objects.create(
+            post=self.post, author=self.user, body="A comment")
+        first = Comment.objects.get(pk=comment.pk)
+        second = Comment.objects.get(pk=comment.pk)
+        first.approved = second.approved = True
+        first.save()
+        second.save()
+        self.assertCount(1)
+        first.delete()
+        second.delete()
+        self.assertCount(0)
+
+    def test_count_does_not_go_below_zero(self):
+        comment = Comment.objects.create(
+            post=self.post, author=self.user, body="A comment", approved=True)
+        Post.objects.update(approved_comment_count=0)
+        comment.delete()
+        self.assertCount(0)
+
+    def test_deleting_a_post_skips_its_counter(self):
+        for i in range(3):
+            Comment.objects.create(post=self.post, author=self.user,
+                                   body=f"Comment {i}", approved=True)
+        with CaptureQueriesContext(connection) as queries:
+            self.post.delete()
+        self.assertFalse([query["sql"] for query in queries
+                          if query["sql"].startswith('UPDATE "blog_post"')])
+        self.assertFalse(Comment.objects.exists())
+
+
+class TestRenderedContent(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="myUsername", password="myPassword")
+
+    def test_content_rendered_on_save(self):
+        post = Post.objects.create(
+            title="Blog title", slug="blog-title", author=self.user,
+            content='<h2>Intro</h2><p onclick="evil()">Text'
+                    '<img src="a.png"></p><script>evil()</script>')
+        self.assertNotIn("onclick", post.rendered_content)
+        self.assertNotIn("<script>", post.rendered_content)
+        self.assertIn('<h2 id="intro">Intro</h2>', post.rendered_content)
+        self.assertIn('loading="lazy"', post.rendered_content)
+
+    def test_summernote_styles_and_embeds_are_kept(self):
+        rendered = render_content(
+            '<p style="text-align: center; position: fixed">'
+            '<img src="a.png" style="width: 50%; float: left"></p>'
+            '<font color="red" onclick="evil()">Red</font>'
+            '<iframe src="//www.youtube.com/embed/abc" width="640"'
+            ' onload="evil()"></iframe>')
+        self.assertIn('<p style="text-align: center;">', rendered)
+        self.assertIn('style="width: 50%; float: left;"', rendered)
+        self.assertIn('<font color="red">Red</font>', rendered)
+        self.assertIn('<iframe src="//www.youtube.com/embed/abc" width="640"'
+                      ' loading="lazy"></iframe>', rendered)
+
+    def test_embeds_from_other_hosts_are_dropped(self):
+        for src in ("https://example.com/embed", "javascript:evil()",
+                    "http://www.youtube.com/embed/abc"):
+            rendered = render_content(
+                f'<iframe src="{src}">Fallback</iframe><p>After</p>')
+            self.assertEqual(rendered, "<p>After</p>", src)
+
+    def test_render_posts_command(self):
+        post = Post.objects.create(
+            title="Blog title", slug="blog-title", author=self.user,
+            content="<p>Text</p>")
+        Post.objects.filter(pk=post.pk).update(rendered_content="")
+        out = StringIO()
+        call_command("render_posts", stdout=out)
+        self.assertIn("Re-rendered 1 of 1 posts", out.getvalue())
+        post.refresh_from_db()
+        self.assertEqual(post.rendered_content, "<p>Text</p>")
+
+
+class TestPostMetadata(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="myUsername", password="myPassword")
+
+    def test_metadata_computed_on_save(self):
+        content = "<p>" + "word " * 450 + "</p>"
+        post = Post.objects.create(
+            title="Blog title", slug="blog-title", author=self.user,
+            content=content)
+        self.assertEqual(post.word_count, 450)
+        self.assertEqual(post.reading_time, 3)
+        self.assertEqual(post.excerpt, "word " * 29 + "word…")
+
+    def test_editor_excerpt_is_kept(self):
+        post = Post.objects.create(
+            title="Blog title", slug="blog-title", author=self.user,
+            content="<p>Some &amp; content</p>", excerpt="My excerpt")
+        self.assertEqual(post.excerpt, "My excerpt")
+        post.excerpt = ""
+        post.save()
+        self.assertEqual(post.excerpt, "Some & content")
+
+    def test_backfill_post_metadata_command(self):
+        for i in range(3):
+            Post.objects.create(
+                title=f"Post {i}", slug=f"post-{i}", author=self.user,
+                content="<p>Three little words</p>")
+        Post.objects.update(word_count=0, reading_time=0, excerpt="")
+        out = StringIO()
+        call_command("backfill_post_metadata", "--batch-size=2", stdout=out)
+        self.assertIn("Processed 2 posts, updated 2.", out.getvalue())
+        self.assertIn("Updated the metadata of 3 of 3 posts", out.getvalue())
+        self.assertEqual(
+            Post.objects.filter(word_count=3, reading_time=1,
+                                excerpt="Three little words").count(), 3)
+
+
+class TestFeaturedImage(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="myUsername", password="myPassword")
+        self.post = Post.objects.create(
+            title="Blog title", slug="blog-title", author=self.user,
+            content="Content")
+        self.template = Template(
+            '{% load blog_images %}{% featured_image post "scale" %}')
+
+    def test_has_featured_image_flag(self):
+        self.assertFalse(self.post.has_featured_image)
+        self.post.featured_image = "image/upload/v1/sample.jpg"
+        self.post.save(update_fields=["featured_image"])
+        self.post.refresh_from_db()
+        self.assertTrue(self.post.has_featured_image)
+        self.post.featured_image = "placeholder"
+        self.post.save()
+        self.assertFalse(
+            Post.objects.filter(has_featured_image=True).exists())
+
+    def test_placeholder_image_tag(self):
+        html = self.template.render(Context({"post": self.post}))
+        self.assertIn('src="/static/images/default.jpg"', html)
+        self.assertIn('width="800" height="530" loading="lazy"', html)
+        self.assertNotIn("srcset", html)
+
+    def test_responsive_image_tag(self):
+        self.post.featured_image = "image/upload/v1/sample.jpg"
+        self.post.image_width, self.post.image_height = 1600, 900
+        self.post.save()
+        html = self.template.render(Context({"post": self.post}))
+        self.assertIn("c_limit,f_auto,q_auto,w_400/v1/sample.jpg 400w", html)
+        self.assertIn("w_1200/v1/sample.jpg 1200w", html)
+        self.assertIn('width="1600" height="900" loading="lazy"', html)
+
+
+class TestSeedBlog(TestCase):
+
+    def seed(self, **options):
+        options = {"users": 5, "posts": 20, "comments": 200, **options}
+        call_command("seed_blog", batch_size=7, seed=1, stdout=StringIO(),
+                     **options)
+
+    def test_seeds_consistent_data(self):
+        self.seed(collaborate_requests=3)
+        self.assertEqual(User.objects.count(), 5)
+        self.assertEqual(Post.objects.count(), 20)
+        self.assertEqual(Comment.objects.count(), 200)
+        self.assertEqual(CollaborateRequest.objects.count(), 3)
+        for post in Post.objects.all():
+            self.assertEqual(post.approved_comment_count,
+                             post.comments.filter(approved=True).count())
+            self.assertEqual(render_content(post.content), post.rendered_content)
+            self.assertFalse(post.has_featured_image)
+        self.assertFalse(Comment.objects.filter(
+            created_on__lt=F("post__created_on")).exists())
+
+    def test_same_seed_gives_same_data(self):
+        self.seed()
+        first = list(Comment.objects.order_by("id").values_list(
+            "post__slug", "author__username", "body"))
+        Post.objects.all().delete()
+        User.objects.all().delete()
+        self.seed()
+        second = list(Comment.objects.order_by("id").values_list(
+            "post__slug", "author__username", "body"))
+        self.assertEqual(first, second)
+
+    def test_skew_concentrates_comments(self):
+        self.seed(skew=4)
+        busiest = max(Post.objects.values_list("approved_comment_count", flat=True))
+        self.assertGreater(busiest, 200 * 0.8 / 20 * 2)
+
+    def test_refuses_existing_prefix(self):
+        self.seed()
+        with self.assertRaises(CommandError):
+            self.seed()
+
+    def test_zero_counts(self):
+        self.seed(posts=0, comments=0)
+        self.assertEqual(User.objects.count(), 5)
+        self.assertFalse(Post.objects.exists())
+        self.seed(users=0, posts=0, comments=0, collaborate_requests=2,
+                  prefix="other")
+        self.assertEqual(CollaborateRequest.objects.count(), 2)
+
+    def test_refuses_content_without_authors(self):
+        for options in ({"users": 0}, {"posts": 0}, {"posts": -1}):
+            with self.assertRaises(CommandError, msg=options):
+                self.seed(**options)
+        self.assertFalse(User.objects.exists())
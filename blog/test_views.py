@@ -1,8 +1,32 @@
+import gzip
+import importlib
+import json
+import os
+import re
+import tempfile
+from io import StringIO
+from unittest import mock
+from asgiref.sync import sync_to_async
 from django.contrib.auth.models import User
-from django.urls import reverse
-from django.test import TestCase
+from django.core.cache import cache
+from django.contrib.sessions.models import Session
+from django.core.management import CommandError, call_command
+from django.template import Context, Template, engines
+from django.urls import clear_url_caches, reverse
+from django.test import TestCase, override_settings
+from django.utils import timezone
 from .forms import CommentForm
-from .models import Post
+from about.models import About, CollaborateRequest
+from .models import Post, Comment, CommentSubmission
+from .queue import RejectComment
+from .search import search_posts
+from codestar import routers
+from codestar.metrics import registry
+from codestar.storage import find_unhashed_references, minify_css, minify_js
+from codestar.templating import precompile_templates
+from . import sitemaps, slugs
+from .cache import bump_post_versions
+from .templatetags import blog_forms
 
 class TestBlogViews(TestCase):
 
@@ -10,6 +34,7 @@ class TestBlogViews(TestCase):
         # Self represents within our tests. self references the current class instance. It is used to create and access variables that belong to that class.
         # In the context of testing, especially with Django's TestCase class, self is used in the setUp method to create instance variables you want to use across
         #  different test methods. And then, inside our test methods, we can access these variables to run our tests.
+        cache.clear()
         self.user = User.objects.create_superuser(
             username="myUsername",
             password="myPassword",
@@ -49,6 +74,61 @@ class TestBlogViews(TestCase):
         self.assertIsInstance(
             response.context['comment_form'], CommentForm)
     
+    def test_post_detail_query_budget(self):
+        """Comments and their authors are fetched in a single query"""
+        for i in range(5):
+            commenter = User.objects.create_user(
+                username=f"commenter{i}", password="myPassword")
+            Comment.objects.create(post=self.post, author=commenter,
+                                   body=f"Comment {i}", approved=True)
+        # The validators for conditional GET, the post and its comments
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse(
+                'post_detail', args=['blog-title']))
+        self.assertIn(b"commenter4", response.content)
+        self.assertEqual(response.context['comment_count'], 5)
+
+    def test_pending_comments_only_shown_to_their_author(self):
+        """Unapproved comments are filtered out on the server"""
+        other = User.objects.create_user(
+            username="otherUser", password="otherPassword")
+        Comment.objects.create(post=self.post, author=self.user,
+                               body="My pending comment")
+        Comment.objects.create(post=self.post, author=other,
+                               body="Other pending comment")
+        url = reverse('post_detail', args=['blog-title'])
+
+        response = self.client.get(url)
+        self.assertNotIn(b"pending comment", response.content)
+
+        self.client.login(username="myUsername", password="myPassword")
+        response = self.client.get(url)
+        self.assertIn(b"My pending comment", response.content)
+        self.assertIn(b"This comment is awaiting approval", response.content)
+        self.assertNotIn(b"Other pending comment", response.content)
+
+    def test_comments_load_in_pages(self):
+        """Long threads are rendered a page at a time"""
+        for i in range(25):
+            Comment.objects.create(post=self.post, author=self.user,
+                                   body=f"Comment number {i}", approved=True)
+        response = self.client.get(reverse(
+            'post_detail', args=['blog-title']))
+        comments = response.context['comments']
+        self.assertEqual(len(comments), 20)
+        self.assertIn(b"Comment number 24", response.content)
+        self.assertNotIn(b"Comment number 4<", response.content)
+        self.assertIn(b"Load more comments", response.content)
+
+        response = self.client.get(
+            reverse('comment_list', args=['blog-title']),
+            {'after': comments.next_cursor})
+        data = response.json()
+        self.assertIn("Comment number 4", data['html'])
+        self.assertIn("Comment number 0", data['html'])
+        self.assertNotIn("Comment number 5", data['html'])
+        self.assertIsNone(data['next'])
+
     def test_successful_comment_submission(self):
         """Test for posting a comment on a post"""
         # Commenting on a blog post is reserved for authenticated users, so a user must log in before commenting. We use the username and password previously defined in the setUp method to test this step.
@@ -72,4 +152,1092 @@ class TestBlogViews(TestCase):
         response = self.client.post(reverse('about'), post_data)
         self.assertEqual(response.status_code, 200)
         self.assertIn(
-            b'Collaboration request received! I endeavour to respond within 2 working days.', response.content)
\ No newline at end of file
+            b'Collaboration request received! I endeavour to respond within 2 working days.', response.content)
+
+
+class TestPostListView(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        for i in range(8):
+            author = User.objects.create_user(
+                username=f"author{i}", password="myPassword")
+            Post.objects.create(title=f"Post {i}", slug=f"post-{i}",
+                                author=author, content="Post content",
+                                excerpt=f"Excerpt {i}", status=1)
+
+    def test_home_page_query_budget(self):
+        """The home page must not run one query per post card"""
+        # Cursor pages fetch their posts, with authors, in a single query,
+        # plus one query for the conditional GET validators of the listing
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('home'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"Author: author7", response.content)
+        # Offset pages also count the posts, but only on the first request
+        with self.assertNumQueries(2):
+            self.client.get(reverse('home') + '?page=1')
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('home') + '?page=2')
+        self.assertEqual(len(response.context['post_list']), 2)
+
+    def test_cursor_pagination(self):
+        """Next and previous cursors walk the posts newest first"""
+        response = self.client.get(reverse('home'))
+        first_page = list(response.context['post_list'])
+        self.assertEqual(first_page[0].title, "Post 7")
+        self.assertFalse(response.context['page_obj'].has_previous())
+        next_cursor = response.context['page_obj'].next_cursor
+        self.assertIn(f'?after={next_cursor}'.encode(), response.content)
+
+        response = self.client.get(reverse('home'), {'after': next_cursor})
+        titles = [post.title for post in response.context['post_list']]
+        self.assertEqual(titles, ["Post 1", "Post 0"])
+        self.assertFalse(response.context['page_obj'].has_next())
+
+        previous_cursor = response.context['page_obj'].previous_cursor
+        response = self.client.get(reverse('home'), {'before': previous_cursor})
+        self.assertEqual(list(response.context['post_list']), first_page)
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+    def test_invalid_cursor_returns_404(self):
+        response = self.client.get(reverse('home'), {'after': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_published_count_invalidated_on_save(self):
+        """Publishing a post refreshes the cached count"""
+        self.client.get(reverse('home') + '?page=1')
+        Post.objects.create(title="Post 8", slug="post-8",
+                            author=User.objects.first(),
+                            content="Post content", status=1)
+        response = self.client.get(reverse('home') + '?page=1')
+        self.assertEqual(response.context['paginator'].count, 9)
+
+
+class TestPageCache(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="myUsername", password="myPassword")
+        self.post = Post.objects.create(
+            title="Blog title", slug="blog-title", author=self.user,
+            content="Blog content", excerpt="Blog excerpt", status=1)
+        self.url = reverse('post_detail', args=['blog-title'])
+
+    def test_anonymous_pages_served_from_cache(self):
+        """Repeat anonymous requests do not touch the database"""
+        self.client.get(self.url)
+        self.client.get(reverse('home'))
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+            self.assertIn(b"Blog content", response.content)
+            response = self.client.get(reverse('home'))
+            self.assertIn(b"Blog excerpt", response.content)
+
+    def test_post_changes_invalidate_cached_pages(self):
+        self.client.get(self.url)
+        self.client.get(reverse('home'))
+        self.post.content = "Updated content"
+        self.post.excerpt = "Updated excerpt"
+        self.post.save()
+        self.assertIn(b"Updated content", self.client.get(self.url).content)
+        self.assertIn(b"Updated excerpt",
+                      self.client.get(reverse('home')).content)
+
+    def test_comment_changes_invalidate_cached_pages(self):
+        self.client.get(self.url)
+        comment = Comment.objects.create(
+            post=self.post, author=self.user, body="A fresh comment")
+        self.assertNotIn(b"A fresh comment", self.client.get(self.url).content)
+        comment.approved = True
+        comment.save()
+        self.assertIn(b"A fresh comment", self.client.get(self.url).content)
+        comment.delete()
+        self.assertNotIn(b"A fresh comment", self.client.get(self.url).content)
+
+    def test_logged_in_users_get_live_pages(self):
+        self.client.get(self.url)
+        self.client.login(username="myUsername", password="myPassword")
+        response = self.client.get(self.url)
+        self.assertIn(b"Leave a comment", response.content)
+
+    @override_settings(BLOG_CACHE_TIMEOUT=30)
+    def test_versions_of_unknown_slugs_expire(self):
+        with mock.patch.object(cache, 'add', wraps=cache.add) as add:
+            response = self.client.get(reverse('post_detail', args=['nope']))
+        self.assertEqual(response.status_code, 404)
+        self.assertTrue(add.call_args_list)
+        for call in add.call_args_list:
+            self.assertEqual(call.args[2], 60)
+
+
+class TestConditionalGet(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="myUsername", password="myPassword")
+        self.post = Post.objects.create(
+            title="Blog title", slug="blog-title", author=self.user,
+            content="Blog content", status=1)
+        self.url = reverse('post_detail', args=['blog-title'])
+
+    def test_matching_etag_returns_304(self):
+        response = self.client.get(self.url)
+        self.assertTrue(response.has_header('ETag'))
+        self.assertTrue(response.has_header('Last-Modified'))
+        response = self.client.get(
+            self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+    def test_comment_approval_changes_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        Comment.objects.create(post=self.post, author=self.user,
+                               body="A comment", approved=True)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_comment_edits_change_etag(self):
+        older = Comment.objects.create(post=self.post, author=self.user,
+                                       body="Older comment")
+        middle = Comment.objects.create(post=self.post, author=self.user,
+                                        body="Middle comment", approved=True)
+        newest = Comment.objects.create(post=self.post, author=self.user,
+                                        body="Newest comment", approved=True)
+        etags = [self.client.get(self.url)['ETag']]
+        # An admin edits the body of an approved comment
+        middle.body = "Edited comment"
+        middle.save()
+        etags.append(self.client.get(self.url)['ETag'])
+        # The same number of approved comments and the same newest one,
+        # but another older one
+        superuser = User.objects.create_superuser(
+            username="admin", password="x", email="admin@test.com")
+        self.client.force_login(superuser)
+        changelist = reverse('admin:blog_comment_changelist')
+        self.client.post(changelist, {'action': 'reject_comments',
+                                      '_selected_action': [middle.pk]})
+        self.client.post(changelist, {'action': 'approve_comments',
+                                      '_selected_action': [older.pk]})
+        self.client.logout()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etags[-1])
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Older comment")
+        etags.append(response['ETag'])
+        self.assertEqual(len(set(etags)), 3)
+
+    def test_home_if_modified_since(self):
+        response = self.client.get(reverse('home'))
+        last_modified = response['Last-Modified']
+        response = self.client.get(
+            reverse('home'), HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_logged_in_users_get_full_responses(self):
+        etag = self.client.get(self.url)['ETag']
+        self.client.login(username="myUsername", password="myPassword")
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class TestPostSearch(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="myUsername", password="myPassword")
+        Post.objects.create(title="Baking bread", slug="baking-bread",
+                            author=self.user, status=1,
+                            content="<p>Flour, water and patience.</p>")
+        Post.objects.create(title="Weekend notes", slug="weekend-notes",
+                            author=self.user, status=1,
+                            content="<p>Mostly about bread and coffee.</p>")
+        Post.objects.create(title="Bread draft", slug="bread-draft",
+                            author=self.user, status=0,
+                            content="<p>Unpublished bread.</p>")
+
+    def search(self, query):
+        response = self.client.get(reverse('search'), {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [post.slug for post in response.context['post_list']]
+
+    def test_results_are_ranked_and_published_only(self):
+        """Title matches rank above content matches, drafts are hidden"""
+        self.assertEqual(self.search("bread"),
+                         ["baking-bread", "weekend-notes"])
+
+    def test_all_words_must_match(self):
+        self.assertEqual(self.search("bread coffee"), ["weekend-notes"])
+        self.assertEqual(self.search("bread tea"), [])
+
+    def test_index_follows_edits(self):
+        post = Post.objects.get(slug="weekend-notes")
+        post.content = "<p>Only coffee now.</p>"
+        post.excerpt = ""
+        post.save()
+        self.assertEqual(self.search("bread"), ["baking-bread"])
+        post.delete()
+        self.assertEqual(self.search("coffee"), [])
+
+    def test_query_syntax_is_escaped(self):
+        self.assertEqual(self.search('"bread" OR (NEAR'), [])
+        self.assertEqual(self.search("*"), [])
+
+    def test_results_are_a_composable_queryset(self):
+        results = search_posts("bread")
+        self.assertEqual(results.count(), 2)
+        post = results.select_related("author").only(
+            "slug", "author__username").first()
+        self.assertEqual((post.slug, post.author.username),
+                         ("baking-bread", "myUsername"))
+        self.assertLess(post.rank, 0)
+
+
+def failing_moderator(comment):
+    raise ConnectionError("Spam service unavailable")
+
+
+def deleting_moderator(comment):
+    # The post is deleted, with its submissions, while being moderated
+    if comment.body == "Deleted":
+        Post.objects.filter(pk=comment.post_id).delete()
+
+
+def rejecting_moderator(comment):
+    raise RejectComment("Looks like spam")
+
+
+class TestCommentQueue(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="myUsername", password="myPassword")
+        self.post = Post.objects.create(
+            title="Blog title", slug="blog-title", author=self.user,
+            content="Blog content", status=1)
+        self.client.login(username="myUsername", password="myPassword")
+        self.url = reverse('post_detail', args=['blog-title'])
+
+    def submit(self, body="A queued comment"):
+        response = self.client.post(self.url, {'body': body})
+        self.assertContains(response, 'Comment submitted and awaiting approval')
+        return CommentSubmission.objects.latest('pk')
+
+    def status(self, submission):
+        return self.client.get(reverse(
+            'comment_submission_status',
+            args=['blog-title', submission.pk])).json()
+
+    def test_comments_are_saved_by_the_worker(self):
+        submission = self.submit()
+        self.assertFalse(Comment.objects.exists())
+        self.assertEqual(self.status(submission)['status'], 'pending')
+        response = self.client.get(self.url)
+        self.assertContains(response, 'A queued comment')
+        self.assertContains(response, 'data-status-url')
+
+        out = StringIO()
+        call_command('process_comment_queue', '--once', stdout=out)
+        self.assertIn('Processed 1 comment submissions.', out.getvalue())
+        comment = Comment.objects.get()
+        self.assertEqual(comment.body, 'A queued comment')
+        self.assertFalse(comment.approved)
+        data = self.status(submission)
+        self.assertEqual(data['status'], 'done')
+        self.assertIn(f'id="comment{comment.pk}"', data['html'])
+        self.assertNotContains(self.client.get(self.url), 'data-status-url')
+
+    def test_status_is_private_to_the_author(self):
+        submission = self.submit()
+        User.objects.create_user(username="other", password="myPassword")
+        self.client.login(username="other", password="myPassword")
+        response = self.client.get(reverse(
+            'comment_submission_status', args=['blog-title', submission.pk]))
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(COMMENT_QUEUE_EAGER=True)
+    def test_eager_queue_saves_during_the_request(self):
+        submission = self.submit()
+        self.assertEqual(self.status(submission)['status'], 'done')
+        self.assertTrue(Comment.objects.filter(body='A queued comment').exists())
+
+    @override_settings(
+        COMMENT_MODERATORS=['blog.test_views.deleting_moderator'])
+    def test_deleted_submissions_do_not_stop_the_worker(self):
+        self.submit("Deleted")
+        other = Post.objects.create(
+            title="Other title", slug="other-title", author=self.user,
+            content="Other content", status=1)
+        CommentSubmission.objects.create(
+            post=other, author=self.user, body="Kept")
+        out = StringIO()
+        call_command('process_comment_queue', '--once', stdout=out)
+        self.assertIn('Processed 2 comment submissions.', out.getvalue())
+        self.assertEqual(Comment.objects.get().body, 'Kept')
+        self.assertEqual(CommentSubmission.objects.get().status,
+                         CommentSubmission.DONE)
+
+    @override_settings(
+        COMMENT_MODERATORS=['blog.test_views.failing_moderator'])
+    def test_failures_are_retried_later(self):
+        submission = self.submit()
+        with self.assertLogs('blog.queue', 'ERROR'):
+            call_command('process_comment_queue', '--once', stdout=StringIO())
+        submission.refresh_from_db()
+        self.assertEqual(submission.status, CommentSubmission.PENDING)
+        self.assertEqual(submission.attempts, 1)
+        self.assertGreater(submission.available_at, timezone.now())
+        self.assertIn('Spam service unavailable', submission.last_error)
+
+        # Not due yet, so the next run leaves it alone
+        call_command('process_comment_queue', '--once', stdout=StringIO())
+        submission.refresh_from_db()
+        self.assertEqual(submission.attempts, 1)
+
+        CommentSubmission.objects.update(available_at=timezone.now())
+        with override_settings(COMMENT_MODERATORS=[]):
+            call_command('process_comment_queue', '--once', stdout=StringIO())
+        submission.refresh_from_db()
+        self.assertEqual(submission.status, CommentSubmission.DONE)
+        self.assertEqual(submission.attempts, 2)
+
+    @override_settings(
+        COMMENT_MODERATORS=['blog.test_views.rejecting_moderator'])
+    def test_rejected_comments_are_not_retried(self):
+        submission = self.submit()
+        call_command('process_comment_queue', '--once', stdout=StringIO())
+        self.assertEqual(self.status(submission)['status'], 'failed')
+        self.assertFalse(Comment.objects.exists())
+
+
+def reload_urlconfs():
+    """Rebuilds the URL patterns after ASYNC_VIEWS was changed"""
+    import about.urls
+    import blog.urls
+    import codestar.urls
+    for module in (about.urls, blog.urls, codestar.urls):
+        importlib.reload(module)
+    clear_url_caches()
+
+
+@override_settings(ASYNC_VIEWS=True)
+class TestAsyncViews(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        reload_urlconfs()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        # The class override is only undone by a class cleanup, later
+        with override_settings(ASYNC_VIEWS=False):
+            reload_urlconfs()
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="myUsername", password="myPassword")
+        for i in range(8):
+            Post.objects.create(title=f"Post {i}", slug=f"post-{i}",
+                                author=self.user, content="Content", status=1)
+        self.post = Post.objects.get(slug="post-0")
+        Comment.objects.create(post=self.post, author=self.user,
+                               body="An approved comment", approved=True)
+
+    @override_settings(DEBUG=True)
+    async def test_only_allauth_middleware_is_adapted(self):
+        with self.assertLogs('django.request', 'DEBUG') as logs:
+            await self.async_client.get(reverse('home'))
+        adapted = [record.getMessage() for record in logs.records
+                   if 'adapted for middleware' in record.getMessage()]
+        self.assertEqual(adapted, [
+            'Asynchronous handler adapted for middleware '
+            'allauth.account.middleware.AccountMiddleware.'])
+
+    async def test_async_home_page(self):
+        response = await self.async_client.get(reverse('home'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([post.slug for post in response.context['post_list']],
+                         [f"post-{i}" for i in range(7, 1, -1)])
+        next_cursor = response.context['page_obj'].next_cursor
+        response = await self.async_client.get(
+            reverse('home'), {'after': next_cursor})
+        self.assertEqual(len(response.context['post_list']), 2)
+        response = await self.async_client.get(reverse('home'), {'page': 2})
+        self.assertEqual(len(response.context['post_list']), 2)
+        response = await self.async_client.get(reverse('home'), {'page': 3})
+        self.assertEqual(response.status_code, 404)
+
+    async def test_async_pages_are_cached_and_conditional(self):
+        url = reverse('post_detail', args=['post-0'])
+        response = await self.async_client.get(url)
+        self.assertContains(response, "An approved comment")
+        cached = await self.async_client.get(url)
+        self.assertEqual(cached.content, response.content)
+        self.assertIsNone(cached.context)
+        response = await self.async_client.get(
+            url, headers={'if-none-match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+        response = await self.async_client.get(
+            reverse('post_detail', args=['missing']))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_async_comment_submission(self):
+        await sync_to_async(self.async_client.force_login)(self.user)
+        url = reverse('post_detail', args=['post-0'])
+        response = await self.async_client.post(
+            url, {'body': 'An async comment'})
+        self.assertContains(response, 'Comment submitted and awaiting approval')
+        self.assertContains(response, 'An async comment')
+        self.assertTrue(await CommentSubmission.objects.filter(
+            body='An async comment').aexists())
+
+    async def test_async_about_page(self):
+        response = await self.async_client.get(reverse('about'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('collaborate_form', response.context)
+
+
+@override_settings(DATABASE_REPLICAS=["default"], REPLICA_PIN_SECONDS=0)
+class TestReplicaRouting(TestCase):
+    """The replica is an alias of default here, the tests check which
+    requests pick a replica"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="myUsername", password="myPassword")
+        self.post = Post.objects.create(
+            title="Blog title", slug="blog-title", author=self.user,
+            content="Blog content", status=1)
+        self.url = reverse('post_detail', args=['blog-title'])
+        patcher = mock.patch.object(
+            routers.random, "choice", wraps=routers.random.choice)
+        self.choose_replica = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_public_pages_read_from_replicas(self):
+        for url in (reverse('home'), self.url, reverse('about')):
+            self.choose_replica.reset_mock()
+            self.assertEqual(self.client.get(url).status_code, 200)
+            self.assertTrue(self.choose_replica.called, url)
+
+    def test_other_requests_use_the_primary(self):
+        self.client.get(reverse('search'), {'q': 'blog'})
+        self.client.get(reverse('comment_list', args=['blog-title']))
+        self.client.post(reverse('about'), {'name': 'A', 'email': 'a@a.com',
+                                            'message': 'Hello'})
+        self.assertFalse(self.choose_replica.called)
+
+    def test_writers_are_pinned_to_the_primary(self):
+        self.client.login(username="myUsername", password="myPassword")
+        response = self.client.post(self.url, {'body': 'My comment'})
+        self.assertIn(routers.PIN_COOKIE, response.cookies)
+        response = self.client.get(self.url)
+        self.assertContains(response, 'My comment')
+        self.assertFalse(self.choose_replica.called)
+
+        del self.client.cookies[routers.PIN_COOKIE]
+        response = self.client.get(self.url)
+        self.assertNotIn(routers.PIN_COOKIE, response.cookies)
+        self.assertTrue(self.choose_replica.called)
+
+    def test_logging_in_does_not_pin(self):
+        response = self.client.post(reverse('account_login'), {
+            'login': 'myUsername', 'password': 'myPassword'})
+        self.assertEqual(response.status_code, 302)
+        self.assertNotIn(routers.PIN_COOKIE, response.cookies)
+        self.client.get(self.url)
+        self.assertTrue(self.choose_replica.called)
+
+    @override_settings(REPLICA_PIN_SECONDS=60)
+    def test_recent_changes_are_read_from_the_primary(self):
+        """Pages of data changed within REPLICA_PIN_SECONDS are not built
+        from a replica that may lag behind"""
+        self.client.get(self.url)
+        self.assertFalse(self.choose_replica.called)
+
+    def test_sessions_are_read_from_the_primary(self):
+        router = routers.ReplicaRouter()
+        token = routers._state.set(routers.RoutingState(use_replica=True))
+        try:
+            self.assertEqual(router.db_for_read(Session), "default")
+            self.assertEqual(router.db_for_read(Post), "default")
+            self.assertTrue(self.choose_replica.called)
+        finally:
+            routers._state.reset(token)
+        self.choose_replica.reset_mock()
+        router.db_for_read(Post)
+        self.assertFalse(self.choose_replica.called)
+
+
+class TestRequestMetrics(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        registry.clear()
+        self.user = User.objects.create_superuser(
+            username="myUsername", password="myPassword",
+            email="test@test.com")
+        Post.objects.create(title="Blog title", slug="blog-title",
+                            author=self.user, content="Content", status=1)
+
+    def test_server_timing_and_log_line(self):
+        with self.assertLogs('codestar.metrics', 'INFO') as logs:
+            response = self.client.get(reverse('home'))
+        self.assertRegex(response['Server-Timing'],
+                         r'db;dur=[\d.]+;desc="2 queries", tpl;dur=[\d.]+, '
+                         r'total;dur=[\d.]+')
+        self.assertIn("path=/ view=home status=200 queries=2", logs.output[0])
+        template_ms = float(re.search(
+            r'tpl;dur=([\d.]+)', response['Server-Timing']).group(1))
+        self.assertGreater(template_ms, 0)
+
+    def test_metrics_endpoint_is_staff_only(self):
+        self.client.get(reverse('home'))
+        self.client.get(reverse('home'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 302)
+
+        self.client.login(username="myUsername", password="myPassword")
+        response = self.client.get(reverse('metrics'))
+        self.assertContains(
+            response, 'http_request_duration_seconds_count{view="home"} 2')
+        self.assertContains(
+            response, 'http_request_db_queries_bucket{view="home",le="2"} 2')
+        self.assertContains(response, '# TYPE http_request_db_seconds histogram')
+
+    def test_profile_on_request(self):
+        url = reverse('post_detail', args=['blog-title'])
+        response = self.client.get(url, {'_profile': '1'})
+        self.assertContains(response, 'Blog title')
+        self.client.login(username="myUsername", password="myPassword")
+        response = self.client.get(url, {'_profile': '1'})
+        self.assertEqual(response['Content-Type'], 'text/plain')
+        self.assertContains(response, 'function calls')
+
+    def test_sampled_slow_requests_are_saved(self):
+        with tempfile.TemporaryDirectory() as profile_dir:
+            with override_settings(METRICS_PROFILE_SAMPLE_RATE=1,
+                                   METRICS_PROFILE_SLOW_MS=0,
+                                   METRICS_PROFILE_DIR=profile_dir):
+                with self.assertLogs('codestar.metrics', 'WARNING'):
+                    response = self.client.get(reverse('home'))
+            self.assertContains(response, 'Blog title')
+            [name] = os.listdir(profile_dir)
+            self.assertTrue(name.endswith('-home.prof'))
+
+    def test_sampled_profile_is_not_sent_to_anonymous_users(self):
+        url = reverse('post_detail', args=['blog-title'])
+        with override_settings(METRICS_PROFILE_SAMPLE_RATE=1,
+                               METRICS_PROFILE_SLOW_MS=10 ** 9):
+            response = self.client.get(url, {'_profile': '1'})
+        self.assertNotEqual(response['Content-Type'], 'text/plain')
+        self.assertContains(response, 'Blog title')
+
+    async def test_async_requests_are_measured(self):
+        response = await self.async_client.get(reverse('home'))
+        self.assertIn('total;dur=', response['Server-Timing'])
+
+
+class TestBenchCommand(TestCase):
+
+    def bench(self, *args):
+        out = StringIO()
+        call_command('bench', '--current-db', '--users=3', '--posts=12',
+                     '--comments=30', '--requests=3', *args, stdout=out)
+        return out.getvalue()
+
+    def test_bench_compares_against_baseline(self):
+        with tempfile.TemporaryDirectory() as directory:
+            baseline = os.path.join(directory, 'baseline.json')
+            out = self.bench(f'--baseline={baseline}', '--save-baseline')
+            self.assertIn('Seeded 3 users, 12 posts and 30 comments', out)
+            for scenario in ('home', 'index_page', 'index_cursor',
+                             'post_detail', 'comment_post', 'about'):
+                self.assertIn(scenario, out)
+            with open(baseline) as f:
+                results = json.load(f)
+            self.assertEqual(results['post_detail']['max_queries'], 3)
+
+            # Generous latency limits, so only the query counts can fail
+            for result in results.values():
+                result['p95_ms'] *= 100
+            results['post_detail']['max_queries'] = 2
+            with open(baseline, 'w') as f:
+                json.dump(results, f)
+            with self.assertRaisesMessage(
+                    CommandError, 'post_detail ran 3 queries, 2 in the baseline'):
+                self.bench(f'--baseline={baseline}')
+
+    def test_bench_templates(self):
+        out = StringIO()
+        call_command('bench_templates', '--current-db', '--comments=30',
+                     '--requests=2', stdout=out)
+        for variant in ('no caches', 'cached loader', 'cached loader + form'):
+            self.assertIn(variant, out.getvalue())
+
+
+class TestFeeds(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="writer", password="x")
+        other = User.objects.create_user(username="other", password="x")
+        Post.objects.create(title="Writer post", slug="writer-post",
+                            author=self.user, content="Content", status=1)
+        Post.objects.create(title="Other post", slug="other-post",
+                            author=other, content="Content", status=1)
+        Post.objects.create(title="Draft post", slug="draft-post",
+                            author=self.user, content="Content", status=0)
+
+    def test_feed_formats(self):
+        for name, content_type in (
+                ("post_feed_rss", "application/rss+xml"),
+                ("post_feed_atom", "application/atom+xml"),
+                ("post_feed_json", "application/feed+json")):
+            response = self.client.get(reverse(name))
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response["Content-Type"].startswith(content_type))
+            self.assertContains(response, "http://testserver/writer-post/")
+            self.assertContains(response, "Other post")
+            self.assertNotContains(response, "Draft post")
+        feed = json.loads(self.client.get(reverse("post_feed_json")).content)
+        self.assertEqual(feed["items"][0]["authors"], [{"name": "other"}])
+
+    def test_author_feed(self):
+        response = self.client.get(reverse("author_feed_atom", args=["writer"]))
+        self.assertContains(response, "Writer post")
+        self.assertNotContains(response, "Other post")
+        self.assertNotContains(response, "Draft post")
+        response = self.client.get(reverse("author_feed_rss", args=["nobody"]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_conditional_get(self):
+        url = reverse("post_feed_rss")
+        etag = self.client.get(url)["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # A draft changes nothing in the feed, so the ETag still matches
+        Post.objects.filter(slug="draft-post").get().save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        post = Post.objects.get(slug="writer-post")
+        post.title = "Renamed post"
+        post.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, "Renamed post")
+
+    def test_head_requests(self):
+        for url in (reverse("post_feed_rss"), reverse("sitemap_index"),
+                    reverse("sitemap_shard", args=[0])):
+            response = self.client.head(url)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertTrue(response.has_header("ETag"), url)
+        response = self.client.post(reverse("post_feed_rss"))
+        self.assertEqual(response.status_code, 405)
+
+
+class TestTemplateCaching(TestCase):
+
+    def setUp(self):
+        blog_forms.clear_form_cache()
+
+    def render(self, form):
+        return Template("{% load blog_forms %}{{ form|crispy_cached }}").render(
+            Context({"form": form}))
+
+    def test_unbound_form_rendered_once(self):
+        with mock.patch.object(blog_forms, "as_crispy_form",
+                               wraps=blog_forms.as_crispy_form) as render:
+            first = self.render(CommentForm())
+            self.assertEqual(self.render(CommentForm()), first)
+            self.assertEqual(render.call_count, 1)
+            bound = self.render(CommentForm(data={"body": ""}))
+            self.assertEqual(render.call_count, 2)
+        self.assertIn('name="body"', first)
+        self.assertIn("This field is required", bound)
+
+    def test_templates_precompiled(self):
+        loader = engines["django"].engine.template_loaders[0]
+        loader.reset()
+        self.assertGreater(precompile_templates(), 0)
+        self.assertIn("blog/post_detail.html", loader.get_template_cache)
+
+
+class TestStaticAssets(TestCase):
+
+    def test_minify(self):
+        self.assertEqual(
+            minify_css("/* note */\n.a, .b > p {\n    color: red;\n    margin: 0 1px;\n}\n"),
+            ".a,.b>p{color:red;margin:0 1px}")
+        self.assertEqual(
+            minify_js("/**\n * Docs\n */\nconst a = 1;\n\n    // note\n    f(a); // call\n"),
+            "const a=1;f(a);\n")
+
+    def test_minify_js_keeps_code_between_comments_and_literals(self):
+        self.assertEqual(
+            minify_js("/* a */ var x = 1;\nvar y = 2; /* b */\n"
+                      "const s = `line\n    // keep\n  indented`;\n"
+                      "const r = /\\/\\*x/g; // comment\n"),
+            "var x=1;var y=2;const s=`line\n    // keep\n  indented`;"
+            "const r=/\\/\\*x/g;\n")
+
+    def test_finds_unhashed_references(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, "page.html"), "w") as f:
+                f.write(
+                    "{% load static %}\n"
+                    "<link href=\"{% static 'css/style.css' %}\">\n"
+                    "<!-- <img src=\"{% static 'images/old.jpg' %}\"> -->\n"
+                    "<img src=\"/static/images/default.jpg\">\n"
+                    "<script src=\"{% static 'js/missing.js' %}\"></script>\n")
+            problems = find_unhashed_references(
+                {"css/style.css": "css/style.123.css"}, [directory])
+        self.assertEqual(problems, [
+            ("page.html", 4, "static URL written out, use {% static %}"),
+            ("page.html", 5, "no static file 'js/missing.js'"),
+        ])
+
+    def test_collectstatic_hashes_minifies_and_compresses(self):
+        with tempfile.TemporaryDirectory() as root, override_settings(
+                STATIC_ROOT=root,
+                STATICFILES_FINDERS=[
+                    "django.contrib.staticfiles.finders.FileSystemFinder"],
+                STORAGES={"staticfiles": {
+                    "BACKEND": "codestar.storage.StaticStorage"}}):
+            call_command("collectstatic", interactive=False, verbosity=0)
+            with open(os.path.join(root, "staticfiles.json")) as f:
+                hashed = json.load(f)["paths"]["css/style.css"]
+            self.assertRegex(hashed, r"^css/style\.[0-9a-f]{12}\.css$")
+            with open(os.path.join(root, hashed)) as f:
+                self.assertNotIn("\n", f.read().strip())
+            for suffix in (".gz", ".br"):
+                self.assertTrue(os.path.exists(os.path.join(root, hashed + suffix)))
+
+    def test_critical_css_inlined(self):
+        response = self.client.get(reverse("home"))
+        self.assertContains(response, "<style>/* Above the fold styles")
+        self.assertContains(
+            response, '<link rel="preload" href="/static/css/style.css" as="style"')
+
+
+@override_settings(SITEMAP_SHARD_SIZE=3)
+class TestSitemap(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="writer", password="x")
+        self.posts = [
+            Post.objects.create(title=f"Post {i}", slug=f"post-{i}",
+                                author=self.user, content="Content",
+                                status=int(i != 1))
+            for i in range(7)
+        ]
+
+    def shard_of(self, post):
+        return post.pk // 3
+
+    def test_index_and_shards(self):
+        response = self.client.get(reverse("sitemap_index"))
+        self.assertEqual(response["Content-Type"], "application/xml")
+        shards = range(self.shard_of(self.posts[-1]) + 1)
+        for shard in shards:
+            self.assertContains(response, f"/sitemap-{shard}.xml</loc>")
+
+        urls = []
+        for shard in shards:
+            response = self.client.get(reverse("sitemap_shard", args=[shard]))
+            urls += response.content.decode().count("<url>") * [shard]
+            for post in self.posts:
+                if self.shard_of(post) == shard and post.status == 1:
+                    self.assertContains(
+                        response, f"<loc>http://testserver/{post.slug}/</loc>")
+            self.assertNotContains(response, "/post-1/")
+        self.assertEqual(len(urls), 6)
+        self.assertLessEqual(max(urls.count(shard) for shard in shards), 3)
+
+        response = self.client.get(reverse("sitemap_shard", args=[len(shards)]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_only_changed_shards_rendered_again(self):
+        shards = range(self.shard_of(self.posts[-1]) + 1)
+        for shard in shards:
+            self.client.get(reverse("sitemap_shard", args=[shard]))
+        index = self.client.get(reverse("sitemap_index"))
+        self.assertContains(index, "<lastmod>", count=len(shards))
+
+        post = self.posts[-1]
+        post.title = "Changed"
+        post.save()
+        with mock.patch("blog.sitemaps.render_shard",
+                        wraps=sitemaps.render_shard) as render:
+            for shard in shards:
+                response = self.client.get(
+                    reverse("sitemap_shard", args=[shard]))
+                self.assertEqual(response.status_code, 200)
+        self.assertEqual([call.args[1] for call in render.call_args_list],
+                         [self.shard_of(post)])
+
+        # Unchanged shards answer conditional requests with 304
+        etag = response["ETag"]
+        response = self.client.get(reverse("sitemap_shard", args=[shards[-1]]),
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+
+class TestExportStatic(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="writer", password="x")
+        self.posts = [
+            Post.objects.create(title=f"Post {i}", slug=f"post-{i}",
+                                author=self.user, content=f"Content {i}",
+                                status=int(i != 8))
+            for i in range(9)
+        ]
+        About.objects.create(title="About Me", content="This is about me.")
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def export(self, *args):
+        out = StringIO()
+        call_command('export_static', self.directory.name, '--workers=1',
+                     *args, stdout=out, stderr=StringIO())
+        return out.getvalue()
+
+    def read(self, *parts):
+        with open(os.path.join(self.directory.name, *parts)) as f:
+            return f.read()
+
+    def test_export_writes_every_public_page(self):
+        out = self.export()
+        self.assertIn("Exported 11 pages", out)
+        first_page = self.read("index.html")
+        self.assertIn("Post 7", first_page)
+        self.assertIn('href="/page/2/"', first_page)
+        self.assertNotIn("?after=", first_page)
+        second_page = self.read("page", "2", "index.html")
+        self.assertIn("Post 0", second_page)
+        self.assertIn('href="/"', second_page)
+        self.assertNotIn("?before=", second_page)
+        self.assertIn("Content 3", self.read("post-3", "index.html"))
+        self.assertIn("About Me", self.read("about", "childabout.html"))
+        self.assertFalse(os.path.exists(
+            os.path.join(self.directory.name, "post-8")))
+
+    def test_incremental_export_renders_changed_pages_only(self):
+        self.export()
+        self.assertIn("Exported 0 pages", self.export("--incremental"))
+
+        # An approved comment changes the post page but not the listing
+        commenter = User.objects.create_user(username="reader", password="x")
+        Comment.objects.create(post=self.posts[3], author=commenter,
+                               body="Approved comment", approved=True)
+        self.assertIn("Exported 1 pages", self.export("--incremental"))
+        self.assertIn("Approved comment", self.read("post-3", "index.html"))
+
+        # Unpublishing a post removes its page and renders the listing again
+        self.posts[7].status = 0
+        self.posts[7].save()
+        out = self.export("--incremental")
+        self.assertIn("Exported 2 pages", out)
+        self.assertIn("removed 1", out)
+        self.assertFalse(os.path.exists(
+            os.path.join(self.directory.name, "post-7", "index.html")))
+        self.assertNotIn("Post 7", self.read("index.html"))
+
+    def test_missing_staticfiles_manifest(self):
+        with tempfile.TemporaryDirectory() as root, override_settings(
+                STATIC_ROOT=root,
+                STORAGES={"staticfiles": {
+                    "BACKEND": "codestar.storage.StaticStorage"}}):
+            with self.assertRaisesMessage(CommandError, 'run collectstatic'):
+                self.export()
+        self.assertFalse(os.listdir(self.directory.name))
+
+
+
+class TestBlogArchive(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="writer", password="x")
+        self.reader = User.objects.create_user(username="reader", password="x")
+        self.posts = [
+            Post.objects.create(title=f"Post {i}", slug=f"post-{i}",
+                                author=self.user, content=f"<p>Content {i}</p>",
+                                status=1)
+            for i in range(5)
+        ]
+        for i, post in enumerate(self.posts):
+            Comment.objects.create(post=post, author=self.reader,
+                                   body=f"Comment {i}", approved=i % 2 == 0)
+        About.objects.create(title="About Me", content="This is about me.")
+        CollaborateRequest.objects.create(
+            name="Visitor", email="visitor@example.com", message="Hello")
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.archive = os.path.join(directory.name, "blog.jsonl.gz")
+        call_command('export_blog', self.archive, '--batch-size=2',
+                     stdout=StringIO())
+
+    def load(self, *args):
+        out = StringIO()
+        call_command('import_blog', self.archive, '--batch-size=2', *args,
+                     stdout=out)
+        return out.getvalue()
+
+    def test_round_trip(self):
+        created_on = {post.slug: post.created_on for post in self.posts}
+        Post.objects.all().delete()
+        About.objects.all().delete()
+        CollaborateRequest.objects.all().delete()
+        self.reader.delete()
+
+        out = self.load('--create-users')
+        self.assertIn("Imported 12 rows, skipped 0", out)
+        post = Post.objects.get(slug="post-2")
+        self.assertEqual(post.author, self.user)
+        self.assertEqual(post.created_on, created_on["post-2"])
+        self.assertEqual(post.rendered_content, "<p>Content 2</p>")
+        self.assertEqual(post.word_count, 2)
+        self.assertEqual(post.approved_comment_count, 1)
+        self.assertEqual(post.comments.get().author.username, "reader")
+        self.assertFalse(User.objects.get(username="reader").has_usable_password())
+        self.assertEqual(About.objects.get().title, "About Me")
+        self.assertEqual(CollaborateRequest.objects.get().name, "Visitor")
+
+    def test_existing_rows_are_skipped_or_updated(self):
+        out = self.load()
+        self.assertIn("Imported 0 rows, skipped 12", out)
+        self.assertEqual(Comment.objects.count(), 5)
+
+        Post.objects.filter(slug="post-0").update(title="Changed")
+        self.load()
+        self.assertEqual(Post.objects.get(slug="post-0").title, "Changed")
+        self.load('--on-conflict=update')
+        self.assertEqual(Post.objects.get(slug="post-0").title, "Post 0")
+
+    def test_rows_of_unknown_authors_are_skipped(self):
+        Post.objects.all().delete()
+        self.reader.delete()
+        out = self.load()
+        self.assertIn("blog.comment: 0 imported, 5 skipped", out)
+        self.assertEqual(Post.objects.count(), 5)
+        self.assertEqual(Post.objects.get(slug="post-0").approved_comment_count, 0)
+
+    def test_invalid_archive(self):
+        with open(self.archive, 'wb') as f:
+            f.write(b'not gzip')
+        with self.assertRaisesMessage(CommandError, 'is not a blog archive'):
+            self.load()
+
+    def test_invalid_rows(self):
+        with gzip.open(self.archive, 'rt', encoding='utf-8') as f:
+            lines = f.readlines()
+        for row, message in (('{"model": "blog.post", "slug"\n',
+                              'Invalid row on line 3: Expecting'),
+                             ('[1, 2]\n', 'Invalid row on line 3: [1, 2]')):
+            with gzip.open(self.archive, 'wt', encoding='utf-8') as f:
+                f.writelines(lines[:2] + [row] + lines[2:])
+            with self.assertRaisesMessage(CommandError, message):
+                self.load()
+
+
+class TestSlugCache(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        slugs.clear_slug_cache()
+        self.user = User.objects.create_user(username="writer", password="x")
+        self.other = User.objects.create_user(username="other", password="x")
+        self.post = Post.objects.create(title="Post", slug="post",
+                                        author=self.user, content="Content",
+                                        status=1)
+        self.comment = Comment.objects.create(post=self.post, author=self.user,
+                                              body="My comment", approved=True)
+        self.client.login(username="writer", password="x")
+
+    def test_resolved_slugs_are_cached_until_the_post_changes(self):
+        with self.assertNumQueries(1):
+            ref = slugs.resolve_slug("post")
+        self.assertEqual(ref, (self.post.pk, 1, self.post.updated_on))
+        with self.assertNumQueries(0):
+            self.assertEqual(slugs.resolve_slug("post"), ref)
+
+        self.post.slug = "renamed"
+        self.post.save()
+        self.assertIsNone(slugs.resolve_slug("post"))
+        self.assertEqual(slugs.resolve_slug("renamed").id, self.post.pk)
+
+        # Another process only sees the bumped post version
+        Post.objects.filter(pk=self.post.pk).update(status=0)
+        self.assertEqual(slugs.resolve_slug("renamed").status, 1)
+        bump_post_versions("renamed")
+        self.assertEqual(slugs.resolve_slug("renamed").status, 0)
+
+    def test_entries_expire(self):
+        with override_settings(SLUG_CACHE_TIMEOUT=-1):
+            slugs.resolve_slug("post")
+        with self.assertNumQueries(1):
+            slugs.resolve_slug("post")
+
+    @override_settings(SLUG_CACHE_SIZE=1)
+    def test_least_recently_used_slug_is_evicted(self):
+        Post.objects.create(title="Other", slug="other", author=self.user,
+                            content="Content", status=1)
+        slugs.resolve_slug("post")
+        slugs.resolve_slug("other")
+        with self.assertNumQueries(1):
+            slugs.resolve_slug("post")
+
+    def test_unpublished_post_returns_404(self):
+        self.post.status = 0
+        self.post.save()
+        for url in (reverse('post_detail', args=['post']),
+                    reverse('comment_list', args=['post']),
+                    reverse('comment_delete', args=['post', self.comment.pk])):
+            self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_comment_delete_checks_owner_in_one_query(self):
+        url = reverse('comment_delete', args=['post', self.comment.pk])
+        self.client.force_login(self.other)
+        self.client.get(url)
+        self.assertTrue(Comment.objects.filter(pk=self.comment.pk).exists())
+
+        self.client.force_login(self.user)
+        slugs.resolve_slug("post")
+        # The session and user, the comment, then locking it to update the
+        # approved comment count, unlinking its submission and deleting it
+        with self.assertNumQueries(7):
+            self.client.get(url)
+        self.assertFalse(Comment.objects.filter(pk=self.comment.pk).exists())
+        self.assertEqual(
+            Post.objects.get(pk=self.post.pk).approved_comment_count, 0)
+
+    def test_comment_edit(self):
+        url = reverse('comment_edit', args=['post', self.comment.pk])
+        slugs.resolve_slug("post")
+        # The session and user, the comment with its body, then locking,
+        # saving it and updating the approved comment count in a savepoint
+        with self.assertNumQueries(8):
+            self.client.post(url, {"body": "Edited"})
+        comment = Comment.objects.get(pk=self.comment.pk)
+        self.assertEqual(comment.body, "Edited")
+        self.assertFalse(comment.approved)
+        self.assertEqual(
+            Post.objects.get(pk=self.post.pk).approved_comment_count, 0)
+
+        self.client.force_login(self.other)
+        self.client.post(url, {"body": "Not mine"})
+        self.assertEqual(Comment.objects.get(pk=self.comment.pk).body, "Edited")
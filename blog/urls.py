@@ -1,4 +1,5 @@
 from . import views
+from django.conf import settings
 from django.urls import path
 
 '''
@@ -13,13 +14,38 @@ than one URL pointing to the same view function then the naming can quickly get
 As the Django documentation says, tying URLs to Python function names is a Bad And Ugly Thing.
 '''
 
-urlpatterns = [
+# settings.ASYNC_VIEWS switches to the async views for ASGI servers
+if settings.ASYNC_VIEWS:
+    post_list_view = views.post_list_async
+    post_detail_view = views.post_detail_async
+else:
     # As the view is a class, you need an as_view() method
-    path('', views.PostList.as_view(), name='home'),
+    post_list_view = views.PostList.as_view()
+    post_detail_view = views.post_detail
+
+urlpatterns = [
+    path('', post_list_view, name='home'),
+    # Must come before the post_detail pattern, which would also match
+    # search/. Post.slug rejects the slugs these pages take.
+    path('search/', views.PostSearch.as_view(), name='search'),
+    path('sitemap.xml', views.sitemap_index, name='sitemap_index'),
+    path('sitemap-<int:shard>.xml', views.sitemap_shard, name='sitemap_shard'),
+    path('feeds/rss/', views.post_feed, {'feed_format': 'rss'}, name='post_feed_rss'),
+    path('feeds/atom/', views.post_feed, {'feed_format': 'atom'}, name='post_feed_atom'),
+    path('feeds/json/', views.post_feed, {'feed_format': 'json'}, name='post_feed_json'),
+    path('feeds/author/<str:username>/rss/', views.post_feed,
+         {'feed_format': 'rss'}, name='author_feed_rss'),
+    path('feeds/author/<str:username>/atom/', views.post_feed,
+         {'feed_format': 'atom'}, name='author_feed_atom'),
+    path('feeds/author/<str:username>/json/', views.post_feed,
+         {'feed_format': 'json'}, name='author_feed_json'),
     # If you had a human resources web app that identified workers by their ID badge number,
     #  then you could use the syntax <int:id_badge> to pass the integer argument to the URL path. Alternatively,
     #   a car mechanics web app identifying cars by their alphanumeric registration plate could do so with <str:reg>
-    path('<slug:slug>/', views.post_detail, name='post_detail'),
+    path('<slug:slug>/', post_detail_view, name='post_detail'),
+    path('<slug:slug>/comments/', views.comment_list, name='comment_list'),
+    path('<slug:slug>/comments/submissions/<int:submission_id>/',
+         views.comment_submission_status, name='comment_submission_status'),
     path('<slug:slug>/edit_comment/<int:comment_id>', views.comment_edit, name='comment_edit'),
     path('<slug:slug>/delete_comment/<int:comment_id>', views.comment_delete, name='comment_delete'),
 ]
\ No newline at end of file
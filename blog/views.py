@@ -12,12 +12,33 @@
 # Answer
 # Correct:Yes, queryset allows extra data filtering before sending data in the context to the template. Well done!
 
+import hashlib
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, get_object_or_404, reverse
 from django.views import generic
+from django.views.decorators.http import require_safe
+from django.utils.decorators import method_decorator
+from django.conf import settings
 from django.contrib import messages
-from django.http import HttpResponseRedirect
-from .models import Post, Comment
+from django.db.models import Q
+from django.core.paginator import InvalidPage
+from django.contrib.auth.models import User
+from django.http import HttpResponse, HttpResponseRedirect, Http404, JsonResponse
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from .models import Post, Comment, CommentSubmission
 from .forms import CommentForm
+from .cache import (
+    anonymous_condition, cache_anonymous_page, index_etag,
+    index_last_modified, index_page_key, post_etag, post_last_modified,
+    post_page_key, post_version)
+from .feeds import cached_feed
+from .sitemaps import cached_shard, render_index, shard_count
+from .paginators import CachedCountPaginator, KeysetPaginator, InvalidCursor
+from .queue import enqueue_comment
+from .search import search_posts
+from .slugs import get_published_post, get_published_post_id
 
 # Generic views are beneficial for dealing with repetitive full-stack coding tasks such as displaying database contents to a webpage.
 # It handles the most common use cases in web app development.
@@ -30,16 +51,36 @@ from .forms import CommentForm
 # Only by entering "model = Post" one can see all the data in view not template,you do not need to add the HTML template name or list 
 # which posts you want to see. Let’s add these optional lines of code in the PostView class,
 # we are still going to remove model = Post and add queryset = Post.objects.all() and template_name = "post_list.html", result is still same on view
+@method_decorator(
+    anonymous_condition(index_etag, index_last_modified), name="dispatch")
+@method_decorator(cache_anonymous_page(index_page_key), name="dispatch")
 class PostList(generic.ListView):
     """
     Returns all published posts in :model:`blog.Post`
     and displays them in a page of six posts. 
+
+    Pages are addressed with opaque ``?after=``/``?before=`` cursor
+    tokens on ``(created_on, id)``. Old ``?page=N`` links still work
+    and use offset pagination.
+
+    Pages rendered for anonymous users are cached until a post changes,
+    and their conditional requests are answered with ``304 Not Modified``
+    when no post has changed.
+
     **Context**
 
     ``queryset``
-        All published instances of :model:`blog.Post`
+        All published instances of :model:`blog.Post`, fetched with
+        their author in the same query and without the ``content`` and
+        ``rendered_content`` columns, which the cards do not render.
     ``paginate_by``
         Number of posts per page.
+    ``paginator_class``
+        Paginator that caches the published post count, used for
+        ``?page=N`` requests.
+    ``page_obj``
+        A :class:`blog.paginators.KeysetPage`, or a regular page for
+        ``?page=N`` requests.
         
     **Template:**
 
@@ -74,38 +115,178 @@ class PostList(generic.ListView):
     # queryset = Post.objects.filter(status=1).order_by("-created_on")
     # template_name = "post_list.html"
 
-    queryset = Post.objects.filter(status=1)
+    # select_related joins auth_user so {{ post.author }} in the cards does not
+    # run one extra query per post, and defer skips the heavy content columns.
+    queryset = Post.objects.filter(status=1).select_related("author").defer(
+        "content", "rendered_content")
     template_name = "blog/index.html"
     paginate_by = 6
+    paginator_class = CachedCountPaginator
+
+    def paginate_queryset(self, queryset, page_size):
+        if self.page_kwarg in self.request.GET:
+            return super().paginate_queryset(queryset, page_size)
+
+        paginator = KeysetPaginator(queryset, page_size)
+        try:
+            page = paginator.page(after=self.request.GET.get("after"),
+                                  before=self.request.GET.get("before"))
+        except InvalidCursor:
+            raise Http404("Invalid page cursor.")
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+async def aget_user(request):
+    """
+    Returns ``request.user``, loading it from the session in a thread
+    first. It is lazy and would otherwise query the database inside
+    the event loop, which Django does not allow.
+    """
+    await sync_to_async(lambda: request.user.is_authenticated)()
+    return request.user
+
+
+@anonymous_condition(index_etag, index_last_modified)
+@cache_anonymous_page(index_page_key)
+async def post_list_async(request):
+    """
+    Async version of :view:`blog.views.PostList`, used when
+    ``settings.ASYNC_VIEWS`` is on. The posts are fetched with the async
+    ORM and only the template is rendered in a thread.
+
+    **Context**
+
+    ``post_list``
+        The published instances of :model:`blog.Post` on the page.
+    ``page_obj``
+        A :class:`blog.paginators.KeysetPage`, or a regular page for
+        ``?page=N`` requests.
+    ``is_paginated``
+        Whether there are other pages.
+
+    **Template:**
 
+    :template:`blog/index.html`
+    """
+    queryset = PostList.queryset.all()
+    if "page" in request.GET:
+        paginator = CachedCountPaginator(queryset, PostList.paginate_by)
+        await paginator.acount()
+        try:
+            page = paginator.page(request.GET["page"])
+        except InvalidPage:
+            raise Http404("Invalid page.")
+        page.object_list = [post async for post in page.object_list]
+    else:
+        paginator = KeysetPaginator(queryset, PostList.paginate_by)
+        try:
+            page = await paginator.apage(after=request.GET.get("after"),
+                                         before=request.GET.get("before"))
+        except InvalidCursor:
+            raise Http404("Invalid page cursor.")
+
+    return await sync_to_async(render)(
+        request,
+        "blog/index.html",
+        {
+            "paginator": paginator,
+            "page_obj": page,
+            "is_paginated": page.has_other_pages(),
+            "object_list": page.object_list,
+            "post_list": page.object_list,
+        },
+    )
+
+class PostSearch(generic.ListView):
+    """
+    Returns the published posts in :model:`blog.Post` matching the
+    ``q`` query string parameter, best matches first, six per page.
+
+    **Context**
+
+    ``query``
+        The search terms.
+    ``paginate_by``
+        Number of posts per page.
+
+    **Template:**
+
+    :template:`blog/search.html`
+    """
+    template_name = "blog/search.html"
+    paginate_by = 6
+
+    def get_queryset(self):
+        self.query = self.request.GET.get("q", "").strip()
+        if not self.query:
+            return Post.objects.none()
+        return search_posts(self.query).select_related("author").defer(
+            "content", "rendered_content")
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["query"] = self.query
+        return context
+
+
+# Number of comments rendered with a post and returned per "load more" request
+COMMENTS_PER_PAGE = 20
+
+
+def visible_comments(post_id, user):
+    """
+    Returns the comments on the post ``post_id`` that ``user`` may see:
+    approved comments plus, for a logged in user, their own pending ones.
+    """
+    comments = Comment.objects.filter(post_id=post_id).select_related("author")
+    if user.is_authenticated:
+        return comments.filter(Q(approved=True) | Q(author=user))
+    return comments.filter(approved=True)
+
+
+@anonymous_condition(post_etag, post_last_modified)
+@cache_anonymous_page(post_page_key)
 def post_detail(request, slug):
     # The slug parameter gets the argument value from the URL pattern named post_detail
     """
     Display an individual :model:`blog.Post`.
 
+    Pages rendered for anonymous users are cached until the post or one
+    of its comments changes, and their conditional requests are answered
+    with ``304 Not Modified`` based on ``updated_on`` and the approved
+    comments. Logged in users get the post body and the approved
+    comments from cached fragments.
+
     **Context**
 
     ``post``
         An instance of :model:`blog.Post`.
     ``comments``
-        All approved comments related to the post.
+        The first :class:`blog.paginators.KeysetPage` of comments
+        visible to the user, newest first.
     ``comment_count``
-        A count of approved comments related to the post.
+        A count of approved comments related to the post, read from
+        ``Post.approved_comment_count``.
     ``comment_form``
         An instance of :form:`blog.CommentForm`
+    ``pending_submissions``
+        The user's :model:`blog.CommentSubmission` entries on the post
+        that are still queued.
+    ``post_version``
+        The cache version of the post, used in fragment cache keys.
+    ``cache_timeout``
+        Lifetime of the cached fragments in seconds.
 
     **Template:**
 
     :template:`blog/post_detail.html`
     """
 
-    queryset = Post.objects.filter(status=1)
-    post = get_object_or_404(queryset, slug=slug)
+    queryset = Post.objects.filter(status=1).select_related("author").defer(
+        "content")
+    post = get_published_post(queryset, slug)
 
-    # when we use post.comments.all(), it will return all comments related to the selected post by using related_name="comments".
-    # This is what is called a reverse lookup. We don't access the Comment model directly. Instead, we fetch the related data from the perspective of the Post model.
-    comments = post.comments.all().order_by("-created_on")
-    comment_count = post.comments.filter(approved=True).count()
+    # The approved comment count is stored on the post instead of being counted here.
+    comment_count = post.approved_comment_count
     # we test this POST now see test_views.py
     if request.method == "POST":
         comment_form = CommentForm(data=request.POST)
@@ -114,10 +295,8 @@ def post_detail(request, slug):
     # You can think of the commit=False argument like git commits. When using git, we can use git add to add new and updated files and to remove files. These changes are not finalised until we use git commit.
 
     # In the same way, calling the comment_form.save method with commit=False, allows us to make changes to the database record until we call the save method with no arguments, which commits our changes to the database.
-            comment = comment_form.save(commit=False)
-            comment.author = request.user
-            comment.post = post
-            comment.save()
+            # The comment is queued and saved by the worker in blog/queue.py.
+            enqueue_comment(post, request.user, comment_form.cleaned_data["body"])
             messages.add_message(
             request, messages.SUCCESS,
             'Comment submitted and awaiting approval'
@@ -125,6 +304,18 @@ def post_detail(request, slug):
     # Outside the if statement, we create a blank instance of the CommentForm class. This line resets the content of the form to blank so that a user can write a second comment if they wish.
     comment_form = CommentForm()
 
+    # when we use post.comments.all(), it will return all comments related to the selected post by using related_name="comments".
+    # This is what is called a reverse lookup. We don't access the Comment model directly. Instead, we fetch the related data from the perspective of the Post model.
+    # Only the first page of comments is rendered, the rest are loaded on demand by comment_list.
+    comments = KeysetPaginator(
+        visible_comments(post.pk, request.user), COMMENTS_PER_PAGE).page()
+    # The user's comments that the worker has not saved yet
+    pending_submissions = ()
+    if request.user.is_authenticated:
+        pending_submissions = post.comment_submissions.filter(
+            author=request.user, status__in=[
+                CommentSubmission.PENDING, CommentSubmission.PROCESSING])
+
     return render(
         request,
         "blog/post_detail.html",
@@ -134,9 +325,223 @@ def post_detail(request, slug):
             "comments": comments,
             "comment_count": comment_count,
             "comment_form": comment_form,
+            "pending_submissions": pending_submissions,
+            "post_version": post_version(post.slug),
+            "cache_timeout": settings.BLOG_CACHE_TIMEOUT,
+        },
+    )
+
+@anonymous_condition(post_etag, post_last_modified)
+@cache_anonymous_page(post_page_key)
+async def post_detail_async(request, slug):
+    """
+    Async version of :view:`blog.views.post_detail`, used when
+    ``settings.ASYNC_VIEWS`` is on. The post, its comments and the
+    user's queued comments are fetched with the async ORM.
+
+    **Context**
+
+    The same as :view:`blog.views.post_detail`.
+
+    **Template:**
+
+    :template:`blog/post_detail.html`
+    """
+    user = await aget_user(request)
+    queryset = Post.objects.filter(status=1).select_related("author").defer(
+        "content")
+    post = await sync_to_async(get_published_post)(queryset, slug)
+
+    if request.method == "POST":
+        comment_form = CommentForm(data=request.POST)
+        if comment_form.is_valid():
+            await sync_to_async(enqueue_comment)(
+                post, user, comment_form.cleaned_data["body"])
+            messages.add_message(
+                request, messages.SUCCESS,
+                'Comment submitted and awaiting approval'
+            )
+    comment_form = CommentForm()
+
+    comments = await KeysetPaginator(
+        visible_comments(post.pk, user), COMMENTS_PER_PAGE).apage()
+    pending_submissions = []
+    if user.is_authenticated:
+        pending_submissions = [
+            submission async for submission in
+            post.comment_submissions.filter(author=user, status__in=[
+                CommentSubmission.PENDING, CommentSubmission.PROCESSING])
+        ]
+
+    return await sync_to_async(render)(
+        request,
+        "blog/post_detail.html",
+        {
+            "post": post,
+            "coder": "Muhammad Bilal",
+            "comments": comments,
+            "comment_count": post.approved_comment_count,
+            "comment_form": comment_form,
+            "pending_submissions": pending_submissions,
+            "post_version": await sync_to_async(post_version)(post.slug),
+            "cache_timeout": settings.BLOG_CACHE_TIMEOUT,
         },
     )
 
+@require_safe
+def post_feed(request, feed_format, username=None):
+    """
+    Returns the RSS, Atom or JSON Feed document of the latest published
+    :model:`blog.Post` entries, or only those by the user ``username``.
+
+    The document is cached until a post changes. Its ETag is a hash of
+    the content and ``Last-Modified`` the newest ``Post.updated_on``, so
+    aggregators sending ``If-None-Match``/``If-Modified-Since`` get a
+    ``304 Not Modified`` until there is something new.
+    """
+    author = None
+    if username is not None:
+        pk = User.objects.filter(username=username).values_list(
+            "pk", flat=True).first()
+        if pk is None:
+            raise Http404("No such author.")
+        author = (pk, username)
+    content, content_type, last_modified, etag = cached_feed(
+        request, feed_format, author)
+    return conditional_response(
+        request, content, content_type, etag, last_modified)
+
+
+@require_safe
+def sitemap_index(request):
+    """
+    Returns the sitemap index, listing the shards rendered by
+    :view:`blog.views.sitemap_shard`.
+    """
+    content, last_modified = render_index(request)
+    return conditional_response(
+        request, content, "application/xml",
+        hashlib.md5(content.encode()).hexdigest(), last_modified)
+
+
+@require_safe
+def sitemap_shard(request, shard):
+    """
+    Returns one shard of the sitemap, listing the published
+    :model:`blog.Post` entries of a range of ids with their
+    ``updated_on`` as ``lastmod``.
+    """
+    if shard >= shard_count():
+        raise Http404("No such sitemap.")
+    content, last_modified, version = cached_shard(request, shard)
+    return conditional_response(
+        request, content, "application/xml", f"{shard}-{version}",
+        last_modified)
+
+
+def conditional_response(request, content, content_type, etag, last_modified):
+    """
+    Returns ``content`` with ``ETag`` and ``Last-Modified`` headers, or
+    ``304 Not Modified`` if the request's conditional headers match.
+    """
+    etag = quote_etag(etag)
+    last_modified = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = HttpResponse(content, content_type=content_type)
+    response.headers["ETag"] = etag
+    if last_modified:
+        response.headers["Last-Modified"] = http_date(last_modified)
+    return response
+
+
+@require_safe
+def comment_list(request, slug):
+    """
+    Returns the next page of comments on a :model:`blog.Post` as JSON
+    for the "Load more comments" button.
+
+    The response holds the rendered ``html`` of the comments and the
+    ``next`` cursor to pass as ``?after=``, or ``null`` on the last page.
+
+    **Template:**
+
+    :template:`blog/comment_list.html`
+    """
+    paginator = KeysetPaginator(
+        visible_comments(get_published_post_id(slug), request.user),
+        COMMENTS_PER_PAGE)
+    try:
+        comments = paginator.page(after=request.GET.get("after"))
+    except InvalidCursor:
+        raise Http404("Invalid page cursor.")
+
+    html = render_to_string(
+        "blog/comment_list.html",
+        {
+            "comments": comments,
+            "post_version": post_version(slug),
+            "cache_timeout": settings.BLOG_CACHE_TIMEOUT,
+        },
+        request=request,
+    )
+    return JsonResponse({"html": html, "next": comments.next_cursor})
+
+
+@require_safe
+def comment_submission_status(request, slug, submission_id):
+    """
+    Returns the state of one of the user's queued comments as JSON,
+    polled by the page until the worker has processed it.
+
+    The response holds the ``status`` of the
+    :model:`blog.CommentSubmission` and, once it is done, the ``html``
+    of the saved comment.
+
+    **Template:**
+
+    :template:`blog/comment_list.html`
+    """
+    if not request.user.is_authenticated:
+        raise Http404("No such comment submission.")
+    submission = get_object_or_404(
+        CommentSubmission.objects.select_related("comment__author"),
+        pk=submission_id, post__slug=slug, author=request.user)
+    html = None
+    if submission.comment is not None:
+        html = render_to_string(
+            "blog/comment_list.html",
+            {
+                "comments": [submission.comment],
+                "post_version": post_version(slug),
+                "cache_timeout": settings.BLOG_CACHE_TIMEOUT,
+            },
+            request=request,
+        )
+    return JsonResponse({
+        "status": submission.get_status_display().lower(),
+        "html": html,
+    })
+
+
+def own_comment(request, slug, comment_id, *fields):
+    """
+    Returns the ``request.user``'s comment ``comment_id`` on the
+    published post ``slug``, loading only ``fields`` besides its id and
+    post, or ``None``. The post id comes from the slug cache, so this
+    takes one query that checks the post and the owner together.
+    """
+    post_id = get_published_post_id(slug)
+    comment = Comment.objects.filter(
+        pk=comment_id, post_id=post_id, author_id=request.user.pk,
+    ).only("id", "post_id", *fields).first()
+    if comment is not None:
+        # Lets the Comment signals find the slug without a query
+        comment.post = Post(pk=post_id, slug=slug)
+    return comment
+
+
 def comment_edit(request, slug, comment_id):
     """
     Display an individual comment for edit.
@@ -152,15 +557,13 @@ def comment_edit(request, slug, comment_id):
     """
     if request.method == "POST":
 
-        queryset = Post.objects.filter(status=1)
-        post = get_object_or_404(queryset, slug=slug)
-        comment = get_object_or_404(Comment, pk=comment_id)
+        # Only the column the form edits is loaded
+        comment = own_comment(request, slug, comment_id, "body")
         # By specifying instance=comment, any changes made to the form will be applied to the existing Comment, instead of creating a new one.
         comment_form = CommentForm(data=request.POST, instance=comment)
 
-        if comment_form.is_valid() and comment.author == request.user:
+        if comment is not None and comment_form.is_valid():
             comment = comment_form.save(commit=False)
-            comment.post = post
             comment.approved = False
             comment.save()
             messages.add_message(request, messages.SUCCESS, 'Comment Updated!')
@@ -183,11 +586,9 @@ def comment_delete(request, slug, comment_id):
     ``comment``
         A single comment related to the post.
     """
-    queryset = Post.objects.filter(status=1)
-    post = get_object_or_404(queryset, slug=slug)
-    comment = get_object_or_404(Comment, pk=comment_id)
+    comment = own_comment(request, slug, comment_id)
 
-    if comment.author == request.user:
+    if comment is not None:
         comment.delete()
         messages.add_message(request, messages.SUCCESS, 'Comment deleted!')
     else:
@@ -196,4 +597,4 @@ def comment_delete(request, slug, comment_id):
     # HttpResponseRedirect is a Django class that tells the browser to go to a different URL.
     # reverse is a Django function that constructs a URL from the provided URL path name and any relevant URL arguments: args=[slug].
     # Using the slug argument ensures the user is returned to the same blog post on which they edited or deleted a comment.
-    return HttpResponseRedirect(reverse('post_detail', args=[slug]))
\ No newline at end of file
+    return HttpResponseRedirect(reverse('post_detail', args=[slug]))
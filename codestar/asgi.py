@@ -14,3 +14,7 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'codestar.settings')
 
 application = get_asgi_application()
+
+from codestar.templating import precompile_templates  # noqa: E402
+
+precompile_templates()
@@ -0,0 +1,308 @@
+"""
+Per-request query and latency metrics.
+
+:class:`MetricsMiddleware` measures, for every request, the number of
+database queries and the time spent in the database, in template
+rendering and in total. It reports them
+
+- in a ``Server-Timing`` header, shown by the browser dev tools;
+- as a ``key=value`` log line on the ``codestar.metrics`` logger;
+- as histograms per URL name, served in the Prometheus text format by
+  the staff-only :func:`metrics_view`.
+
+Template time is measured by :class:`TimedDjangoTemplates`, the
+template backend set in ``settings.TEMPLATES``.
+
+Requests can also be profiled with cProfile: staff users add
+``?_profile=1`` to get the profile instead of the page, and
+``settings.METRICS_PROFILE_SAMPLE_RATE`` profiles a share of all
+requests, saving the ones slower than ``METRICS_PROFILE_SLOW_MS`` to
+``METRICS_PROFILE_DIR``. Sampled profiles are only saved, never sent
+to the user. Async views are not profiled, since cProfile only follows
+the thread it was started in.
+"""
+import cProfile
+import io
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db import connections
+from django.http import HttpResponse
+from django.template.backends.django import DjangoTemplates, Template
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the histogram buckets
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+class RequestMetrics:
+    """
+    Measurements of the current request.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        # Templates being rendered, so nested renders count once
+        self.rendering = 0
+        self.profiler = None
+        # Whether a staff user asked for the profile with ?_profile=1
+        self.profile_requested = False
+
+    def __call__(self, execute, sql, params, many, context):
+        # Called by Django around every query, see execute_wrapper()
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+
+_current = ContextVar("request_metrics", default=None)
+
+
+class TimedTemplate(Template):
+    """
+    Template adding its render time to the current request's metrics.
+    """
+
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None or metrics.rendering:
+            return super().render(context, request)
+        metrics.rendering += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.template_time += time.perf_counter() - started
+            metrics.rendering -= 1
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """
+    Django template backend returning :class:`TimedTemplate` objects.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
+
+
+class Histogram:
+    """
+    Cumulative histogram in the form Prometheus expects.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+
+class Registry:
+    """
+    In-process histograms per metric and URL name. Every process keeps
+    its own, so each worker has to be scraped separately.
+    """
+    metrics = {
+        "http_request_duration_seconds": (
+            "Time taken to answer requests.", SECONDS_BUCKETS),
+        "http_request_db_seconds": (
+            "Time spent in database queries per request.", SECONDS_BUCKETS),
+        "http_request_template_seconds": (
+            "Time spent rendering templates per request.", SECONDS_BUCKETS),
+        "http_request_db_queries": (
+            "Number of database queries per request.", QUERY_BUCKETS),
+    }
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+
+    def observe(self, view, values):
+        with self.lock:
+            for name, value in values.items():
+                histogram = self.histograms.get((name, view))
+                if histogram is None:
+                    histogram = self.histograms[(name, view)] = Histogram(
+                        self.metrics[name][1])
+                histogram.observe(value)
+
+    def clear(self):
+        with self.lock:
+            self.histograms.clear()
+
+    def render(self):
+        """
+        Returns the histograms in the Prometheus text exposition format.
+        """
+        lines = []
+        with self.lock:
+            for name, (help_text, buckets) in self.metrics.items():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for (metric, view), histogram in sorted(self.histograms.items()):
+                    if metric != name:
+                        continue
+                    for bound, count in zip(buckets, histogram.counts):
+                        lines.append(
+                            f'{name}_bucket{{view="{view}",le="{bound}"}} {count}')
+                    lines.append(
+                        f'{name}_bucket{{view="{view}",le="+Inf"}} {histogram.count}')
+                    lines.append(f'{name}_sum{{view="{view}"}} {histogram.sum}')
+                    lines.append(
+                        f'{name}_count{{view="{view}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+class MetricsMiddleware:
+    """
+    Records the metrics of each request, see the module docstring.
+    Put it first in ``MIDDLEWARE`` so the total covers the other
+    middleware too. It runs sync or async, like the rest of the stack.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            with self.wrap_queries(metrics):
+                response = self.get_response(request)
+        finally:
+            self.stop(metrics, token)
+        return self.finish(request, response, metrics, started)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            with self.wrap_queries(metrics):
+                response = await self.get_response(request)
+        finally:
+            self.stop(metrics, token)
+        return self.finish(request, response, metrics, started)
+
+    @staticmethod
+    def wrap_queries(metrics):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(metrics))
+        return stack
+
+    @staticmethod
+    def stop(metrics, token):
+        _current.reset(token)
+        if metrics.profiler is not None:
+            metrics.profiler.disable()
+
+    def finish(self, request, response, metrics, started):
+        total = time.perf_counter() - started
+        match = request.resolver_match
+        view = match.url_name if match and match.url_name else "unmatched"
+        response["Server-Timing"] = ", ".join([
+            f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.queries} queries"',
+            f"tpl;dur={metrics.template_time * 1000:.1f}",
+            f"total;dur={total * 1000:.1f}",
+        ])
+        logger.info(
+            "method=%s path=%s view=%s status=%s queries=%d db_ms=%.1f "
+            "template_ms=%.1f total_ms=%.1f",
+            request.method, request.path, view, response.status_code,
+            metrics.queries, metrics.db_time * 1000,
+            metrics.template_time * 1000, total * 1000,
+        )
+        registry.observe(view, {
+            "http_request_duration_seconds": total,
+            "http_request_db_seconds": metrics.db_time,
+            "http_request_template_seconds": metrics.template_time,
+            "http_request_db_queries": metrics.queries,
+        })
+
+        if metrics.profiler is not None:
+            # Only staff get a profile, sampled ones are saved to disk
+            if metrics.profile_requested:
+                return HttpResponse(
+                    self.format_profile(metrics.profiler),
+                    content_type="text/plain")
+            if total * 1000 >= settings.METRICS_PROFILE_SLOW_MS:
+                self.save_profile(metrics.profiler, view)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Runs after the authentication middleware, so request.user is set
+        metrics = _current.get()
+        if metrics is None or iscoroutinefunction(view_func):
+            return None
+        requested = (request.GET.get("_profile") == "1"
+                     and request.user.is_staff)
+        sampled = random.random() < settings.METRICS_PROFILE_SAMPLE_RATE
+        if requested or sampled:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another profiler is already running
+                return None
+            metrics.profiler = profiler
+            metrics.profile_requested = requested
+
+    @staticmethod
+    def format_profile(profiler, limit=50):
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
+
+    @staticmethod
+    def save_profile(profiler, view):
+        os.makedirs(settings.METRICS_PROFILE_DIR, exist_ok=True)
+        path = os.path.join(settings.METRICS_PROFILE_DIR,
+                            f"{time.strftime('%Y%m%d-%H%M%S')}-{view}.prof")
+        profiler.dump_stats(path)
+        logger.warning("Saved the profile of a slow %s request to %s", view, path)
+
+
+@staff_member_required
+def metrics_view(request):
+    """
+    Returns the request histograms in the Prometheus text format.
+    """
+    return HttpResponse(registry.render(),
+                        content_type="text/plain; version=0.0.4")
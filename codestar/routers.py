@@ -0,0 +1,138 @@
+"""
+Routes the reads of public pages to read replicas.
+
+Replicas are configured with ``DATABASE_URL_REPLICA_*`` environment
+variables, see ``settings.DATABASE_REPLICAS``. :class:`ReplicaMiddleware`
+decides per request whether its reads may go to a replica:
+
+- only ``GET``/``HEAD`` requests to the views named in
+  ``settings.REPLICA_URL_NAMES`` use a replica;
+- a request that writes content (posts, comments, accounts) pins its
+  user to the primary for ``settings.REPLICA_PIN_SECONDS`` with a
+  cookie, so they see their own comment right away (read-your-writes).
+  Session saves and ``last_login`` updates do not pin, or every signed
+  in user would end up on the primary;
+- a request can switch back to the primary with :func:`use_primary`,
+  e.g. when it is about to cache data that changed moments ago.
+
+Writes, and all queries made outside a request, go to the primary.
+"""
+import random
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+PIN_COOKIE = "pin_primary"
+
+# Apps read from the primary even by replica-routed requests. A session
+# created at login may not have reached the replica yet.
+PRIMARY_ONLY_APPS = {"sessions"}
+
+# Apps whose writes pin the user to the primary
+PIN_APPS = {"blog", "account", "socialaccount"}
+
+
+class RoutingState:
+    """
+    Routing decisions for the current request.
+    """
+
+    def __init__(self, use_replica=False):
+        self.use_replica = use_replica
+        self.wrote = False
+
+
+_state = ContextVar("db_routing_state", default=None)
+
+
+def use_primary():
+    """
+    Sends the remaining reads of the current request to the primary.
+    """
+    state = _state.get()
+    if state is not None:
+        state.use_replica = False
+
+
+class ReplicaRouter:
+    """
+    Database router sending the reads of replica-routed requests to a
+    random replica and everything else to ``default``.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if (state is not None and state.use_replica
+                and settings.DATABASE_REPLICAS
+                and model._meta.app_label not in PRIMARY_ONLY_APPS):
+            return random.choice(settings.DATABASE_REPLICAS)
+        return "default"
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None and model._meta.app_label in PIN_APPS:
+            state.wrote = True
+            state.use_replica = False
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {"default", *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary
+        return db == "default"
+
+
+class ReplicaMiddleware:
+    """
+    Lets the reads of public ``GET`` pages go to a replica, and pins
+    users who just wrote something to the primary. It runs sync or
+    async, like the rest of the stack.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        state = RoutingState()
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.pin(state, response)
+
+    async def __acall__(self, request):
+        state = RoutingState()
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.pin(state, response)
+
+    @staticmethod
+    def pin(state, response):
+        if state.wrote:
+            response.set_cookie(
+                PIN_COOKIE, "1", max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True, samesite="Lax")
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = _state.get()
+        state.use_replica = (
+            request.method in ("GET", "HEAD")
+            and request.resolver_match.url_name in settings.REPLICA_URL_NAMES
+            and PIN_COOKIE not in request.COOKIES
+            and not state.wrote)
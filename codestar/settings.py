@@ -15,10 +15,12 @@ import os
 import sys
 from django.contrib.messages import constants as messages
 import dj_database_url
-if os.path.isfile('env.py'):
-    import env
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
+# env.py sets the environment variables for local development. Heroku sets
+# DYNO on every dyno, where the config vars are used instead.
+if 'DYNO' not in os.environ and os.path.isfile(BASE_DIR / 'env.py'):
+    import env
 #  create a TEMPLATES_DIR constant to build a path for our subdirectory 'templates'.
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 
@@ -32,7 +34,7 @@ SECRET_KEY = os.environ.get('SECRET_KEY')
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = False
 
-ALLOWED_HOSTS = ['8000-mbilalqureshi-codestar-r57gqo00kj3.ws-eu111.gitpod.io','.herokuapp.com']
+ALLOWED_HOSTS = ['8000-mbilalqureshi-codestar-r57gqo00kj3.ws-eu111.gitpod.io','.herokuapp.com', 'localhost', '127.0.0.1']
 
 MESSAGE_TAGS = {
     messages.SUCCESS: 'alert-success',
@@ -73,26 +75,40 @@ CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
 CRISPY_TEMPLATE_PACK = "bootstrap5"
 
 MIDDLEWARE = [
+    # First, so its timings cover the other middleware too
+    'codestar.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    # The middleware above and allauth's are sync only. Under ASGI, those
+    # below run async, with a single switch to sync here.
+    'allauth.account.middleware.AccountMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'codestar.routers.ReplicaMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'allauth.account.middleware.AccountMiddleware',
 ]
 
 ROOT_URLCONF = 'codestar.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates measuring render times, see codestar/metrics.py
+        'BACKEND': 'codestar.metrics.TimedDjangoTemplates',
+        'NAME': 'django',
         # add your newly created TEMPLATES_DIR constant to the list of 'DIRS'
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Compile each template once per process and keep it in memory.
+            # codestar.wsgi/asgi fill the cache when a worker starts.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -116,12 +132,132 @@ WSGI_APPLICATION = 'codestar.wsgi.application'
 #     }
 # }
 
+# Serve the blog and about pages with async views. Only worth it under an
+# ASGI server, see "Running under ASGI" in README.md.
+ASYNC_VIEWS = os.environ.get("ASYNC_VIEWS") == "True"
+
+# Database connections are kept open for DATABASE_CONN_MAX_AGE seconds and
+# reused by later requests, checked first when DATABASE_CONN_HEALTH_CHECKS
+# is on. Async views do not reuse connections, so they default to closing
+# them and should be paired with a connection pooler (DATABASE_POOL).
+DATABASE_CONN_MAX_AGE = int(os.environ.get(
+    "DATABASE_CONN_MAX_AGE", 0 if ASYNC_VIEWS else 600))
+
 DATABASES = {
-    'default': dj_database_url.parse(os.environ.get("DATABASE_URL"))
+    'default': dj_database_url.parse(
+        os.environ.get("DATABASE_URL"), conn_max_age=DATABASE_CONN_MAX_AGE)
+}
+DATABASES['default']['CONN_HEALTH_CHECKS'] = (
+    os.environ.get("DATABASE_CONN_HEALTH_CHECKS", "True") == "True")
+
+# Read replicas, one per DATABASE_URL_REPLICA_<NAME> env var, e.g.
+# DATABASE_URL_REPLICA_1 becomes the "replica_1" database. GET requests to
+# the views in REPLICA_URL_NAMES read from them, see codestar/routers.py.
+DATABASE_REPLICAS = []
+for name, url in sorted(os.environ.items()):
+    if name.startswith("DATABASE_URL_REPLICA_") and url:
+        alias = name[len("DATABASE_URL_"):].lower()
+        DATABASES[alias] = dj_database_url.parse(
+            url, conn_max_age=DATABASE_CONN_MAX_AGE)
+        DATABASES[alias]['CONN_HEALTH_CHECKS'] = (
+            DATABASES['default']['CONN_HEALTH_CHECKS'])
+        DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+        DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ['codestar.routers.ReplicaRouter']
+REPLICA_URL_NAMES = [
+    'home', 'post_detail', 'about',
+    'post_feed_rss', 'post_feed_atom', 'post_feed_json',
+    'author_feed_rss', 'author_feed_atom', 'author_feed_json',
+    'sitemap_index', 'sitemap_shard',
+]
+# Users are pinned to the primary for this long after writing, which
+# should cover the replication lag
+REPLICA_PIN_SECONDS = int(os.environ.get("REPLICA_PIN_SECONDS", 10))
+
+# DATABASE_POOL=pgbouncer when DATABASE_URL points at a PgBouncer in
+# transaction pooling mode, e.g. the one started by the Heroku PgBouncer
+# buildpack. Server-side cursors do not survive transaction pooling, so
+# QuerySet.iterator() falls back to client-side cursors.
+DATABASE_POOL = os.environ.get("DATABASE_POOL", "")
+if DATABASE_POOL == "pgbouncer":
+    for database in DATABASES.values():
+        database['DISABLE_SERVER_SIDE_CURSORS'] = True
+
+# Request metrics, see codestar/metrics.py. A share of requests given by
+# METRICS_PROFILE_SAMPLE_RATE (0 to 1) is profiled, and the profiles of
+# those slower than METRICS_PROFILE_SLOW_MS are saved to METRICS_PROFILE_DIR.
+METRICS_PROFILE_SAMPLE_RATE = float(
+    os.environ.get("METRICS_PROFILE_SAMPLE_RATE", 0))
+METRICS_PROFILE_SLOW_MS = int(os.environ.get("METRICS_PROFILE_SLOW_MS", 500))
+METRICS_PROFILE_DIR = os.environ.get(
+    "METRICS_PROFILE_DIR", os.path.join(BASE_DIR, '.profiles'))
+
+# Writes the metrics log line of every request to the console, where
+# Heroku collects it
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'codestar.metrics': {
+            'handlers': ['console'],
+            'level': os.environ.get("METRICS_LOG_LEVEL", "INFO"),
+            'propagate': False,
+        },
+    },
 }
 
 if 'test' in sys.argv:
     DATABASES['default']['ENGINE'] = 'django.db.backends.sqlite3'
+    LOGGING['loggers']['codestar.metrics']['level'] = 'WARNING'
+# Cache used for rendered pages and template fragments. CACHE_BACKEND picks
+# local memory (default), "file" (CACHE_LOCATION is a directory) or "redis"
+# (CACHE_LOCATION is a redis:// URL, e.g. a local Redis compatible server).
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "locmem")
+if CACHE_BACKEND == "redis":
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get("CACHE_LOCATION", "redis://127.0.0.1:6379"),
+        }
+    }
+elif CACHE_BACKEND == "file":
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get("CACHE_LOCATION", os.path.join(BASE_DIR, '.cache')),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+# Seconds rendered blog pages and fragments are kept in the cache
+BLOG_CACHE_TIMEOUT = int(os.environ.get("BLOG_CACHE_TIMEOUT", 600))
+# Number of slugs each process remembers the post id and status of
+SLUG_CACHE_SIZE = int(os.environ.get("SLUG_CACHE_SIZE", 10000))
+# Seconds a slug is remembered. Changes made in another process are seen
+# at once with a shared CACHE_BACKEND, and after this long otherwise.
+SLUG_CACHE_TIMEOUT = int(os.environ.get("SLUG_CACHE_TIMEOUT", 60))
+# Each sitemap shard lists the posts of a range of this many ids, so at
+# most this many URLs (sitemaps.org allows 50,000). A shard is rendered
+# again only when one of its posts changes, so it is kept much longer
+# than pages (SITEMAP_CACHE_TIMEOUT seconds).
+SITEMAP_SHARD_SIZE = 50000
+SITEMAP_CACHE_TIMEOUT = int(os.environ.get("SITEMAP_CACHE_TIMEOUT", 7 * 24 * 3600))
+
+# Comments are queued and saved by the worker in the Procfile
+# (python manage.py process_comment_queue). Set COMMENT_QUEUE_EAGER=True
+# to save them during the request instead, e.g. when no worker runs.
+COMMENT_QUEUE_EAGER = os.environ.get("COMMENT_QUEUE_EAGER") == "True"
+# Dotted paths of callables run on each comment before it is saved,
+# see blog/queue.py
+COMMENT_MODERATORS = []
+
 # Note: This is a list of the trusted origins for requests. As shown, you need to add both your local development server URL domain 
 # and your production server URL domain to allow you to add blog post content from the admin dashboard. The subdomain is wildcarded with a *.
 CSRF_TRUSTED_ORIGINS = [
@@ -174,6 +310,21 @@ STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static'), ]
 # In this case, that's the staticfiles directory we specified in the STATIC_ROOT setting in settings.py. 
 # This setting defines where Django will serve static files from. The collectstatic needs to be run every time we add or change a CSS, JavaScript or static image file.
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+# collectstatic minifies our CSS/JS, names every file after a hash of its
+# content and writes gzip/Brotli copies, see codestar/storage.py. Whitenoise
+# serves the hashed files with a far-future immutable Cache-Control header.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'codestar.storage.StaticStorage',
+    },
+}
+if 'test' in sys.argv:
+    # Tests run without collectstatic, so there is no manifest
+    STORAGES['staticfiles']['BACKEND'] = (
+        'django.contrib.staticfiles.storage.StaticFilesStorage')
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,120 @@
+"""
+Static files storage used by ``collectstatic``.
+
+:class:`StaticStorage` extends whitenoise's manifest storage, which
+gives every file a content hash in its name (served with a far-future
+``Cache-Control: immutable`` header by whitenoise) and writes gzip and
+Brotli versions next to it. On top of that it
+
+- minifies the CSS and JavaScript files of ``STATICFILES_DIRS`` before
+  they are hashed, the JavaScript with rjsmin, which tokenizes strings,
+  template literals and regular expressions rather than guessing;
+- fails ``collectstatic`` when a project template references a static
+  file that will not be served under a hashed name, see
+  :func:`find_unhashed_references`.
+"""
+import os
+import re
+import rjsmin
+from django.conf import settings
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+from .templating import project_template_dirs
+
+CSS_COMMENT = re.compile(r"/\*.*?\*/", re.S)
+CSS_SPACE = re.compile(r"\s*([{};,>])\s*")
+
+TEMPLATE_COMMENT = re.compile(
+    r"<!--.*?-->|{#.*?#}|{%\s*comment\s*%}.*?{%\s*endcomment\s*%}", re.S)
+STATIC_TAG = re.compile(r"""{%\s*static\s+(["'])(.+?)\1""")
+
+
+def minify_css(css):
+    """
+    Removes comments and the whitespace CSS does not need.
+    """
+    css = CSS_COMMENT.sub("", css)
+    css = re.sub(r"\s+", " ", css)
+    css = CSS_SPACE.sub(r"\1", css)
+    css = re.sub(r":\s+", ":", css)
+    return css.replace(";}", "}").strip()
+
+
+def minify_js(js):
+    """
+    Removes the comments and whitespace JavaScript does not need.
+    ``/*! ... */`` comments, e.g. licences, are kept.
+    """
+    return rjsmin.jsmin(js, keep_bang_comments=True) + "\n"
+
+
+MINIFIERS = {".css": minify_css, ".js": minify_js}
+
+
+def find_unhashed_references(hashed_files, template_dirs=None):
+    """
+    Returns ``(template, line, problem)`` for every static file
+    reference in the templates that will not get a hashed URL: a
+    literal ``STATIC_URL`` path, which bypasses the manifest, or a
+    ``{% static %}`` name missing from ``hashed_files``, which fails at
+    render time. References inside comments are ignored.
+    """
+    static_url = re.escape(settings.STATIC_URL.lstrip("/"))
+    literal = re.compile(
+        r"""["'(]\s*/?%s|{{\s*STATIC_URL\s*}}""" % static_url)
+    problems = []
+    for directory in template_dirs or project_template_dirs():
+        for root, _, files in os.walk(directory):
+            for filename in sorted(files):
+                path = os.path.join(root, filename)
+                with open(path, encoding="utf-8") as f:
+                    text = TEMPLATE_COMMENT.sub(
+                        lambda m: "\n" * m.group().count("\n"), f.read())
+                name = os.path.relpath(path, directory)
+                for match in literal.finditer(text):
+                    line = text.count("\n", 0, match.start()) + 1
+                    problems.append(
+                        (name, line, "static URL written out, use {% static %}"))
+                for match in STATIC_TAG.finditer(text):
+                    if match.group(2) not in hashed_files:
+                        line = text.count("\n", 0, match.start()) + 1
+                        problems.append(
+                            (name, line, f"no static file '{match.group(2)}'"))
+    return problems
+
+
+class StaticStorage(CompressedManifestStaticFilesStorage):
+    """
+    Hashed and compressed static files storage that also minifies our
+    own CSS and JavaScript and checks the templates, see the module
+    docstring.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run:
+            paths = dict(paths)
+            own_dirs = {os.path.abspath(d) for d in settings.STATICFILES_DIRS}
+            for name, (storage, path) in paths.items():
+                minify = MINIFIERS.get(os.path.splitext(name)[1])
+                if (minify and ".min." not in name
+                        and os.path.abspath(storage.location) in own_dirs):
+                    self.minify(name, minify)
+                    # Hash the minified copy rather than the source file
+                    paths[name] = (self, name)
+
+        yield from super().post_process(paths, dry_run, **options)
+
+        if not dry_run:
+            problems = find_unhashed_references(self.hashed_files)
+            if problems:
+                yield "templates", None, ValueError(
+                    "Templates reference static files without a hashed "
+                    "name:\n" + "\n".join(
+                        f"{name}:{line}: {problem}"
+                        for name, line, problem in problems))
+
+    def minify(self, name, minify):
+        path = self.path(name)
+        with open(path, encoding="utf-8") as f:
+            content = f.read()
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(minify(content))
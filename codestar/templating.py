@@ -0,0 +1,44 @@
+"""
+Helpers for the project's templates.
+"""
+import logging
+import os
+from django.conf import settings
+from django.template import TemplateSyntaxError, engines
+from django.template.utils import get_app_template_dirs
+
+logger = logging.getLogger(__name__)
+
+
+def project_template_dirs():
+    """
+    Returns the template directories of the project and of its own
+    apps, leaving out installed third-party packages.
+    """
+    dirs = [str(d) for config in settings.TEMPLATES for d in config["DIRS"]]
+    dirs += [str(d) for d in get_app_template_dirs("templates")
+             if str(d).startswith(str(settings.BASE_DIR))
+             and "site-packages" not in str(d)]
+    return dirs
+
+
+def precompile_templates():
+    """
+    Compiles every project template into the cached template loader, so
+    the first requests a worker answers do not pay for parsing them.
+    Returns the number of templates compiled.
+    """
+    engine = engines["django"]
+    compiled = 0
+    for directory in project_template_dirs():
+        for root, _, files in os.walk(directory):
+            for filename in files:
+                name = os.path.relpath(os.path.join(root, filename), directory)
+                try:
+                    engine.get_template(name.replace(os.sep, "/"))
+                except TemplateSyntaxError:
+                    # Reported as usual when the template is rendered
+                    logger.exception("Could not compile the template %s", name)
+                else:
+                    compiled += 1
+    return compiled
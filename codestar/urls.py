@@ -16,12 +16,14 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from codestar.metrics import metrics_view
 
 urlpatterns = [
     # You will need to order your URLs alphabetically with about/ at the top.
     path('about/',include('about.urls'),name="about-urls"),
     path("accounts/", include("allauth.urls")),
     path('admin/', admin.site.urls),
+    path('metrics/', metrics_view, name='metrics'),
     path('summernote/', include('django_summernote.urls')),
     path('', include('blog.urls'), name="blog-urls"),
 ]
@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'codestar.settings')
 
 application = get_wsgi_application()
+
+from codestar.templating import precompile_templates  # noqa: E402
+
+precompile_templates()
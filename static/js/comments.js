@@ -6,27 +6,30 @@
 
 
 // edit comment variables
-const editButtons = document.getElementsByClassName("btn-edit");
+const commentList = document.getElementById("commentList");
 const commentText = document.getElementById("id_body");
 const commentForm = document.getElementById("commentForm");
 const submitButton = document.getElementById("submitButton");
 
 // Delete comment variables
 const deleteModal = new bootstrap.Modal(document.getElementById("deleteModal"));
-const deleteButtons = document.getElementsByClassName("btn-delete");
 const deleteConfirm = document.getElementById("deleteConfirm");
+
+// Load more comments variables
+const loadMoreButton = document.getElementById("loadMoreComments");
 /**
 * Initializes deletion functionality for the provided delete buttons.
 * 
-* For each button in the `deleteButtons` collection:
+* Listens on the `commentList` container so that buttons of comments
+* added by "Load more comments" work too. For each `.btn-delete` click:
 * - Retrieves the associated comment's ID upon click.
 * - Updates the `deleteConfirm` link's href to point to the 
 * deletion endpoint for the specific comment.
 * - Displays a confirmation modal (`deleteModal`) to prompt 
 * the user for confirmation before deletion.
 */
-for (let button of deleteButtons) {
-  button.addEventListener("click", (e) => {
+commentList.addEventListener("click", (e) => {
+  if (e.target.classList.contains("btn-delete")) {
     let commentId = e.target.getAttribute("data-comment_id");
     // For the delete functionality, the JavaScript determines which comment we aim to delete based on its ID.
 
@@ -36,21 +39,21 @@ for (let button of deleteButtons) {
     // "CALLS THE VIEWS IN BAKGROUND FROM HERE"
     deleteConfirm.href = `delete_comment/${commentId}`;
     deleteModal.show();
-  });
-}
+  }
+});
 
 /**
 * Initializes edit functionality for the provided edit buttons.
 * 
-* For each button in the `editButtons` collection:
+* Listens on the `commentList` container. For each `.btn-edit` click:
 * - Retrieves the associated comment's ID upon click.
 * - Fetches the content of the corresponding comment.
 * - Populates the `commentText` input/textarea with the comment's content for editing.
 * - Updates the submit button's text to "Update".
 * - Sets the form's action attribute to the `edit_comment/{commentId}` endpoint.
 */
-for (let button of editButtons) {
-  button.addEventListener("click", (e) => {
+commentList.addEventListener("click", (e) => {
+  if (e.target.classList.contains("btn-edit")) {
     let commentId = e.target.getAttribute("data-comment_id");
     let commentContent = document.getElementById(`comment${commentId}`).innerText;
     commentText.value = commentContent;
@@ -66,5 +69,55 @@ for (let button of editButtons) {
   // form action = "edit_comment/7"> // returns http://urladdress.com/<slug:slug>/edit_comment/7
   // "CALLS THE VIEWS IN BAKGROUND FROM HERE"
     commentForm.setAttribute("action", `edit_comment/${commentId}`);
+  }
+});
+
+/**
+* Loads the next page of comments when "Load more comments" is clicked.
+*
+* - Fetches the JSON page of comments after the `data-next` cursor.
+* - Appends the returned HTML to the `commentList`.
+* - Stores the new cursor, or removes the button after the last page.
+*/
+if (loadMoreButton) {
+  loadMoreButton.addEventListener("click", () => {
+    let url = `${loadMoreButton.dataset.url}?after=${loadMoreButton.dataset.next}`;
+    fetch(url, { headers: { "Accept": "application/json" } })
+      .then((response) => response.json())
+      .then((data) => {
+        commentList.insertAdjacentHTML("beforeend", data.html);
+        if (data.next) {
+          loadMoreButton.dataset.next = data.next;
+        } else {
+          loadMoreButton.remove();
+        }
+      });
   });
-}
\ No newline at end of file
+}
+/**
+* Polls the status of comments that are still queued for the worker.
+*
+* - Requests the `data-status-url` of each queued comment every few seconds.
+* - Replaces the placeholder with the saved comment once it is done.
+* - Shows an error if the comment could not be posted.
+*/
+const POLL_INTERVAL = 3000;
+const MAX_POLLS = 40;
+
+function pollSubmission(placeholder, polls = 0) {
+  fetch(placeholder.dataset.statusUrl, { headers: { "Accept": "application/json" } })
+    .then((response) => response.json())
+    .then((data) => {
+      if (data.status === "done") {
+        placeholder.outerHTML = data.html;
+      } else if (data.status === "failed") {
+        placeholder.querySelector(".approval").innerText = "This comment could not be posted";
+      } else if (polls < MAX_POLLS) {
+        setTimeout(() => pollSubmission(placeholder, polls + 1), POLL_INTERVAL);
+      }
+    });
+}
+
+document.querySelectorAll("[data-status-url]").forEach((placeholder) => {
+  setTimeout(() => pollSubmission(placeholder), POLL_INTERVAL);
+});